@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from accounts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    '''
+    Command to write the thumbnails of uploaded profile pictures,
+    used for pictures uploaded before the thumbnails existed.
+    Profiles with up to date thumbnails are skipped unless --all.
+    '''
+    help = "Generate missing profile picture thumbnails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true")
+
+    def handle(self, *args, **options):
+        default = Profile._meta.get_field("image").default
+        profiles = Profile.objects.exclude(image=default).exclude(image="")
+        done = 0
+        for profile in profiles.iterator():
+            source = (profile.thumbnails or {}).get("source")
+            if source == profile.image.name and not options["all"]:
+                continue
+            generate_thumbnails(profile.pk)
+            done += 1
+        self.stdout.write(f"generated thumbnails of {done} profiles")
@@ -6,6 +6,8 @@ class Profile(models.Model):
     '''Model for User Profiles'''
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     image = models.ImageField(default='default.jpg', upload_to='profile_pics')
+    # resized variants of image, written by accounts.thumbnails
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         '''Method for string representation'''
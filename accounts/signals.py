@@ -6,7 +6,10 @@ from .models import Profile
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
-    '''Signal to create Profile object on creation of a new User'''
+    '''
+    Signal to create Profile object on creation of a new User.
+    Pages read user.profile right after registering so this stays
+    inline, other saves of a user (like every login) leave it alone.
+    '''
     if created:
         Profile.objects.create(user=instance)
-    instance.profile.save()
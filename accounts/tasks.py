@@ -0,0 +1,8 @@
+from jobs.queue import job
+from .thumbnails import generate_thumbnails
+
+
+@job("accounts.generate_thumbnails")
+def generate_profile_thumbnails(profile_id):
+    '''Job to write the thumbnails of a profile picture'''
+    generate_thumbnails(profile_id)
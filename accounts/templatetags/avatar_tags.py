@@ -0,0 +1,39 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from accounts.models import Profile
+from accounts.thumbnails import pick_variant
+
+register = template.Library()
+
+
+@register.inclusion_tag("accounts/avatar.html")
+def avatar(profile, size, css_class="", style=""):
+    '''
+    Template tag showing the picture of a profile size pixels wide:
+
+        {% avatar user.profile 65 "rounded-circle article-img" %}
+
+    The smallest adequate thumbnail is picked for normal and high
+    density screens, WebP first with a JPEG fallback. Until the
+    thumbnails exist the default picture is shown.
+    '''
+    context = {"size": size, "css_class": css_class, "style": style}
+    variants = {
+        (density, image_format): pick_variant(
+            profile, size * density, image_format
+        )
+        for density in (1, 2)
+        for image_format in ("webp", "jpeg")
+    }
+    if not all(variants.values()):
+        default = Profile._meta.get_field("image").default
+        context["src"] = default_storage.url(default)
+        return context
+    urls = {key: default_storage.url(name) for key, name in variants.items()}
+    context.update(
+        src=urls[1, "jpeg"],
+        jpeg_srcset=f"{urls[1, 'jpeg']} 1x, {urls[2, 'jpeg']} 2x",
+        webp_srcset=f"{urls[1, 'webp']} 1x, {urls[2, 'webp']} 2x",
+    )
+    return context
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from accounts.models import Profile
+from accounts.thumbnails import (
+    THUMBNAIL_FORMATS, THUMBNAIL_SIZES, pick_variant, schedule_thumbnails
+)
+from jobs.models import Job
+from jobs.queue import claim, run
+
+
+def picture(name="me.jpg", color="red"):
+    '''Function to return an uploaded JPEG wider than it is tall'''
+    output = BytesIO()
+    Image.new("RGB", (400, 300), color).save(output, "JPEG")
+    return SimpleUploadedFile(name, output.getvalue(), "image/jpeg")
+
+
+class ThumbnailTests(TestCase):
+    '''Tests the thumbnails written for uploaded profile pictures'''
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user("rider", "rider@example.com")
+        self.client.force_login(self.user)
+
+    def upload(self, image):
+        '''method to post a new picture to the profile page'''
+        response = self.client.post(reverse("profile"), {
+            "username": self.user.username,
+            "email": self.user.email,
+            "image": image,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.user.profile.refresh_from_db()
+        return self.user.profile
+
+    @override_settings(ACCOUNTS_DEFER_THUMBNAILS=False)
+    def test_written_on_upload_without_worker(self):
+        profile = self.upload(picture())
+        self.assertEqual(profile.thumbnails["source"], profile.image.name)
+        self.assertFalse(Job.objects.exists())
+        for size in THUMBNAIL_SIZES:
+            for image_format in THUMBNAIL_FORMATS:
+                name = pick_variant(profile, size, image_format)
+                self.assertTrue(default_storage.exists(name))
+                with default_storage.open(name) as variant:
+                    self.assertEqual(Image.open(variant).size, (size, size))
+
+    @override_settings(ACCOUNTS_DEFER_THUMBNAILS=False)
+    def test_variants_of_previous_picture_are_deleted(self):
+        first = self.upload(picture("first.jpg"))
+        old = pick_variant(first, 64, "webp")
+        second = self.upload(picture("second.jpg", "blue"))
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(
+            pick_variant(second, 64, "webp")
+        ))
+
+    def test_pick_variant_takes_smallest_fitting_size(self):
+        profile = self.user.profile
+        profile.thumbnails = {
+            "source": profile.image.name,
+            "variants": {
+                str(size): {"webp": f"{size}.webp"}
+                for size in THUMBNAIL_SIZES
+            },
+        }
+        self.assertEqual(pick_variant(profile, 65, "webp"), "128.webp")
+        self.assertEqual(pick_variant(profile, 999, "webp"), "256.webp")
+        self.assertIsNone(pick_variant(profile, 65, "jpeg"))
+        profile.image.name = "profile_pics/other.jpg"
+        self.assertIsNone(pick_variant(profile, 65, "webp"))
+
+    @override_settings(ACCOUNTS_DEFER_THUMBNAILS=True)
+    def test_deferred_to_worker(self):
+        profile = self.upload(picture())
+        self.assertEqual(profile.thumbnails, {})
+        job = Job.objects.get()
+        self.assertEqual(job.name, "accounts.generate_thumbnails")
+
+        # scheduling the same picture again queues nothing new
+        schedule_thumbnails(profile)
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.assertTrue(run(claim("worker")[0]))
+        profile.refresh_from_db()
+        self.assertEqual(profile.thumbnails["source"], profile.image.name)
+
+    @override_settings(ACCOUNTS_DEFER_THUMBNAILS=True)
+    def test_avatar_shows_default_until_thumbnails_exist(self):
+        template = Template(
+            "{% load avatar_tags %}{% avatar profile 65 'round' %}"
+        )
+        profile = self.upload(picture())
+        html = template.render(Context({"profile": profile}))
+        self.assertIn('src="/media/default.jpg"', html)
+        self.assertNotIn("<picture>", html)
+
+        self.assertEqual(Profile.objects.filter(thumbnails={}).count(), 1)
+        output = StringIO()
+        call_command("generate_thumbnails", stdout=output)
+        self.assertIn("generated thumbnails of 1 profiles", output.getvalue())
+        call_command("generate_thumbnails", stdout=output)
+        self.assertIn("generated thumbnails of 0 profiles", output.getvalue())
+
+        profile.refresh_from_db()
+        html = template.render(Context({"profile": profile}))
+        self.assertIn("<picture>", html)
+        self.assertIn(pick_variant(profile, 65, "webp") + " 1x", html)
+        self.assertIn(pick_variant(profile, 130, "jpeg") + " 2x", html)
@@ -0,0 +1,100 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from jobs.queue import enqueue
+
+# square sizes in pixels generated for every profile picture
+THUMBNAIL_SIZES = (64, 128, 256)
+# formats written for every size with their Pillow save options
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+THUMBNAIL_DIR = "profile_pics/thumbs"
+
+
+def render_variant(image, size, image_format):
+    '''Function to return a square variant of image encoded in a format'''
+    pillow_format, options = THUMBNAIL_FORMATS[image_format]
+    variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    output = BytesIO()
+    variant.save(output, pillow_format, **options)
+    return output.getvalue()
+
+
+def generate_thumbnails(profile_id):
+    '''
+    Function to write every size and format of the picture of a profile.
+    The variants are only recorded if the picture did not change
+    meanwhile, the variants of the previous picture are deleted.
+    '''
+    from .models import Profile
+
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.image:
+        return
+    source = profile.image.name
+    with profile.image.open("rb") as upload:
+        image = Image.open(upload)
+        # decode large JPEGs at a reduced scale, still above every size
+        image.draft("RGB", (THUMBNAIL_SIZES[-1], THUMBNAIL_SIZES[-1]))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    stem = os.path.splitext(os.path.basename(source))[0]
+    variants = {}
+    for size in THUMBNAIL_SIZES:
+        for image_format in THUMBNAIL_FORMATS:
+            name = default_storage.save(
+                f"{THUMBNAIL_DIR}/{stem}_{size}.{image_format}",
+                ContentFile(render_variant(image, size, image_format)),
+            )
+            variants.setdefault(str(size), {})[image_format] = name
+    thumbnails = {"source": source, "variants": variants}
+
+    updated = Profile.objects.filter(pk=profile_id, image=source).update(
+        thumbnails=thumbnails
+    )
+    stale = profile.thumbnails if updated else thumbnails
+    for formats in stale.get("variants", {}).values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def schedule_thumbnails(profile):
+    '''
+    Function to write the thumbnails of the current picture of a
+    profile. With ACCOUNTS_DEFER_THUMBNAILS they are queued for the
+    run_jobs worker instead, avatars show the default picture until
+    it wrote them.
+    '''
+    if not settings.ACCOUNTS_DEFER_THUMBNAILS:
+        generate_thumbnails(profile.pk)
+        return
+    enqueue(
+        "accounts.generate_thumbnails",
+        key=f"thumbnails:{profile.pk}:{profile.image.name}",
+        profile_id=profile.pk,
+    )
+
+
+def pick_variant(profile, size, image_format):
+    '''
+    Function to return the storage name of the smallest variant at
+    least size pixels wide, or the largest one if none is that big.
+    Returns None while the thumbnails of the picture do not exist.
+    '''
+    thumbnails = profile.thumbnails or {}
+    if thumbnails.get("source") != profile.image.name:
+        return None
+    variants = thumbnails.get("variants", {})
+    sizes = sorted(int(width) for width in variants)
+    if not sizes:
+        return None
+    fitting = [width for width in sizes if width >= size]
+    width = fitting[0] if fitting else sizes[-1]
+    return variants[str(width)].get(image_format)
@@ -3,6 +3,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
 from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm
+from .thumbnails import schedule_thumbnails
 
 
 def register(request):
@@ -32,7 +33,10 @@ def profile(request):
         )
         if u_form.is_valid() and p_form.is_valid():
             u_form.save()
-            p_form.save()
+            profile = p_form.save()
+            # resized now, or by the run_jobs worker when deferred
+            if "image" in p_form.changed_data:
+                schedule_thumbnails(profile)
             messages.success(request, "Your account has been updated!")
             return redirect("profile")
 
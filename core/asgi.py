@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# event streams are served from the event loop, see rides.streams
+from rides.streams import EventStreamApplication  # noqa: E402
+
+application = EventStreamApplication(django_application)
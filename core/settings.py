@@ -41,10 +41,13 @@ INSTALLED_APPS = [
 
     'rides.apps.RidesConfig',
     'accounts.apps.AccountsConfig',
+    'jobs.apps.JobsConfig',
     'crispy_forms',
 ]
 
 MIDDLEWARE = [
+    'rides.middleware.PerformanceMiddleware',
+    'rides.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +70,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'rides.context_processors.badges',
+                'rides.context_processors.live_events',
             ],
         },
     },
@@ -89,7 +94,116 @@ DATABASES = {
     }
 }
 
+# Aliases of DATABASES that replicate default. Reads of GET requests go
+# to a random one through rides.routers.ReplicaRouter, writes and reads
+# inside transactions go to default. After a write the client keeps
+# reading from default for RIDES_PRIMARY_STICKY_SECONDS, longer than the
+# replication lag, see rides.middleware.ReplicaMiddleware. To try it
+# locally, point SQLite aliases at the file of a SQLite default.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['rides.routers.ReplicaRouter']
+RIDES_PRIMARY_STICKY_SECONDS = 10
+
+
+# Cache used for ride fragments and version keys.
+# Use a shared backend (memcached/redis) when running several processes
+# so that version bumps are seen by every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'zydelo-rides',
+    }
+}
 
+RIDE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Serve the read only ride views with their async versions (under ASGI),
+# blocking ORM calls of those views run in a pool of this many threads
+RIDES_ASYNC_VIEWS = False
+ASYNC_ORM_THREADS = 8
+
+# Broker of the live event streams, rides.events.LocalBroker only reaches
+# streams of the same process, use rides.events.DatabaseBroker when
+# running several processes. Streams send a keepalive every
+# RIDES_EVENT_HEARTBEAT seconds, WSGI streams are closed after
+# RIDES_EVENT_STREAM_TIMEOUT seconds and reconnected by the browser.
+RIDES_EVENT_BROKER = 'rides.events.LocalBroker'
+RIDES_EVENT_POLL_INTERVAL = 1
+RIDES_EVENT_HEARTBEAT = 15
+RIDES_EVENT_STREAM_TIMEOUT = 300
+# Pages of logged in users open their event stream only when this is set.
+# Set it when serving core.asgi.application, whose event loop holds idle
+# streams cheaply. Under WSGI every open tab holds a worker thread for up
+# to RIDES_EVENT_STREAM_TIMEOUT, so the WSGI stream view answers 404
+# unless it is set.
+RIDES_EVENT_STREAMS = False
+
+# Background jobs are run by `manage.py run_jobs`. A job whose worker
+# holds it longer than JOBS_LEASE_SECONDS is handed to another worker,
+# failed jobs are retried after JOBS_RETRY_BACKOFF * 2^(attempt - 1)
+# seconds. With RIDES_DEFER_SIDE_EFFECTS the payments of finished
+# rides and the rejection of requests of full rides become jobs, with
+# ACCOUNTS_DEFER_THUMBNAILS so do the thumbnails of uploaded profile
+# pictures. Only set them where a run_jobs worker is running, otherwise
+# that work is queued and never done.
+JOBS_LEASE_SECONDS = 300
+JOBS_RETRY_BACKOFF = 10
+JOBS_MAX_ATTEMPTS = 5
+RIDES_DEFER_SIDE_EFFECTS = False
+ACCOUNTS_DEFER_THUMBNAILS = False
+
+# Finished rides, and rides that ended RIDES_SWEEP_GRACE_SECONDS ago, are
+# taken out of the active feed RIDES_SWEEP_BATCH_SIZE at a time by
+# `manage.py sweep_rides`, or every RIDES_SWEEP_INTERVAL seconds by the
+# rides.sweep_rides job once `manage.py sweep_rides --schedule` queued it.
+RIDES_SWEEP_GRACE_SECONDS = 60 * 60 * 24
+RIDES_SWEEP_BATCH_SIZE = 500
+RIDES_SWEEP_INTERVAL = 60 * 15
+
+# Inactive rides that ended RIDES_ARCHIVE_AFTER_DAYS ago, with all their
+# payments paid, are moved with their requests, trips and payments to the
+# archive tables by `manage.py archive_rides`, RIDES_ARCHIVE_BATCH_SIZE
+# rides per transaction. Payment history views read both.
+RIDES_ARCHIVE_AFTER_DAYS = 90
+RIDES_ARCHIVE_BATCH_SIZE = 200
+
+# Share of the requests whose SQL and template time are recorded by
+# rides.middleware.PerformanceMiddleware, every request records its wall
+# time and size. metrics/ is readable by staff, or by a scraper sending
+# "Authorization: Bearer <RIDES_METRICS_TOKEN>" when a token is set.
+RIDES_METRICS_SAMPLE_RATE = 0.1
+RIDES_METRICS_TOKEN = os.environ.get('RIDES_METRICS_TOKEN', '')
+
+# Queries slower than RIDES_SLOW_QUERY_MS (None turns it off) are logged
+# as JSON lines to RIDES_SLOW_QUERY_LOG, a RIDES_SLOW_QUERY_EXPLAIN_RATE
+# share of them with their plan. EXPLAIN ANALYZE runs the query again.
+# Read the log grouped by query with `manage.py slow_queries`.
+RIDES_SLOW_QUERY_MS = 100
+RIDES_SLOW_QUERY_EXPLAIN_RATE = 0.1
+RIDES_SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.jsonl')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.FileHandler',
+            'filename': RIDES_SLOW_QUERY_LOG,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'rides.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -47,10 +47,17 @@ urlpatterns = [
     # url sets including from accounts app
     path("user/", include("accounts.urls")),
 
+    # url sets for version 1 of the JSON API
+    path("api/v1/", include("rides.api_urls")),
+
     # url sets including from rides app
     path("", include("rides.urls")),
 ]
 
+# serving the read only ride views asynchronously under ASGI
+if settings.RIDES_ASYNC_VIEWS:
+    urlpatterns.insert(-1, path("", include("rides.async_urls")))
+
 # adding media setting to urls
 if settings.DEBUG:
     urlpatterns += static(
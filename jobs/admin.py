@@ -0,0 +1,5 @@
+from django.contrib import admin
+from .models import Job
+
+# registering Job model for admin dashboard
+admin.site.register(Job)
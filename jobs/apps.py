@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    '''Configurations for jobs app'''
+    name = 'jobs'
+
+    def ready(self):
+        '''registering the jobs defined in the tasks module of every app'''
+        autodiscover_modules("tasks")
@@ -0,0 +1,64 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim, run
+
+
+class Command(BaseCommand):
+    '''
+    Command running queued jobs with --concurrency worker threads.
+    Workers sleep --poll-interval seconds when the queue is empty,
+    with --burst the command exits once no job is due.
+    SIGTERM/SIGINT let the running jobs finish before exiting.
+    '''
+    help = "Run background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--poll-interval", type=float, default=1)
+        parser.add_argument("--burst", action="store_true")
+
+    def work(self, worker, options, stop):
+        '''method run by every worker thread'''
+        done = failed = 0
+        while not stop.is_set():
+            close_old_connections()
+            jobs = claim(worker)
+            if not jobs:
+                if options["burst"]:
+                    break
+                stop.wait(options["poll_interval"])
+                continue
+            for claimed_job in jobs:
+                if run(claimed_job):
+                    done += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"{worker}: {claimed_job} failed")
+        close_old_connections()
+        self.stdout.write(f"{worker}: {done} done, {failed} failed")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *args: stop.set())
+
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        workers = [
+            threading.Thread(
+                target=self.work,
+                args=(f"{prefix}-{number}", options, stop),
+            )
+            for number in range(options["concurrency"])
+        ]
+        for worker in workers:
+            worker.start()
+        # joining with a timeout keeps the main thread able to get signals
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(0.5)
@@ -0,0 +1,46 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Model for work run in the background by the run_jobs command"""
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # enqueueing a key already in the table returns the existing job
+    key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    status = models.CharField(max_length=20, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        '''Meta class for Job model'''
+        indexes = [
+            # jobs waiting for a worker, by due time
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='Queued'),
+                name='job_queued_idx'
+            ),
+            # jobs claimed by a worker, to take back expired leases
+            models.Index(
+                fields=['locked_at'],
+                condition=Q(status='Running'),
+                name='job_running_idx'
+            ),
+        ]
+
+    def __str__(self):
+        '''Method for string representation'''
+        return f"{self.name} #{self.pk} {self.status}"
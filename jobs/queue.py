@@ -0,0 +1,146 @@
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+# registered job functions by name, filled by the job decorator
+registry = {}
+
+
+def job(name):
+    '''
+    Decorator registering a function as a background job:
+
+        @job("rides.generate_payments")
+        def generate_payments(ride_id):
+            ...
+
+    Jobs are looked up in the tasks module of every installed app.
+    Arguments are passed as keyword arguments and must be JSON.
+    '''
+    def register(function):
+        registry[name] = function
+        return function
+    return register
+
+
+def enqueue(name, key=None, run_at=None, max_attempts=None, **kwargs):
+    '''
+    Function to queue a job, inside the current transaction so
+    the job only exists if the work that queued it commits.
+    With a key, queueing the same key again returns the first job.
+    '''
+    if name not in registry:
+        raise KeyError(f"Unknown job {name}")
+    fields = {
+        "name": name,
+        "kwargs": kwargs,
+        "run_at": run_at or timezone.now(),
+        "max_attempts": max_attempts or getattr(
+            settings, "JOBS_MAX_ATTEMPTS", 5
+        ),
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    queued, _ = Job.objects.get_or_create(key=key, defaults=fields)
+    return queued
+
+
+def lease():
+    '''Function to return how long a claimed job stays with its worker'''
+    return timedelta(seconds=getattr(settings, "JOBS_LEASE_SECONDS", 300))
+
+
+def claimable(now):
+    '''
+    Function to return the filter of jobs a worker may take: due
+    queued jobs and running jobs whose worker let the lease expire
+    '''
+    return Q(status=Job.QUEUED, run_at__lte=now) | Q(
+        status=Job.RUNNING,
+        locked_at__lt=now - lease(),
+        attempts__lt=F("max_attempts"),
+    )
+
+
+def claim(worker, limit=1):
+    '''
+    Function to hand up to limit due jobs to a worker.
+    On PostgreSQL rows are locked with FOR UPDATE SKIP LOCKED so
+    concurrent workers never wait on or take each other's jobs.
+    Databases without SKIP LOCKED (SQLite) claim with a conditional
+    update per job, a job taken by another worker meanwhile is skipped.
+    '''
+    now = timezone.now()
+    claimed = {
+        "status": Job.RUNNING,
+        "locked_by": worker,
+        "locked_at": now,
+        "attempts": F("attempts") + 1,
+    }
+    due = Job.objects.filter(claimable(now)).order_by("run_at", "id")
+    connection = connections[router.db_for_write(Job)]
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                due.select_for_update(skip_locked=True)
+                .values_list("id", flat=True)[:limit]
+            )
+            Job.objects.filter(pk__in=ids).update(**claimed)
+    else:
+        ids = []
+        for job_id in due.values_list("id", flat=True)[:limit]:
+            taken = Job.objects.filter(claimable(now), pk=job_id).update(
+                **claimed
+            )
+            if taken:
+                ids.append(job_id)
+    return list(Job.objects.filter(pk__in=ids).order_by("run_at", "id"))
+
+
+def backoff(attempts):
+    '''Function to return the delay before retrying a failed job'''
+    base = getattr(settings, "JOBS_RETRY_BACKOFF", 10)
+    delay = min(base * 2 ** (attempts - 1), 60 * 60)
+    # jitter spreads the retries of jobs which failed together
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def run(claimed_job):
+    '''
+    Function to run a claimed job in a transaction and record the
+    outcome, failed jobs are queued again with a growing delay
+    until they run out of attempts. Returns True on success.
+    '''
+    mine = Job.objects.filter(
+        pk=claimed_job.pk, locked_by=claimed_job.locked_by
+    )
+    try:
+        function = registry[claimed_job.name]
+        # the work and its Done mark commit together
+        with transaction.atomic():
+            function(**claimed_job.kwargs)
+            mine.update(status=Job.DONE, finished=timezone.now())
+    except Exception:
+        error = traceback.format_exc()
+        if claimed_job.attempts >= claimed_job.max_attempts:
+            mine.update(
+                status=Job.FAILED,
+                last_error=error,
+                finished=timezone.now(),
+            )
+        else:
+            mine.update(
+                status=Job.QUEUED,
+                last_error=error,
+                run_at=timezone.now() + backoff(claimed_job.attempts),
+            )
+        return False
+    return True
@@ -0,0 +1,126 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import backoff, claim, enqueue, registry, run
+
+calls = []
+
+
+def record(**kwargs):
+    calls.append(kwargs)
+
+
+def fail(**kwargs):
+    raise ValueError("broken")
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_BACKOFF=10)
+class QueueTests(TestCase):
+    '''Tests queueing, claiming and running of background jobs'''
+
+    def setUp(self):
+        calls.clear()
+        patcher = mock.patch.dict(
+            registry, {"tests.record": record, "tests.fail": fail}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_key_queues_a_job_once(self):
+        first = enqueue("tests.record", key="ride:1", ride_id=1)
+        again = enqueue("tests.record", key="ride:1", ride_id=2)
+        self.assertEqual(first.pk, again.pk)
+        self.assertEqual(Job.objects.get().kwargs, {"ride_id": 1})
+        enqueue("tests.record", ride_id=1)
+        enqueue("tests.record", ride_id=1)
+        self.assertEqual(Job.objects.count(), 3)
+
+    def test_job_of_rolled_back_work_does_not_exist(self):
+        with transaction.atomic():
+            enqueue("tests.record", key="ride:1")
+            transaction.set_rollback(True)
+        self.assertFalse(Job.objects.exists())
+
+    def test_unknown_job_is_refused(self):
+        with self.assertRaises(KeyError):
+            enqueue("tests.missing")
+
+    def test_claim_hands_each_job_to_one_worker(self):
+        due = [enqueue("tests.record", number=number) for number in range(3)]
+        enqueue("tests.record", run_at=timezone.now() + timedelta(hours=1))
+
+        first = claim("a", limit=2)
+        second = claim("b", limit=2)
+        self.assertEqual([job.pk for job in first], [due[0].pk, due[1].pk])
+        self.assertEqual([job.pk for job in second], [due[2].pk])
+        self.assertEqual(claim("c", limit=2), [])
+        for claimed_job in first + second:
+            self.assertEqual(claimed_job.status, Job.RUNNING)
+            self.assertEqual(claimed_job.attempts, 1)
+
+    def test_claim_with_skip_locked(self):
+        # SQLite leaves out FOR UPDATE, the PostgreSQL code path still runs
+        jobs = [enqueue("tests.record", number=number) for number in range(2)]
+        with mock.patch.object(
+            connection.features, "has_select_for_update_skip_locked", True
+        ):
+            claimed = claim("a", limit=1)
+            self.assertEqual([job.pk for job in claimed], [jobs[0].pk])
+            self.assertEqual(claimed[0].locked_by, "a")
+            self.assertEqual(
+                [job.pk for job in claim("b", limit=5)], [jobs[1].pk]
+            )
+
+    def test_expired_lease_is_taken_by_another_worker(self):
+        queued = enqueue("tests.record")
+        claim("a")
+        self.assertEqual(claim("b"), [])
+        Job.objects.filter(pk=queued.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        (taken,) = claim("b")
+        self.assertEqual(taken.locked_by, "b")
+        self.assertEqual(taken.attempts, 2)
+        # the first worker lost the job, its outcome is not recorded
+        stale = Job.objects.get(pk=queued.pk)
+        stale.locked_by = "a"
+        run(stale)
+        self.assertEqual(Job.objects.get(pk=queued.pk).status, Job.RUNNING)
+
+    def test_run_marks_done(self):
+        enqueue("tests.record", ride_id=7)
+        self.assertTrue(run(claim("a")[0]))
+        self.assertEqual(calls, [{"ride_id": 7}])
+        done = Job.objects.get()
+        self.assertEqual(done.status, Job.DONE)
+        self.assertIsNotNone(done.finished)
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        queued = enqueue("tests.fail")
+        before = timezone.now()
+        self.assertFalse(run(claim("a")[0]))
+        retried = Job.objects.get(pk=queued.pk)
+        self.assertEqual(retried.status, Job.QUEUED)
+        self.assertIn("ValueError: broken", retried.last_error)
+        self.assertGreaterEqual(retried.run_at, before + timedelta(seconds=8))
+        # not due again until the backoff passed
+        self.assertEqual(claim("a"), [])
+
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        self.assertFalse(run(claim("a")[0]))
+        failed = Job.objects.get(pk=queued.pk)
+        self.assertEqual(failed.status, Job.FAILED)
+        self.assertEqual(failed.attempts, 2)
+        self.assertEqual(claim("a"), [])
+
+    def test_backoff_doubles_with_jitter_up_to_an_hour(self):
+        for attempts, seconds in ((1, 10), (2, 20), (4, 80), (20, 3600)):
+            with self.subTest(attempts=attempts):
+                delay = backoff(attempts).total_seconds()
+                self.assertGreaterEqual(delay, seconds * 0.8)
+                self.assertLessEqual(delay, seconds * 1.2)
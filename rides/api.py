@@ -0,0 +1,424 @@
+from datetime import timedelta
+from operator import attrgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+
+from .fulltext import search_terms
+from .loaders import loaders_for
+from .models import (
+    DailySummary,
+    Payment,
+    Request,
+    Ride,
+    Trip,
+    UserSummary,
+)
+from .pagination import CursorPaginator, InvalidCursor
+from .search import keyword_search
+
+# compact separators, the API is read by machines
+JSON_PARAMS = {"separators": (",", ":")}
+# ids outside the range of a bigint overflow the database driver
+MIN_ID, MAX_ID = -2 ** 63, 2 ** 63 - 1
+
+RIDE_FIELDS = {
+    "id": attrgetter("id"),
+    "title": attrgetter("title"),
+    "driver": attrgetter("driver.username"),
+    "source_location": attrgetter("source_location"),
+    "destination_location": attrgetter("destination_location"),
+    "start_time": attrgetter("start_time"),
+    "end_time": attrgetter("end_time"),
+    "distance": attrgetter("distance"),
+    "price_per_km": attrgetter("price_per_km"),
+    "number_of_seats": attrgetter("number_of_seats"),
+    "seats_booked": attrgetter("seats_booked"),
+    "status": attrgetter("status"),
+    "is_active": attrgetter("is_active"),
+    "car_name": attrgetter("car_name"),
+    "car_number": attrgetter("car_number"),
+    "description": attrgetter("description"),
+    "ride_created_time": attrgetter("ride_created_time"),
+}
+
+REQUEST_FIELDS = {
+    "id": attrgetter("id"),
+    "ride": attrgetter("ride_id"),
+    "user_requested": attrgetter("user_requested.username"),
+    "status": attrgetter("status"),
+    "comments": attrgetter("comments"),
+    "request_created_time": attrgetter("request_created_time"),
+}
+
+TRIP_FIELDS = {
+    "id": attrgetter("id"),
+    "ride": attrgetter("ride_id"),
+    "rider": attrgetter("rider.username"),
+}
+
+PAYMENT_FIELDS = {
+    "id": attrgetter("id"),
+    "ride": attrgetter("ride_id"),
+    "rider": attrgetter("rider.username"),
+    "amount": attrgetter("amount"),
+    "status": attrgetter("status"),
+    "generated_time": attrgetter("generated_time"),
+}
+
+SUMMARY_FIELDS = {
+    name: attrgetter(name) for name in (
+        "billed", "paid", "outstanding", "earned", "received",
+        "receivable", "rides_driven", "trips_taken",
+    )
+}
+
+
+class ApiError(Exception):
+    '''Raised by API views to answer with a JSON error'''
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class ApiView(View):
+    '''
+    Base view for the read only JSON API.
+    Answers 401 instead of redirecting anonymous users to the login
+    page and supports field selection with ?fields=a,b
+    '''
+    fields = {}
+    queryset = None
+
+    def get_queryset(self):
+        '''method to return the objects served by the view'''
+        return self.queryset.all()
+
+    def dispatch(self, request, *args, **kwargs):
+        '''method to turn errors into JSON responses'''
+        if not request.user.is_authenticated:
+            return self.error("Authentication required", 401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return self.error(error.message, error.status)
+        except Http404:
+            return self.error("Not found", 404)
+
+    @staticmethod
+    def error(message, status):
+        '''method to build a JSON error response'''
+        return JsonResponse(
+            {"error": message}, status=status, json_dumps_params=JSON_PARAMS
+        )
+
+    def selected_fields(self):
+        '''method to return the getters of the requested fields'''
+        names = self.request.GET.get("fields")
+        if not names:
+            return self.fields
+        names = [name.strip() for name in names.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+        return {name: self.fields[name] for name in names}
+
+    @staticmethod
+    def serialize(obj, fields):
+        '''method to turn an object into a dict of the selected fields'''
+        return {name: getter(obj) for name, getter in fields.items()}
+
+
+class ApiListView(ApiView):
+    '''
+    Cursor paginated list of objects:
+    {"results": [...], "next": <cursor>, "previous": <cursor>}
+    '''
+    ordering = None
+    default_limit = 20
+    max_limit = 100
+
+    def get_limit(self):
+        '''method to return the page size requested with ?limit='''
+        try:
+            limit = int(self.request.GET.get("limit", self.default_limit))
+        except ValueError:
+            raise ApiError("limit must be a number")
+        return min(max(limit, 1), self.max_limit)
+
+    def get(self, request, *args, **kwargs):
+        '''method to return one page of objects'''
+        fields = self.selected_fields()
+        paginator = CursorPaginator(
+            self.get_queryset(), self.get_limit(), self.ordering
+        )
+        try:
+            page = paginator.page(request.GET.get("cursor"))
+        except InvalidCursor:
+            raise ApiError("Invalid cursor")
+        return JsonResponse(
+            {
+                "results": [self.serialize(obj, fields) for obj in page],
+                "next": page.next_cursor,
+                "previous": page.previous_cursor,
+            },
+            json_dumps_params=JSON_PARAMS,
+        )
+
+
+class ApiDetailView(ApiView):
+    '''Single object by primary key'''
+
+    def get(self, request, pk, *args, **kwargs):
+        '''method to return the object with primary key pk'''
+        fields = self.selected_fields()
+        obj = self.get_queryset().filter(pk=pk).first()
+        if obj is None:
+            raise Http404
+        return JsonResponse(
+            self.serialize(obj, fields), json_dumps_params=JSON_PARAMS
+        )
+
+
+class RideApiMixin:
+    '''Rides visible through the API, all active ones'''
+    fields = RIDE_FIELDS
+
+    def get_queryset(self):
+        '''queryset of active rides with their drivers'''
+        return Ride.objects.filter(is_active=True).select_related("driver")
+
+
+class RideListApiView(RideApiMixin, ApiListView):
+    '''API view to list active rides, newest first'''
+    ordering = ("-ride_created_time", "-id")
+
+
+class RideSearchApiView(RideApiMixin, ApiListView):
+    '''
+    API view to search active rides by keywords with ?q=, best
+    matches first, each with the rank of its match
+    '''
+    fields = {**RIDE_FIELDS, "rank": attrgetter("rank")}
+    ordering = ("-rank", "id")
+
+    def get_queryset(self):
+        '''queryset of the active rides matching every keyword'''
+        text = self.request.GET.get("q", "").strip()
+        if not text:
+            raise ApiError("q is required")
+        if not search_terms(text):
+            raise ApiError("q must contain a word")
+        return keyword_search(text, super().get_queryset())
+
+
+class RideDetailApiView(RideApiMixin, ApiDetailView):
+    '''API view for a single ride'''
+
+    def get_queryset(self):
+        '''queryset of all rides, finished ones included'''
+        return Ride.objects.select_related("driver")
+
+
+class RequestListApiView(ApiListView):
+    '''API view to list requests made by or for the rides of the user'''
+    fields = REQUEST_FIELDS
+    ordering = ("-request_created_time", "-id")
+
+    def get_queryset(self):
+        '''queryset of the requests of the user'''
+        user = self.request.user
+        return Request.objects.filter(
+            Q(user_requested=user) | Q(ride__driver=user)
+        ).select_related("user_requested")
+
+
+class TripListApiView(ApiListView):
+    '''API view to list the trips of the user as rider or driver'''
+    fields = TRIP_FIELDS
+    ordering = ("-id",)
+
+    def get_queryset(self):
+        '''queryset of the trips of the user'''
+        user = self.request.user
+        return Trip.objects.filter(
+            Q(rider=user) | Q(ride__driver=user)
+        ).select_related("rider")
+
+
+class PaymentListApiView(ApiListView):
+    '''API view to list the payments made or received by the user'''
+    fields = PAYMENT_FIELDS
+    ordering = ("-generated_time", "-id")
+
+    def get_queryset(self):
+        '''queryset of the payments of the user'''
+        user = self.request.user
+        return Payment.objects.filter(
+            Q(rider=user) | Q(ride__driver=user)
+        ).select_related("rider")
+
+
+class RideExportApiView(RideApiMixin, ApiView):
+    '''
+    API view streaming every active ride as newline delimited JSON.
+    Rows are read in chunks through a server side cursor so memory
+    stays flat and the first bytes go out right away.
+    '''
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        '''method to stream the rides one JSON document per line'''
+        fields = self.selected_fields()
+        rides = self.get_queryset().order_by("id")
+        encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+        def lines():
+            for ride in rides.iterator(chunk_size=self.chunk_size):
+                yield encoder.encode(self.serialize(ride, fields)) + "\n"
+
+        response = StreamingHttpResponse(
+            lines(), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = 'attachment; filename="rides.ndjson"'
+        return response
+
+
+class RideBatchApiView(ApiView):
+    '''
+    API view to fetch many rides in one round trip:
+    ?ids=1,2,3&include=driver,riders,seats
+    Lookups go through the request data loaders, so rides, users
+    and trips cost one query each whatever the number of ids.
+    '''
+    fields = {
+        name: getter for name, getter in RIDE_FIELDS.items()
+        if name not in ("driver", "seats_booked", "number_of_seats")
+    }
+    includes = ("driver", "riders", "seats")
+    max_ids = 100
+
+    def parse_list(self, name, convert=str):
+        '''method to read a comma separated query parameter'''
+        values = self.request.GET.get(name, "")
+        try:
+            return [convert(value) for value in values.split(",") if value]
+        except ValueError:
+            raise ApiError(f"{name} must be a comma separated list")
+
+    def get(self, request, *args, **kwargs):
+        '''method to return the requested rides in the order of ids'''
+        fields = self.selected_fields()
+        ids = list(dict.fromkeys(self.parse_list("ids", int)))
+        if any(not MIN_ID <= ride_id <= MAX_ID for ride_id in ids):
+            raise ApiError("ids must be 64 bit integers")
+        if not ids:
+            raise ApiError("ids is required")
+        if len(ids) > self.max_ids:
+            raise ApiError(f"At most {self.max_ids} ids per request")
+        includes = set(self.parse_list("include"))
+        unknown = includes.difference(self.includes)
+        if unknown:
+            raise ApiError(f"Unknown includes: {', '.join(sorted(unknown))}")
+
+        loaders = loaders_for(request)
+        rides = [ride for ride in loaders.rides.load_many(ids) if ride]
+        ride_ids = [ride.id for ride in rides]
+        rider_ids = {}
+        if "riders" in includes:
+            rider_ids = dict(zip(
+                ride_ids, loaders.rider_ids.load_many(ride_ids)
+            ))
+        user_ids = []
+        if "driver" in includes:
+            user_ids += [ride.driver_id for ride in rides]
+        for riders in rider_ids.values():
+            user_ids += riders or []
+        # drivers and riders are resolved with a single users query
+        users = dict(zip(user_ids, loaders.users.load_many(user_ids)))
+
+        results = []
+        for ride in rides:
+            data = self.serialize(ride, fields)
+            if "driver" in includes:
+                data["driver"] = self.user_data(users[ride.driver_id])
+            if "riders" in includes:
+                data["riders"] = [
+                    self.user_data(users[rider_id])
+                    for rider_id in rider_ids[ride.id] or []
+                ]
+            if "seats" in includes:
+                data["number_of_seats"] = ride.number_of_seats
+                data["seats_booked"] = ride.seats_booked
+            results.append(data)
+        return JsonResponse(
+            {
+                "results": results,
+                "missing": sorted(set(ids).difference(ride_ids)),
+            },
+            json_dumps_params=JSON_PARAMS,
+        )
+
+    @staticmethod
+    def user_data(user):
+        '''method to serialize a driver or rider'''
+        return {"id": user.id, "username": user.username}
+
+
+class SummaryApiView(ApiView):
+    '''
+    API view for the running totals of the user, one primary key
+    lookup whatever their history, kept by rides.summary
+    '''
+    fields = SUMMARY_FIELDS
+
+    def get(self, request, *args, **kwargs):
+        '''method to return the totals of the user'''
+        fields = self.selected_fields()
+        summary = UserSummary.objects.filter(user=request.user).first()
+        return JsonResponse(
+            self.serialize(summary or UserSummary(), fields),
+            json_dumps_params=JSON_PARAMS,
+        )
+
+
+class DailySummaryApiView(ApiView):
+    '''
+    API view for the day buckets of the user over the last ?days=
+    days, oldest first. Days without rides are left out.
+    '''
+    fields = SUMMARY_FIELDS
+    default_days = 30
+    max_days = 366
+
+    def get_days(self):
+        '''method to return the number of days requested with ?days='''
+        try:
+            days = int(self.request.GET.get("days", self.default_days))
+        except ValueError:
+            raise ApiError("days must be a number")
+        return min(max(days, 1), self.max_days)
+
+    def get(self, request, *args, **kwargs):
+        '''method to return the buckets of the user'''
+        fields = self.selected_fields()
+        today = timezone.localdate()
+        buckets = DailySummary.objects.filter(
+            user=request.user,
+            day__gt=today - timedelta(days=self.get_days()),
+            day__lte=today,
+        ).order_by("day")
+        return JsonResponse(
+            {
+                "results": [
+                    {"day": bucket.day, **self.serialize(bucket, fields)}
+                    for bucket in buckets
+                ],
+            },
+            json_dumps_params=JSON_PARAMS,
+        )
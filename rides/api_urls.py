@@ -0,0 +1,86 @@
+from django.urls import path
+from .api import (
+    RideListApiView,
+    RideDetailApiView,
+    RideExportApiView,
+    RideBatchApiView,
+    RideSearchApiView,
+    RequestListApiView,
+    TripListApiView,
+    PaymentListApiView,
+    SummaryApiView,
+    DailySummaryApiView,
+)
+
+# url patterns for version 1 of the JSON API
+urlpatterns = [
+    # url pattern to list active rides
+    path(
+        "rides/",
+        RideListApiView.as_view(),
+        name="api-rides"
+    ),
+
+    # url pattern to search active rides by keywords
+    path(
+        "rides/search/",
+        RideSearchApiView.as_view(),
+        name="api-rides-search"
+    ),
+
+    # url pattern to stream all active rides as NDJSON
+    path(
+        "rides/export.ndjson",
+        RideExportApiView.as_view(),
+        name="api-rides-export"
+    ),
+
+    # url pattern to fetch many rides at once
+    path(
+        "rides/batch/",
+        RideBatchApiView.as_view(),
+        name="api-rides-batch"
+    ),
+
+    # url pattern for a single ride
+    path(
+        "rides/<int:pk>/",
+        RideDetailApiView.as_view(),
+        name="api-ride-detail"
+    ),
+
+    # url pattern to list requests of user
+    path(
+        "requests/",
+        RequestListApiView.as_view(),
+        name="api-requests"
+    ),
+
+    # url pattern to list trips of user
+    path(
+        "trips/",
+        TripListApiView.as_view(),
+        name="api-trips"
+    ),
+
+    # url pattern to list payments of user
+    path(
+        "payments/",
+        PaymentListApiView.as_view(),
+        name="api-payments"
+    ),
+
+    # url pattern for the running totals of user
+    path(
+        "summary/",
+        SummaryApiView.as_view(),
+        name="api-summary"
+    ),
+
+    # url pattern for the day by day totals of user
+    path(
+        "summary/daily/",
+        DailySummaryApiView.as_view(),
+        name="api-summary-daily"
+    ),
+]
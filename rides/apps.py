@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class RidesConfig(AppConfig):
     '''Configurations for rides app'''
     name = 'rides'
+
+    def ready(self):
+        '''
+        using signals to keep the ride cache versions current,
+        to log slow queries of every new database connection and
+        to keep the full text triggers of rides after migrations
+        '''
+        import rides.signals # noqa
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+        from rides.fulltext import ensure_installed
+
+        post_migrate.connect(ensure_installed, sender=self)
+
+        if getattr(settings, "RIDES_SLOW_QUERY_MS", None) is not None:
+            from rides.slowlog import install
+            connection_created.connect(install)
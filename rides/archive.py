@@ -0,0 +1,225 @@
+import heapq
+from datetime import timedelta
+from functools import cmp_to_key
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import IntegerField, Value
+from django.utils import timezone
+
+from .cache import bump_ride_version
+from .models import (
+    ArchivedPayment,
+    ArchivedRequest,
+    ArchivedRide,
+    ArchivedTrip,
+    Payment,
+    Request,
+    Ride,
+    Trip,
+)
+
+# hot models and where their rows are archived, children first
+ARCHIVES = (
+    (Payment, ArchivedPayment),
+    (Trip, ArchivedTrip),
+    (Request, ArchivedRequest),
+)
+
+
+def archivable(now=None):
+    '''
+    Function to return the rides to archive: out of the active feed,
+    ended RIDES_ARCHIVE_AFTER_DAYS ago and with every payment settled,
+    unpaid ones stay where they can be paid
+    '''
+    now = now or timezone.now()
+    days = getattr(settings, "RIDES_ARCHIVE_AFTER_DAYS", 90)
+    unpaid = Payment.objects.exclude(status="Paid").values("ride_id")
+    return Ride.objects.filter(
+        is_active=False, end_time__lt=now - timedelta(days=days)
+    ).exclude(pk__in=unpaid)
+
+
+def _copy(queryset, model):
+    '''
+    Function to insert the rows of queryset into model, with the
+    same ids, returns how many were copied
+    '''
+    source = {field.attname for field in queryset.model._meta.concrete_fields}
+    names = [
+        field.attname for field in model._meta.concrete_fields
+        if field.attname in source
+    ]
+    rows = [model(**values) for values in queryset.values(*names)]
+    model.objects.bulk_create(rows)
+    return len(rows)
+
+
+def archive_batch(batch_size, now=None):
+    '''
+    Function to move up to batch_size rides with their requests, trips
+    and payments into the archive tables in one transaction. Rides
+    are copied before their children and deleted after them.
+    Returns the number of rides archived.
+    '''
+    with transaction.atomic():
+        ids = list(
+            archivable(now).select_for_update().order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        _copy(Ride.objects.filter(pk__in=ids), ArchivedRide)
+        for model, archive in ARCHIVES:
+            _copy(model.objects.filter(ride_id__in=ids), archive)
+        for model, archive in ARCHIVES:
+            model.objects.filter(ride_id__in=ids).delete()
+        Ride.objects.filter(pk__in=ids).delete()
+        for ride_id in ids:
+            bump_ride_version(ride_id)
+    return len(ids)
+
+
+def archive_rides(batch_size, limit=None, now=None):
+    '''
+    Function to archive batch after batch until nothing is left or
+    limit rides were archived, yielding the count of every batch.
+    Every batch commits on its own, an interrupted run loses nothing.
+    '''
+    now = now or timezone.now()
+    total = 0
+    while limit is None or total < limit:
+        size = batch_size if limit is None else min(
+            batch_size, limit - total
+        )
+        archived = archive_batch(size, now)
+        if not archived:
+            return
+        total += archived
+        yield archived
+
+
+class CombinedQuerySet:
+    '''
+    Read only union of a hot queryset and its archived counterpart,
+    over models with the same field names. It supports what the list
+    views and paginators use: filter, select_related, order_by, count,
+    slicing and iteration. Slices are ordered and limited in the
+    database with a UNION ALL of both sides, iteration merges them.
+    '''
+
+    def __init__(self, hot, archived, ordering=()):
+        self.hot = hot
+        self.archived = archived
+        self.ordering = tuple(ordering)
+
+    @property
+    def model(self):
+        '''the hot model, whose fields the archived one shares'''
+        return self.hot.model
+
+    @property
+    def ordered(self):
+        return bool(self.ordering)
+
+    def _apply(self, method, *args, **kwargs):
+        return CombinedQuerySet(
+            getattr(self.hot, method)(*args, **kwargs),
+            getattr(self.archived, method)(*args, **kwargs),
+            self.ordering,
+        )
+
+    def filter(self, *args, **kwargs):
+        '''method to filter both sides'''
+        return self._apply("filter", *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        '''method to exclude from both sides'''
+        return self._apply("exclude", *args, **kwargs)
+
+    def select_related(self, *fields):
+        '''method to follow the same relations on both sides'''
+        return self._apply("select_related", *fields)
+
+    def order_by(self, *names):
+        '''method to order both sides and their merge'''
+        combined = self._apply("order_by", *names)
+        combined.ordering = names
+        return combined
+
+    def count(self):
+        '''method to count the rows of both sides'''
+        return self.hot.count() + self.archived.count()
+
+    def exists(self):
+        '''method to check if either side has rows'''
+        return self.hot.exists() or self.archived.exists()
+
+    def _compare(self, first, second):
+        for name in self.ordering:
+            attname = name.lstrip("-")
+            left, right = getattr(first, attname), getattr(second, attname)
+            if left == right:
+                continue
+            result = -1 if left < right else 1
+            return -result if name.startswith("-") else result
+        return 0
+
+    def _merge(self):
+        return heapq.merge(
+            self.hot, self.archived, key=cmp_to_key(self._compare)
+        )
+
+    def _slice(self, start, stop):
+        '''
+        method to read the rows [start:stop] in order: the keys of both
+        sides are combined with UNION ALL, ordered and sliced by the
+        database, then the rows of each side are fetched by id
+        '''
+        names = [name.lstrip("-") for name in self.ordering]
+        columns = [*names, *(["id"] if "id" not in names else []), "side"]
+        hot, archived = (
+            queryset.order_by().annotate(
+                side=Value(number, output_field=IntegerField())
+            ).values_list(*columns)
+            for number, queryset in enumerate((self.hot, self.archived))
+        )
+        keys = hot.union(archived, all=True).order_by(*self.ordering)
+        position = columns.index("id")
+        keys = [(row[position], row[-1]) for row in keys[start:stop]]
+        rows = {}
+        for number, queryset in enumerate((self.hot, self.archived)):
+            ids = [pk for pk, side in keys if side == number]
+            if ids:
+                rows.update(
+                    ((number, row.pk), row)
+                    for row in queryset.filter(pk__in=ids)
+                )
+        return [rows[side, pk] for pk, side in keys]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is not None:
+                raise ValueError("Slices with a step are not supported")
+            return self._slice(index.start or 0, index.stop)
+        rows = self._slice(index, index + 1)
+        if not rows:
+            raise IndexError("CombinedQuerySet index out of range")
+        return rows[0]
+
+    def __iter__(self):
+        return iter(self._merge())
+
+    def __len__(self):
+        return self.count()
+
+
+def payment_history():
+    '''
+    Function to return the payments of the hot and archive tables
+    as one read only queryset, for the payment history views
+    '''
+    return CombinedQuerySet(
+        Payment.objects.all(), ArchivedPayment.objects.all()
+    )
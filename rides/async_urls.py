@@ -0,0 +1,63 @@
+from django.urls import path
+from .async_views import (
+    ride_list,
+    ride_detail,
+    user_ride_list,
+    user_requests_list,
+    user_requested_list,
+    user_payment_list,
+    user_payment_recieved_list,
+)
+
+# async url patterns for the read only views, used under ASGI
+# in front of rides.urls when settings.RIDES_ASYNC_VIEWS is set
+urlpatterns = [
+    # url pattern for homepage
+    path(
+        "",
+        ride_list,
+        name="home"
+    ),
+
+    # url pattern for rides of user
+    path(
+        "user/<str:username>",
+        user_ride_list,
+        name="user-rides"
+    ),
+
+    # url pattern for ride details
+    path(
+        "ride/<int:pk>/",
+        ride_detail,
+        name="ride-detail"
+    ),
+
+    # url pattern to list requests of user
+    path(
+        "requests/",
+        user_requests_list,
+        name="user-requests"
+    ),
+
+    # url pattern to list requests by user
+    path(
+        "requested_list/",
+        user_requested_list,
+        name="user-requested"
+    ),
+
+    # url pattern to list payments of user
+    path(
+        "payment_list/",
+        user_payment_list,
+        name="user-payments"
+    ),
+
+    # url pattern to list payments recieved by a user
+    path(
+        "payment_recieved/",
+        user_payment_recieved_list,
+        name="user-payment-recieved"
+    ),
+]
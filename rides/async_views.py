@@ -0,0 +1,168 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.http import Http404
+from django.template.response import TemplateResponse
+
+from .models import Request
+from .views import (
+    RideListView,
+    RideDetailView,
+    UserRideListView,
+    UserRequestsListView,
+    UserRequestedListView,
+    UserPaymentListView,
+    UserPaymentRecievedListView,
+)
+
+# bounded pool for blocking ORM work, each thread holds its own connection
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "ASYNC_ORM_THREADS", 8),
+    thread_name_prefix="rides-orm",
+)
+
+
+def _call(function, *args, **kwargs):
+    '''
+    Function running blocking work inside a pool thread. The thread
+    keeps its connection open for the next calls, whatever
+    CONN_MAX_AGE is, so the pool holds at most ASYNC_ORM_THREADS
+    connections. A connection broken by an error is closed first.
+    '''
+    for connection in connections.all():
+        if connection.connection is not None and connection.errors_occurred:
+            if connection.is_usable():
+                connection.errors_occurred = False
+            else:
+                connection.close()
+    return function(*args, **kwargs)
+
+
+async def run_in_pool(function, *args, **kwargs):
+    '''
+    Function to await blocking work run in the bounded ORM pool,
+    in a copy of the context so the replica of the request is read
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, copy_context().run,
+        partial(_call, function, *args, **kwargs)
+    )
+
+
+def _is_authenticated(request):
+    return request.user.is_authenticated
+
+
+async def _fetch_offset_page(paginator, page_number):
+    '''
+    Function to fetch the rows of a page and the total count
+    concurrently instead of one after the other. Page numbers are
+    read as ListView does, "last" included.
+    '''
+    page_number = page_number or 1
+    try:
+        number = int(page_number)
+    except ValueError:
+        if page_number != "last":
+            raise Http404("Invalid page")
+        number = None
+    queryset = paginator.object_list
+
+    def rows(number):
+        bottom = (max(number, 1) - 1) * paginator.per_page
+        return list(queryset[bottom:bottom + paginator.per_page])
+
+    if number is None:
+        # the last page is only known from the count
+        paginator.count = await run_in_pool(queryset.count)
+        number = paginator.num_pages
+        object_list = await run_in_pool(rows, number)
+    else:
+        paginator.count, object_list = await asyncio.gather(
+            run_in_pool(queryset.count), run_in_pool(rows, number)
+        )
+    try:
+        number = paginator.validate_number(number)
+    except InvalidPage as error:
+        raise Http404(str(error))
+    return paginator._get_page(object_list, number, paginator)
+
+
+def async_list_view(view_class):
+    '''
+    Function to build the async version of a rides ListView.
+    The view class still builds the queryset and context, only
+    the blocking parts are awaited in the ORM pool and the page
+    rows and total count are queried concurrently.
+    '''
+    async def view_function(request, *args, **kwargs):
+        if not await run_in_pool(_is_authenticated, request):
+            return redirect_to_login(request.get_full_path())
+        view = view_class()
+        view.setup(request, *args, **kwargs)
+        queryset = await run_in_pool(view.get_queryset)
+        view.object_list = queryset
+
+        if not view.use_cursor_pagination():
+            paginator = view.get_paginator(queryset, view.paginate_by)
+            page = await _fetch_offset_page(
+                paginator, request.GET.get(view.page_kwarg)
+            )
+            prefetched = (
+                paginator, page, page.object_list, page.has_other_pages()
+            )
+            view.paginate_queryset = lambda queryset, page_size: prefetched
+
+        context = await run_in_pool(view.get_context_data)
+        response = TemplateResponse(
+            request, view.get_template_names(), context
+        )
+        return await run_in_pool(response.render)
+
+    view_function.__doc__ = f"async version of {view_class.__name__}"
+    return view_function
+
+
+async def ride_detail(request, pk):
+    '''
+    Async version of RideDetailView, the ride and the
+    already_requested check are fetched concurrently
+    '''
+    if not await run_in_pool(_is_authenticated, request):
+        return redirect_to_login(request.get_full_path())
+    view = RideDetailView()
+    view.setup(request, pk=pk)
+    ride, already_requested = await asyncio.gather(
+        run_in_pool(view.get_object),
+        run_in_pool(
+            lambda: Request.objects.filter(
+                ride=pk, user_requested=request.user
+            ).exists()
+        ),
+    )
+    view.object = ride
+    context = {
+        "object": ride,
+        "ride": ride,
+        "view": view,
+        "already_requested": already_requested,
+    }
+    response = TemplateResponse(
+        request, view.get_template_names(), context
+    )
+    return await run_in_pool(response.render)
+
+
+ride_list = async_list_view(RideListView)
+user_ride_list = async_list_view(UserRideListView)
+user_requests_list = async_list_view(UserRequestsListView)
+user_requested_list = async_list_view(UserRequestedListView)
+user_payment_list = async_list_view(UserPaymentListView)
+user_payment_recieved_list = async_list_view(UserPaymentRecievedListView)
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db import transaction
+
+# counters shown next to the navigation links of a user
+INCOMING_REQUESTS = "incoming_requests"
+OUTGOING_REQUESTS = "outgoing_requests"
+UNPAID_PAYMENTS = "unpaid_payments"
+BADGES = (INCOMING_REQUESTS, OUTGOING_REQUESTS, UNPAID_PAYMENTS)
+
+
+def _key(user_id, name):
+    return f"badges:{user_id}:{name}"
+
+
+def _count(user_id, name):
+    '''Function to count a badge from the database, used on a cache miss'''
+    from .models import Request, Payment
+
+    if name == INCOMING_REQUESTS:
+        return Request.objects.filter(
+            ride__driver_id=user_id, status="Pending"
+        ).count()
+    if name == OUTGOING_REQUESTS:
+        return Request.objects.filter(
+            user_requested_id=user_id, status="Pending"
+        ).count()
+    return Payment.objects.filter(rider_id=user_id).exclude(
+        status="Paid"
+    ).count()
+
+
+def badge_counts(user_id):
+    '''
+    Function to return the badge counters of a user.
+    Counters are kept in the cache and only counted from the
+    database when they are missing from it.
+    '''
+    keys = {_key(user_id, name): name for name in BADGES}
+    found = cache.get_many(keys)
+    counts = {keys[key]: value for key, value in found.items()}
+    missing = {}
+    for key, name in keys.items():
+        if name not in counts:
+            counts[name] = missing[key] = _count(user_id, name)
+    if missing:
+        cache.set_many(missing, None)
+    return counts
+
+
+def adjust_badge(user_id, name, delta):
+    '''
+    Function to move a counter of a user by delta once the current
+    transaction commits. A counter missing from the cache is left
+    alone, it will be counted on its next read.
+    '''
+    def adjust():
+        try:
+            cache.incr(_key(user_id, name), delta)
+        except ValueError:
+            pass
+    transaction.on_commit(adjust)
+
+
+def forget_badges(user_ids):
+    '''
+    Function to drop the counters of users once the current transaction
+    commits, for writes that bypass adjust_badge like bulk loads.
+    They are counted again on their next read.
+    '''
+    keys = [_key(user_id, name) for user_id in user_ids for name in BADGES]
+
+    def forget():
+        cache.delete_many(keys)
+    transaction.on_commit(forget)
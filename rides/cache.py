@@ -0,0 +1,117 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+# cached fragments live for a day unless the ride changes
+FRAGMENT_TIMEOUT = getattr(settings, "RIDE_CACHE_TIMEOUT", 60 * 60 * 24)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _count(outcome):
+    '''Function to record a cache hit or miss'''
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    '''Function to return the hit and miss counters of this process'''
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _version_key(ride_id):
+    return f"ride:{ride_id}:version"
+
+
+def _new_version():
+    # a lost version key must never fall back to a version already used
+    return time.time_ns()
+
+
+def ride_versions(ride_ids):
+    '''Function to return the cache versions of many rides at once'''
+    keys = {_version_key(ride_id): ride_id for ride_id in ride_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    missing = {
+        _version_key(ride_id): _new_version()
+        for ride_id in keys.values() if ride_id not in versions
+    }
+    if missing:
+        cache.set_many(missing, None)
+        versions.update({keys[key]: value for key, value in missing.items()})
+    return versions
+
+
+def ride_version(ride_id):
+    '''Function to return the cache version of a ride'''
+    return ride_versions([ride_id])[ride_id]
+
+
+def prime_ride_versions(rides):
+    '''Function to attach cache versions to rides with one cache read'''
+    rides = list(rides)
+    versions = ride_versions([ride.pk for ride in rides])
+    for ride in rides:
+        ride.cache_version = versions[ride.pk]
+    return rides
+
+
+def bump_ride_version(ride_id):
+    '''
+    Function to invalidate everything cached for a ride.
+    The bump runs after the current transaction commits so no reader
+    can cache the old rows under the new version.
+    '''
+    def bump():
+        try:
+            cache.incr(_version_key(ride_id))
+        except ValueError:
+            cache.set(_version_key(ride_id), _new_version(), None)
+    transaction.on_commit(bump)
+
+
+def fragment_key(ride_id, version, name):
+    return f"ride:{ride_id}:v{version}:{name}"
+
+
+def cached_fragment(ride, name, render):
+    '''
+    Function to return the rendered fragment name of a ride,
+    render is only called on a cache miss
+    '''
+    version = getattr(ride, "cache_version", None) or ride_version(ride.pk)
+    key = fragment_key(ride.pk, version, name)
+    html = cache.get(key)
+    if html is None:
+        _count("misses")
+        html = render()
+        cache.set(key, html, FRAGMENT_TIMEOUT)
+    else:
+        _count("hits")
+    return mark_safe(html)
+
+
+def cached_object(ride_id, name, fetch):
+    '''
+    Function to return a cached object (like a ride with its
+    prefetched trips) for a ride, fetch is only called on a miss
+    '''
+    version = ride_version(ride_id)
+    key = fragment_key(ride_id, version, name)
+    obj = cache.get(key)
+    if obj is None:
+        _count("misses")
+        obj = fetch()
+        cache.set(key, obj, FRAGMENT_TIMEOUT)
+    else:
+        _count("hits")
+    # fragments of this object are cached under the same version
+    obj.cache_version = version
+    return obj
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .badges import badge_counts
+
+
+def badges(request):
+    '''
+    Context processor adding the navigation badge counters
+    of the logged in user, read only when a template uses them
+    '''
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"badges": SimpleLazyObject(lambda: badge_counts(user.id))}
+
+
+def live_events(request):
+    '''
+    Context processor telling the templates whether pages open
+    the live event stream, see RIDES_EVENT_STREAMS
+    '''
+    return {"live_events": settings.RIDES_EVENT_STREAMS}
@@ -0,0 +1,258 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# event types pushed to the live stream of a user
+REQUEST_NEW = "request.new"
+REQUEST_STATUS = "request.status"
+RIDE_SEATS = "ride.seats"
+PAYMENT_NEW = "payment.new"
+
+Event = namedtuple("Event", "id user_id type data")
+
+
+class LocalBroker:
+    '''
+    Broker keeping the recent events of every user in memory and
+    waking up the streams of that user when one is published.
+    Only streams of the same process see the events, use it for
+    tests and single process deployments.
+    '''
+    # events kept per user for streams reconnecting with Last-Event-ID,
+    # for reconnect_window seconds after the last one once no stream
+    # of the user is open
+    history = 100
+    reconnect_window = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._events = defaultdict(lambda: deque(maxlen=self.history))
+        self._delivered = {}
+        self._waiters = defaultdict(set)
+        self._last_prune = time.monotonic()
+
+    def publish(self, user_id, event_type, data):
+        '''method to send an event to the streams of a user'''
+        self._deliver(Event(next(self._ids), user_id, event_type, data))
+
+    def _deliver(self, event):
+        now = time.monotonic()
+        with self._lock:
+            self._events[event.user_id].append(event)
+            self._delivered[event.user_id] = now
+            waiters = list(self._waiters.get(event.user_id, ()))
+            if now - self._last_prune > self.reconnect_window:
+                self._last_prune = now
+                self._prune(now)
+        for wake in waiters:
+            wake()
+
+    def _prune(self, now):
+        '''
+        method to forget the history of the users without an open
+        stream whose last event is older than reconnect_window,
+        called with the lock held
+        '''
+        stale = [
+            user_id for user_id, delivered in self._delivered.items()
+            if now - delivered > self.reconnect_window
+            and user_id not in self._waiters
+        ]
+        for user_id in stale:
+            del self._events[user_id]
+            del self._delivered[user_id]
+
+    def cursor(self, user_id):
+        '''method to return the id of the last event sent to a user'''
+        with self._lock:
+            events = self._events.get(user_id)
+            return events[-1].id if events else 0
+
+    def events_after(self, user_id, last_id):
+        '''
+        method to return the events of a user published after the
+        event last_id. Events are returned in delivery order, ids
+        are only compared when last_id is no longer in the history.
+        '''
+        with self._lock:
+            events = list(self._events.get(user_id, ()))
+        for position, event in enumerate(events):
+            if event.id == last_id:
+                return events[position + 1:]
+        return [event for event in events if event.id > last_id]
+
+    def _subscribe(self, user_id, last_id, wake):
+        with self._lock:
+            self._waiters[user_id].add(wake)
+        return self.events_after(user_id, last_id)
+
+    def _unsubscribe(self, user_id, wake):
+        with self._lock:
+            waiters = self._waiters.get(user_id)
+            if waiters is not None:
+                waiters.discard(wake)
+                if not waiters:
+                    del self._waiters[user_id]
+                    delivered = self._delivered.get(user_id, 0)
+                    if time.monotonic() - delivered > self.reconnect_window:
+                        self._events.pop(user_id, None)
+                        self._delivered.pop(user_id, None)
+
+    def listen(self, user_id, last_id, timeout):
+        '''
+        method blocking the calling thread until the user has events
+        after last_id or timeout seconds passed, returns the events
+        '''
+        flag = threading.Event()
+        wake = flag.set
+        try:
+            events = self._subscribe(user_id, last_id, wake)
+            if not events:
+                flag.wait(timeout)
+                events = self.events_after(user_id, last_id)
+        finally:
+            self._unsubscribe(user_id, wake)
+        return events
+
+    async def alisten(self, user_id, last_id, timeout):
+        '''
+        async version of listen, a waiting stream only costs
+        an asyncio.Event instead of a thread
+        '''
+        loop = asyncio.get_running_loop()
+        flag = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(flag.set)
+
+        try:
+            events = self._subscribe(user_id, last_id, wake)
+            if not events:
+                try:
+                    await asyncio.wait_for(flag.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                events = self.events_after(user_id, last_id)
+        finally:
+            self._unsubscribe(user_id, wake)
+        return events
+
+
+class DatabaseBroker(LocalBroker):
+    '''
+    Broker for deployments running several processes.
+    Events are written to the StreamEvent table and one thread per
+    process polls it for all the users streaming from that process,
+    so idle streams cost one query per poll interval in total.
+    '''
+    # rows committed out of id order are still found by reading back
+    lookback = timedelta(seconds=10)
+    retention = timedelta(hours=1)
+
+    def __init__(self):
+        super().__init__()
+        self.poll_interval = getattr(settings, "RIDES_EVENT_POLL_INTERVAL", 1)
+        self._seen = {}
+        self._poller = None
+        self._last_prune = 0
+
+    def publish(self, user_id, event_type, data):
+        '''method to store an event for the pollers of every process'''
+        from .models import StreamEvent
+
+        StreamEvent.objects.create(user_id=user_id, type=event_type, data=data)
+
+    def _subscribe(self, user_id, last_id, wake):
+        self._start_poller()
+        return super()._subscribe(user_id, last_id, wake)
+
+    def _start_poller(self):
+        with self._lock:
+            if self._poller is not None and self._poller.is_alive():
+                return
+            self._poller = threading.Thread(
+                target=self._poll_forever, name="rides-events", daemon=True
+            )
+            self._poller.start()
+
+    def _poll_forever(self):
+        while True:
+            close_old_connections()
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception("Polling stream events failed")
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        '''
+        method to deliver the new events of the users streaming
+        from this process. Events of users without a stream are
+        left unseen and picked up if they reconnect in time.
+        '''
+        from .models import StreamEvent
+
+        with self._lock:
+            user_ids = list(self._waiters)
+        now = timezone.now()
+        since = now - self.lookback
+        self._seen = {
+            event_id: created
+            for event_id, created in self._seen.items()
+            if created >= since
+        }
+        if user_ids:
+            rows = StreamEvent.objects.filter(
+                created__gte=since, user_id__in=user_ids
+            ).exclude(id__in=list(self._seen)).order_by("id")
+            for row in rows:
+                self._seen[row.id] = row.created
+                self._deliver(Event(row.id, row.user_id, row.type, row.data))
+
+        if time.monotonic() - self._last_prune > 60:
+            self._last_prune = time.monotonic()
+            StreamEvent.objects.filter(
+                created__lt=now - self.retention
+            ).delete()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    '''Function to return the broker set in RIDES_EVENT_BROKER'''
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.RIDES_EVENT_BROKER)()
+    return _broker
+
+
+def publish_event(user_ids, event_type, data):
+    '''
+    Function to push an event to the live streams of users
+    once the current transaction commits
+    '''
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    user_ids = list(user_ids)
+
+    def publish():
+        broker = get_broker()
+        for user_id in user_ids:
+            broker.publish(user_id, event_type, data)
+    transaction.on_commit(publish)
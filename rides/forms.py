@@ -0,0 +1,45 @@
+from django import forms
+
+
+class RideSearchForm(forms.Form):
+    '''Form for searching rides by route and departure time'''
+    source = forms.CharField(max_length=50, required=False, label="From")
+    destination = forms.CharField(max_length=50, required=False, label="To")
+    keywords = forms.CharField(max_length=100, required=False)
+    start_after = forms.DateTimeField(required=False, label="Leaving after")
+    start_before = forms.DateTimeField(
+        required=False,
+        label="Leaving before"
+    )
+
+
+class RideMatchForm(forms.Form):
+    '''Form for matching rides near a pickup and dropoff point'''
+    pickup_latitude = forms.FloatField(min_value=-90, max_value=90)
+    pickup_longitude = forms.FloatField(min_value=-180, max_value=180)
+    dropoff_latitude = forms.FloatField(
+        min_value=-90,
+        max_value=90,
+        required=False
+    )
+    dropoff_longitude = forms.FloatField(
+        min_value=-180,
+        max_value=180,
+        required=False
+    )
+    start_after = forms.DateTimeField(required=False)
+    start_before = forms.DateTimeField(required=False)
+    k = forms.IntegerField(min_value=1, max_value=50, required=False)
+
+    def clean(self):
+        '''dropoff needs both coordinates or none of them'''
+        cleaned_data = super().clean()
+        dropoff = (
+            cleaned_data.get("dropoff_latitude"),
+            cleaned_data.get("dropoff_longitude"),
+        )
+        if (dropoff[0] is None) != (dropoff[1] is None):
+            raise forms.ValidationError(
+                "Dropoff needs both latitude and longitude"
+            )
+        return cleaned_data
@@ -0,0 +1,190 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+# searched columns of rides_ride with their PostgreSQL weight, the
+# SQLite index ranks them with the matching bm25 weights
+COLUMNS = (
+    ("title", "A", 10.0),
+    ("source_location", "B", 5.0),
+    ("destination_location", "B", 5.0),
+    ("car_name", "C", 2.0),
+    ("description", "D", 1.0),
+)
+MAX_TERMS = 10
+
+POSTGRESQL_FUNCTION = """
+CREATE OR REPLACE FUNCTION rides_ride_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+POSTGRESQL_TRIGGER = """
+CREATE TRIGGER rides_ride_search_vector
+BEFORE INSERT OR UPDATE OF {columns} ON rides_ride
+FOR EACH ROW EXECUTE PROCEDURE rides_ride_search_vector()
+"""
+
+SQLITE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS rides_ride_fts USING fts5(
+    {columns}, content='rides_ride', content_rowid='id',
+    tokenize='porter unicode61'
+)
+"""
+SQLITE_TRIGGERS = {
+    "rides_ride_fts_insert": """
+        CREATE TRIGGER IF NOT EXISTS rides_ride_fts_insert
+        AFTER INSERT ON rides_ride BEGIN {insert}; END
+    """,
+    "rides_ride_fts_delete": """
+        CREATE TRIGGER IF NOT EXISTS rides_ride_fts_delete
+        AFTER DELETE ON rides_ride BEGIN {delete}; END
+    """,
+    "rides_ride_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS rides_ride_fts_update
+        AFTER UPDATE OF {columns} ON rides_ride BEGIN {delete}; {insert}; END
+    """,
+}
+
+
+def _names(prefix=""):
+    return ", ".join(prefix + column for column, _, _ in COLUMNS)
+
+
+def install(connection):
+    '''
+    Function to create the full text index of rides and the triggers
+    keeping it current on every insert and update, whether it comes
+    from Ride.save, bulk loaders or queryset updates.
+    On PostgreSQL a weighted tsvector column with a GIN index,
+    on SQLite an external content FTS5 table, other databases have
+    no full text search. Existing rides are indexed.
+    '''
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            _install_postgresql(cursor)
+        elif connection.vendor == "sqlite":
+            _install_sqlite(cursor)
+
+
+def _install_postgresql(cursor):
+    vector = " || ".join(
+        f"setweight(to_tsvector('english', coalesce(NEW.{column}, '')), "
+        f"'{weight}')"
+        for column, weight, _ in COLUMNS
+    )
+    cursor.execute(
+        "ALTER TABLE rides_ride ADD COLUMN IF NOT EXISTS "
+        "search_vector tsvector"
+    )
+    cursor.execute(POSTGRESQL_FUNCTION.format(vector=vector))
+    cursor.execute("DROP TRIGGER IF EXISTS rides_ride_search_vector "
+                   "ON rides_ride")
+    cursor.execute(POSTGRESQL_TRIGGER.format(columns=_names()))
+    # the trigger fills the column of the existing rides
+    cursor.execute("UPDATE rides_ride SET title = title")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ride_search_idx "
+        "ON rides_ride USING gin (search_vector)"
+    )
+
+
+def _install_sqlite(cursor):
+    cursor.execute(
+        "SELECT name FROM sqlite_master "
+        "WHERE type = 'trigger' AND tbl_name = 'rides_ride'"
+    )
+    present = {row[0] for row in cursor.fetchall()}
+    if present.issuperset(SQLITE_TRIGGERS):
+        return
+    insert = (
+        f"INSERT INTO rides_ride_fts(rowid, {_names()}) "
+        f"VALUES (new.id, {_names('new.')})"
+    )
+    delete = (
+        f"INSERT INTO rides_ride_fts(rides_ride_fts, rowid, {_names()}) "
+        f"VALUES ('delete', old.id, {_names('old.')})"
+    )
+    cursor.execute(SQLITE_TABLE.format(columns=_names()))
+    for sql in SQLITE_TRIGGERS.values():
+        cursor.execute(
+            sql.format(columns=_names(), insert=insert, delete=delete)
+        )
+    cursor.execute("INSERT INTO rides_ride_fts(rides_ride_fts) "
+                   "VALUES ('rebuild')")
+
+
+def uninstall(connection):
+    '''Function to drop what install created'''
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("DROP TRIGGER IF EXISTS rides_ride_search_vector "
+                           "ON rides_ride")
+            cursor.execute("DROP FUNCTION IF EXISTS "
+                           "rides_ride_search_vector()")
+            cursor.execute("ALTER TABLE rides_ride "
+                           "DROP COLUMN IF EXISTS search_vector")
+        elif connection.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute("DROP TABLE IF EXISTS rides_ride_fts")
+
+
+def ensure_installed(sender, using, **kwargs):
+    '''
+    post_migrate receiver reinstalling the SQLite triggers, which
+    are dropped with the table whenever a migration rebuilds it.
+    Databases without the index, not migrated yet or migrated back
+    before it, are left alone.
+    '''
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    if "rides_ride_fts" in connection.introspection.table_names():
+        install(connection)
+
+
+def search_terms(text):
+    '''Function to split searched text into at most MAX_TERMS words'''
+    return re.findall(r"\w+", text.lower())[:MAX_TERMS]
+
+
+def text_match(queryset, terms):
+    '''
+    Function to return the rides of queryset containing every term
+    and the expression of their rank, a higher rank is a better match.
+    Ranks are double precision so cursors compare them exactly.
+    '''
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        query = "plainto_tsquery('english', %s)"
+        text = " ".join(terms)
+        match = RawSQL(
+            f"rides_ride.search_vector @@ {query}", (text,),
+            output_field=BooleanField(),
+        )
+        return queryset.filter(match), RawSQL(
+            f"ts_rank(rides_ride.search_vector, {query})::float8",
+            (text,), output_field=FloatField(),
+        )
+    if vendor == "sqlite":
+        # joined rather than a subquery: bm25 reads the statistics
+        # of the terms once per query instead of once per ride
+        weights = ", ".join(str(weight) for _, _, weight in COLUMNS)
+        return queryset.extra(
+            tables=["rides_ride_fts"],
+            where=[
+                "rides_ride_fts.rowid = rides_ride.id",
+                "rides_ride_fts MATCH %s",
+            ],
+            # quoted terms are plain words to FTS5, never operators
+            params=[" ".join(f'"{term}"' for term in terms)],
+        ), RawSQL(
+            f"-bm25(rides_ride_fts, {weights})", (),
+            output_field=FloatField(),
+        )
+    raise NotImplementedError(f"No full text search on {vendor}")
@@ -0,0 +1,169 @@
+import heapq
+from functools import lru_cache
+from math import asin, cos, radians, sin, sqrt
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .utils import prefix_match
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+# precision stored on rides, a cell is about 150m x 150m
+CELL_PRECISION = 7
+# precisions tried when looking for candidates, from ~1.2km to ~40km cells
+SEARCH_PRECISIONS = (6, 5, 4)
+
+_NEIGHBOURS = {
+    "n": (
+        "p0r21436x8zb9dcf5h7kjnmqesgutwvy",
+        "bc01fg45238967deuvhjyznpkmstqrwx",
+    ),
+    "s": (
+        "14365h7k9dcfesgujnmqp0r2twvyx8zb",
+        "238967debc01fg45kmstqrwxuvhjyznp",
+    ),
+    "e": (
+        "bc01fg45238967deuvhjyznpkmstqrwx",
+        "p0r21436x8zb9dcf5h7kjnmqesgutwvy",
+    ),
+    "w": (
+        "238967debc01fg45kmstqrwxuvhjyznp",
+        "14365h7k9dcfesgujnmqp0r2twvyx8zb",
+    ),
+}
+_BORDERS = {
+    "n": ("prxz", "bcfguvyz"),
+    "s": ("028b", "0145hjnp"),
+    "e": ("bcfguvyz", "prxz"),
+    "w": ("0145hjnp", "028b"),
+}
+
+
+@lru_cache(maxsize=4096)
+def encode_geohash(latitude, longitude, precision=CELL_PRECISION):
+    '''
+    Function to return the geohash cell containing a point.
+    Rides start and end at the same few places, so cells are cached.
+    '''
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    cell, bits, bit_count, even = [], 0, 0, True
+    while len(cell) < precision:
+        value, bounds = (longitude, lng_range) if even else (
+            latitude, lat_range
+        )
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            cell.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(cell)
+
+
+def adjacent_cell(cell, direction):
+    '''Function to return the cell next to cell in direction n/s/e/w'''
+    last, parent = cell[-1], cell[:-1]
+    parity = len(cell) % 2
+    if last in _BORDERS[direction][parity] and parent:
+        parent = adjacent_cell(parent, direction)
+    return parent + BASE32[_NEIGHBOURS[direction][parity].index(last)]
+
+
+def cell_neighbourhood(cell):
+    '''Function to return cell and its 8 surrounding cells'''
+    north, south = adjacent_cell(cell, "n"), adjacent_cell(cell, "s")
+    return {
+        cell, north, south,
+        adjacent_cell(cell, "e"), adjacent_cell(cell, "w"),
+        adjacent_cell(north, "e"), adjacent_cell(north, "w"),
+        adjacent_cell(south, "e"), adjacent_cell(south, "w"),
+    }
+
+
+def haversine_km(latitude, longitude, other_latitude, other_longitude):
+    '''Function to return the great circle distance between two points'''
+    lat1, lng1 = radians(latitude), radians(longitude)
+    lat2, lng2 = radians(other_latitude), radians(other_longitude)
+    step = (
+        sin((lat2 - lat1) / 2) ** 2
+        + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(step))
+
+
+def score_candidates(candidates, pickup, dropoff=None):
+    '''
+    Function to score all candidate rows in one pass.
+    Each candidate is (id, source lat, source lng, dest lat, dest lng),
+    the score is the pickup distance plus the dropoff distance in km.
+    '''
+    scored = []
+    for ride_id, src_lat, src_lng, dst_lat, dst_lng in candidates:
+        pickup_km = haversine_km(*pickup, src_lat, src_lng)
+        dropoff_km = 0.0
+        if dropoff:
+            if dst_lat is None:
+                continue
+            dropoff_km = haversine_km(*dropoff, dst_lat, dst_lng)
+        scored.append(
+            (pickup_km + dropoff_km, ride_id, pickup_km, dropoff_km)
+        )
+    return scored
+
+
+def match_rides(pickup, dropoff=None, start_after=None, start_before=None,
+                k=10, queryset=None):
+    '''
+    Function to return the k active rides with free seats departing
+    in the time window which are nearest to pickup (and dropoff).
+    Candidates are read from the source cells around pickup, widening
+    the cells until k candidates are found, then scored in Python.
+    Returns a list of (ride, pickup_km, dropoff_km) sorted by score.
+    '''
+    from .models import Ride
+
+    if queryset is None:
+        queryset = Ride.objects.all()
+    if start_after is None:
+        start_after = timezone.now()
+    rides = queryset.filter(
+        is_active=True,
+        seats_booked__lt=F("number_of_seats"),
+        start_time__gte=start_after,
+        source_latitude__isnull=False,
+    )
+    if start_before is not None:
+        rides = rides.filter(start_time__lte=start_before)
+
+    candidates = []
+    for precision in SEARCH_PRECISIONS:
+        cells = cell_neighbourhood(encode_geohash(*pickup, precision))
+        in_cells = Q()
+        for cell in cells:
+            in_cells |= prefix_match("source_cell", cell, rides.db)
+        candidates = list(rides.filter(in_cells).values_list(
+            "id",
+            "source_latitude",
+            "source_longitude",
+            "destination_latitude",
+            "destination_longitude",
+        ))
+        if len(candidates) >= k:
+            break
+
+    best = heapq.nsmallest(k, score_candidates(candidates, pickup, dropoff))
+    by_id = queryset.select_related("driver").in_bulk(
+        [ride_id for _, ride_id, _, _ in best]
+    )
+    return [
+        (by_id[ride_id], pickup_km, dropoff_km)
+        for _, ride_id, pickup_km, dropoff_km in best
+        if ride_id in by_id
+    ]
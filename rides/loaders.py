@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+
+from .models import Ride, Trip
+
+
+class DataLoader:
+    '''
+    Batching and caching loader for one kind of object.
+    batch_fn takes a list of keys and returns a dict of key -> value,
+    every load_many call costs at most one batch_fn call and keys
+    already loaded during the request are served from the cache.
+    '''
+
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+        self.cache = {}
+
+    def load_many(self, keys):
+        '''method to return the values of keys, None for unknown keys'''
+        keys = list(keys)
+        missing = list(dict.fromkeys(
+            key for key in keys if key not in self.cache
+        ))
+        if missing:
+            found = self.batch_fn(missing)
+            for key in missing:
+                self.cache[key] = found.get(key)
+        return [self.cache[key] for key in keys]
+
+    def load(self, key):
+        '''method to return the value of a single key'''
+        return self.load_many([key])[0]
+
+    def prime(self, key, value):
+        '''method to put an already fetched value in the cache'''
+        self.cache.setdefault(key, value)
+
+
+def _load_rides(ids):
+    return Ride.objects.in_bulk(ids)
+
+
+def _load_users(ids):
+    return User.objects.only("id", "username").in_bulk(ids)
+
+
+def _load_rider_ids(ride_ids):
+    riders = defaultdict(list)
+    trips = Trip.objects.filter(ride_id__in=ride_ids).order_by("id")
+    for ride_id, rider_id in trips.values_list("ride_id", "rider_id"):
+        riders[ride_id].append(rider_id)
+    return riders
+
+
+class Loaders:
+    '''The data loaders of a single request'''
+
+    def __init__(self):
+        self.rides = DataLoader(_load_rides)
+        self.users = DataLoader(_load_users)
+        self.rider_ids = DataLoader(_load_rider_ids)
+
+
+def loaders_for(request):
+    '''Function to return the loaders of a request, created on first use'''
+    if not hasattr(request, "loaders"):
+        request.loaders = Loaders()
+    return request.loaders
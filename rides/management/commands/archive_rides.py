@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rides.archive import archivable, archive_rides
+
+
+class Command(BaseCommand):
+    '''
+    Command moving rides out of the active feed that ended
+    RIDES_ARCHIVE_AFTER_DAYS ago, with their requests, trips and paid
+    payments, to the archive tables, --batch-size rides per
+    transaction. Run it again to resume an interrupted run.
+    --dry-run only counts them.
+    '''
+    help = "Move old inactive rides and their rows to the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.RIDES_ARCHIVE_BATCH_SIZE,
+        )
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(f"{archivable().count()} rides to archive")
+            return
+        total = 0
+        for archived in archive_rides(options["batch_size"], options["limit"]):
+            total += archived
+            if options["verbosity"] > 1:
+                self.stdout.write(f"archived {archived} rides")
+        self.stdout.write(self.style.SUCCESS(f"{total} rides archived"))
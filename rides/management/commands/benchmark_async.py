@@ -0,0 +1,200 @@
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from rides.models import Ride
+
+
+class Command(BaseCommand):
+    '''
+    Command comparing the ride feed and ride detail pages served by
+    core.wsgi.application from a thread pool with core.asgi.application
+    served from one event loop, at high concurrency, middleware and
+    session included. Under ASGI the async views (event loop + bounded
+    ORM pool) are served when RIDES_ASYNC_VIEWS is set, the sync views
+    otherwise. --db-latency adds a delay to every query to stand in
+    for a slow or remote database.
+    '''
+    help = "Benchmark sync vs async read views"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="worker threads of the WSGI side",
+        )
+        parser.add_argument(
+            "--db-latency",
+            type=float,
+            default=0,
+            help="milliseconds added to every query",
+        )
+
+    def add_latency(self, milliseconds):
+        '''method to slow down every query on every connection'''
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(milliseconds / 1000)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_execute)
+
+        connection_created.connect(install, weak=False)
+        for connection in connections.all():
+            if connection.connection is not None:
+                connection.execute_wrappers.append(slow_execute)
+
+    def build_requests(self, count):
+        '''
+        method to return the feed and detail paths requested by a sample
+        user, with the host and the session cookie of that user
+        '''
+        ride = Ride.objects.filter(is_active=True).order_by("-id").first()
+        user = User.objects.order_by("id").first()
+        if ride is None or user is None:
+            raise CommandError("No rides found, seed the database first")
+        allowed = [host for host in settings.ALLOWED_HOSTS if host != "*"]
+        host = allowed[0].lstrip(".") if allowed else "localhost"
+        client = Client()
+        client.force_login(user)
+        cookie = "; ".join(
+            f"{name}={morsel.value}" for name, morsel in client.cookies.items()
+        )
+        paths = [
+            f"/ride/{ride.id}/" if number % 2 else "/"
+            for number in range(count)
+        ]
+        return paths, host, cookie
+
+    @staticmethod
+    def report(name, timings, elapsed):
+        timings = sorted(timings)
+
+        def percentile(value):
+            return timings[min(len(timings) - 1, int(len(timings) * value))]
+
+        return (
+            f"{name}: {len(timings) / elapsed:.1f} req/s, "
+            f"p50 {percentile(0.50) * 1000:.1f}ms "
+            f"p95 {percentile(0.95) * 1000:.1f}ms "
+            f"p99 {percentile(0.99) * 1000:.1f}ms"
+        )
+
+    def run_sync(self, requests, threads):
+        '''method to serve the requests from a WSGI style thread pool'''
+        from core.wsgi import application
+
+        paths, host, cookie = requests
+
+        def start_response(status, headers, exc_info=None):
+            if not status.startswith("200"):
+                raise CommandError(f"WSGI response {status}")
+
+        def serve(path):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "SCRIPT_NAME": "",
+                "PATH_INFO": path,
+                "QUERY_STRING": "",
+                "SERVER_NAME": host,
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": host,
+                "HTTP_COOKIE": cookie,
+                "wsgi.version": (1, 0),
+                "wsgi.url_scheme": "http",
+                "wsgi.input": BytesIO(),
+                "wsgi.errors": sys.stderr,
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            start = time.perf_counter()
+            response = application(environ, start_response)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            timings = list(pool.map(serve, paths))
+        return timings, time.perf_counter() - start
+
+    def run_async(self, requests, concurrency):
+        '''method to serve the requests from one event loop'''
+        from core.asgi import application
+
+        paths, host, cookie = requests
+        headers = [
+            (b"host", host.encode()), (b"cookie", cookie.encode())
+        ]
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start" and (
+                message["status"] != 200
+            ):
+                raise CommandError(f"ASGI response {message['status']}")
+
+        async def serve(limit, path):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "root_path": "",
+                "query_string": b"",
+                "headers": headers,
+                "server": (host, 80),
+                "client": ("127.0.0.1", 0),
+            }
+            async with limit:
+                start = time.perf_counter()
+                await application(scope, receive, send)
+                return time.perf_counter() - start
+
+        async def serve_all():
+            limit = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(serve(limit, path) for path in paths)
+            )
+
+        start = time.perf_counter()
+        timings = asyncio.run(serve_all())
+        return timings, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        requests = self.build_requests(options["requests"])
+        if options["db_latency"]:
+            self.add_latency(options["db_latency"])
+
+        timings, elapsed = self.run_sync(requests, options["threads"])
+        self.stdout.write(self.report(
+            f"WSGI ({options['threads']} threads)", timings, elapsed
+        ))
+        timings, elapsed = self.run_async(requests, options["concurrency"])
+        views = "async" if settings.RIDES_ASYNC_VIEWS else "sync"
+        self.stdout.write(self.report(
+            f"ASGI ({options['concurrency']} concurrent, {views} views)",
+            timings, elapsed,
+        ))
@@ -0,0 +1,102 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from rides.geo import encode_geohash, match_rides
+from rides.models import Ride
+
+# bounding box the benchmark rides are spread over (greater Bengaluru)
+AREA = ((12.80, 13.20), (77.40, 77.80))
+
+
+class Command(BaseCommand):
+    '''
+    Command to benchmark geo matching of rides.
+    With --rides it first adds that many random rides
+    with coordinates, then times --queries random matches.
+    '''
+    help = "Benchmark nearest ride matching"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rides", type=int, default=0)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    @staticmethod
+    def random_point(rng):
+        '''method to return a random point inside the benchmark area'''
+        (lat_min, lat_max), (lng_min, lng_max) = AREA
+        return rng.uniform(lat_min, lat_max), rng.uniform(lng_min, lng_max)
+
+    def create_rides(self, count, batch_size, rng):
+        '''method to bulk create rides spread over the area and a week'''
+        driver, _ = User.objects.get_or_create(username="benchmark-driver")
+        now = timezone.now()
+        created = 0
+        while created < count:
+            batch = []
+            for _ in range(min(batch_size, count - created)):
+                source = self.random_point(rng)
+                destination = self.random_point(rng)
+                start_time = now + timedelta(minutes=rng.randrange(7 * 1440))
+                batch.append(Ride(
+                    driver=driver,
+                    title=f"{driver} benchmark ride",
+                    source_location="benchmark",
+                    destination_location="benchmark",
+                    source_key="benchmark",
+                    destination_key="benchmark",
+                    source_latitude=source[0],
+                    source_longitude=source[1],
+                    destination_latitude=destination[0],
+                    destination_longitude=destination[1],
+                    source_cell=encode_geohash(*source),
+                    destination_cell=encode_geohash(*destination),
+                    start_time=start_time,
+                    end_time=start_time + timedelta(hours=1),
+                ))
+            with transaction.atomic():
+                Ride.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+            self.stdout.write(f"created {created}/{count} rides")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if options["rides"]:
+            self.create_rides(options["rides"], options["batch_size"], rng)
+
+        timings, found = [], 0
+        now = timezone.now()
+        for _ in range(options["queries"]):
+            pickup, dropoff = self.random_point(rng), self.random_point(rng)
+            start = time.perf_counter()
+            matches = match_rides(
+                pickup,
+                dropoff,
+                start_after=now,
+                start_before=now + timedelta(days=1),
+                k=options["k"],
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+            found += len(matches)
+
+        if not timings:
+            return
+        timings.sort()
+
+        def percentile(value):
+            return timings[min(len(timings) - 1, int(len(timings) * value))]
+
+        self.stdout.write(
+            f"{len(timings)} queries, {found / len(timings):.1f} rides each: "
+            f"p50 {percentile(0.50):.2f}ms "
+            f"p95 {percentile(0.95):.2f}ms "
+            f"p99 {percentile(0.99):.2f}ms"
+        )
@@ -0,0 +1,103 @@
+import time
+from functools import reduce
+from operator import and_, or_
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from rides.fulltext import COLUMNS, search_terms
+from rides.models import Ride
+from rides.pagination import CursorPaginator
+from rides.search import keyword_search
+
+from .benchmark_urls import percentile
+
+QUERIES = (
+    "coffee",
+    "suitcases boot",
+    "electric car",
+    "Koramangala Whitefield",
+    "Innova pets",
+    "metro station",
+    "seed-123",
+    "helicopter",
+)
+
+
+def icontains_search(text, queryset):
+    '''
+    The search full text replaces: every word in one of the columns,
+    newest rides first
+    '''
+    conditions = [
+        reduce(or_, (
+            Q(**{f"{column}__icontains": term}) for column, _, _ in COLUMNS
+        ))
+        for term in search_terms(text)
+    ]
+    return queryset.filter(reduce(and_, conditions)).order_by(
+        "-ride_created_time", "-id"
+    )
+
+
+class Command(BaseCommand):
+    '''
+    Command comparing the keyword search of active rides through the
+    full text index with the icontains filters it replaces. For each
+    query it times --iterations first pages of --limit rides and
+    counts the matches, reporting p50/p95 latency of both. Fill the
+    database first, e.g. seed_data --rides 1000000.
+    '''
+    help = "Benchmark full text ride search against icontains"
+
+    def add_arguments(self, parser):
+        parser.add_argument("queries", nargs="*", default=QUERIES)
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--limit", type=int, default=20)
+
+    def timings(self, run, iterations):
+        '''method to return the sorted wall times of iterations runs'''
+        run()
+        seconds = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+        return seconds
+
+    def handle(self, *args, **options):
+        rides = Ride.objects.filter(is_active=True)
+        total = rides.count()
+        if not total:
+            raise CommandError("no active rides, run seed_data first")
+        self.stdout.write(f"{total} active rides")
+        self.stdout.write(
+            f"{'query':<26}{'fts rows':>10}{'p50':>9}{'p95':>9}"
+            f"{'icontains rows':>16}{'p50':>9}{'p95':>9}{'speedup':>9}"
+        )
+        for text in options["queries"]:
+            fulltext = keyword_search(text, rides)
+            paginator = CursorPaginator(
+                fulltext, options["limit"], ("-rank", "id")
+            )
+            icontains = icontains_search(text, rides)
+            limit = options["limit"]
+            results = {}
+            for name, run, queryset in (
+                ("fts", lambda: list(paginator.page()), fulltext),
+                ("icontains", lambda: list(icontains[:limit]), icontains),
+            ):
+                seconds = self.timings(run, options["iterations"])
+                results[name] = (
+                    queryset.count(),
+                    percentile(seconds, 0.5) * 1000,
+                    percentile(seconds, 0.95) * 1000,
+                )
+            (rows, p50, p95), (like_rows, like_p50, like_p95) = (
+                results["fts"], results["icontains"]
+            )
+            self.stdout.write(
+                f"{text[:25]:<26}{rows:>10}{p50:>7.1f}ms{p95:>7.1f}ms"
+                f"{like_rows:>16}{like_p50:>7.1f}ms{like_p95:>7.1f}ms"
+                f"{like_p50 / p50:>8.1f}x"
+            )
@@ -0,0 +1,495 @@
+import json
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+from django.utils import timezone
+
+from rides.middleware import QueryTracker
+from rides.models import Ride, Request, Trip, Payment
+from rides.routers import replicas
+from rides.seed import PASSWORD, PLACES, seed
+
+
+class Route:
+    '''
+    A benchmarked URL: its name, method and the user sending it.
+    targets(fixture, count) returns the (kwargs, data) of count
+    requests, routes changing data get fresh objects for every one.
+    '''
+
+    def __init__(self, name, method="GET", role="rider", query="",
+                 kwargs=None, data=None, targets=None, stream=False,
+                 relogin=False):
+        self.name = name
+        self.method = method
+        self.role = role
+        self.query = query
+        self.kwargs = kwargs
+        self.data = data
+        self._targets = targets
+        self.stream = stream
+        self.relogin = relogin
+
+    def targets(self, fixture, count):
+        if self._targets is not None:
+            return self._targets(fixture, count)
+        kwargs = self.kwargs(fixture) if self.kwargs else {}
+        data = self.data(fixture) if self.data else None
+        return [(kwargs, data)] * count
+
+
+class Fixture:
+    '''Users and objects the routes are sent for'''
+
+    def __init__(self, users, prefix):
+        self.prefix = prefix
+        self.driver = User.objects.get(pk=users[0][0])
+        self.rider = User.objects.get(pk=users[-1][0])
+        self.staff, _ = User.objects.get_or_create(
+            username=f"{prefix}_staff",
+            defaults={"is_staff": True, "email": "staff@example.com"},
+        )
+        self.ride = self.fresh_rides(1)[0]
+        self.ride_ids = list(
+            Ride.objects.filter(is_active=True)
+            .order_by("-id").values_list("id", flat=True)[:20]
+        )
+
+    def query(self, route):
+        '''method to fill the placeholders of the query string of a route'''
+        return route.query.format(
+            ids=",".join(str(ride_id) for ride_id in self.ride_ids)
+        )
+
+    def fresh_rides(self, count, seats=3, status="Pending"):
+        '''method to create upcoming rides of the driver'''
+        start = timezone.now() + timedelta(days=1)
+        rides = []
+        for number in range(count):
+            ride = Ride(
+                driver=self.driver,
+                source_location="Koramangala",
+                destination_location="Whitefield",
+                source_latitude=PLACES["Koramangala"][0],
+                source_longitude=PLACES["Koramangala"][1],
+                start_time=start,
+                end_time=start + timedelta(hours=1),
+                number_of_seats=seats,
+                status=status,
+                car_name="Swift",
+                car_number=f"KA-01 {number}",
+            )
+            ride.set_computed_fields()
+            rides.append(ride)
+        Ride.objects.bulk_create(rides)
+        return list(
+            Ride.objects.filter(driver=self.driver).order_by("-id")[:count]
+        )
+
+    def pending_requests(self, count):
+        '''method to create pending requests of the rider'''
+        return [
+            Request.objects.create(ride=ride, user_requested=self.rider)
+            for ride in self.fresh_rides(count)
+        ]
+
+    def rides_with_riders(self, count):
+        '''method to create rides the rider has a trip in'''
+        rides = self.fresh_rides(count)
+        Trip.objects.bulk_create(
+            [Trip(ride=ride, rider=self.rider) for ride in rides]
+        )
+        Ride.objects.filter(pk__in=[ride.pk for ride in rides]).update(
+            seats_booked=1
+        )
+        return rides
+
+    def unpaid_payments(self, count):
+        '''method to create pending payments of the rider'''
+        rides = self.fresh_rides(count, status="Finished")
+        Payment.objects.bulk_create([
+            Payment(ride=ride, rider=self.rider, amount=100, status="Pending")
+            for ride in rides
+        ])
+        return list(
+            Payment.objects.filter(rider=self.rider, status="Pending")
+            .order_by("-id")[:count]
+        )
+
+    def ride_form(self):
+        '''method to return valid data of the ride form'''
+        start = timezone.now() + timedelta(days=2)
+        return {
+            "source_location": "Hebbal",
+            "destination_location": "MG Road",
+            "start_time": start.strftime("%Y-%m-%d %H:%M"),
+            "end_time": (start + timedelta(hours=1)).strftime(
+                "%Y-%m-%d %H:%M"
+            ),
+            "price_per_km": 10,
+            "distance": 12,
+        }
+
+
+def each(objects, key):
+    return [({key: obj.pk}, None) for obj in objects]
+
+
+ROUTES = [
+    # pages of the rides app
+    Route("home"),
+    Route("home", query="?page=3"),
+    Route("ride-search", query="?source=Koramangala&destination=Whitefield"),
+    Route("ride-search", query="?keywords=coffee"),
+    Route("ride-match", query="?pickup_latitude=12.93&pickup_longitude=77.62"),
+    Route("user-rides", kwargs=lambda f: {"username": f.driver.username}),
+    Route("ride-detail", kwargs=lambda f: {"pk": f.ride.pk}),
+    Route("ride-create", role="driver"),
+    Route("ride-update", role="driver", kwargs=lambda f: {"pk": f.ride.pk}),
+    Route("ride-delete", role="driver", kwargs=lambda f: {"pk": f.ride.pk}),
+    Route("user-requests", role="driver"),
+    Route("user-requested"),
+    Route("user-payments"),
+    Route("user-payment-recieved", role="driver"),
+    Route("cache-stats", role="staff"),
+    Route("metrics", role="staff"),
+    Route("event-stream", stream=True),
+    # JSON API
+    Route("api-rides"),
+    Route("api-ride-detail", kwargs=lambda f: {"pk": f.ride.pk}),
+    Route("api-rides-batch", query="?ids={ids}&include=driver,riders,seats"),
+    Route("api-rides-export", stream=True),
+    Route("api-rides-search", query="?q=coffee"),
+    Route("api-requests"),
+    Route("api-trips"),
+    Route("api-payments"),
+    Route("api-summary", role="driver"),
+    Route("api-summary-daily", role="driver", query="?days=90"),
+    # pages of the core urls
+    Route("admin:index", role="staff"),
+    Route("register", role="anonymous"),
+    Route("login", role="anonymous"),
+    Route("profile"),
+    # requests changing data, each one gets its own objects
+    Route("ride-create", "POST", role="driver", data=Fixture.ride_form),
+    Route(
+        "ride-update", "POST", role="driver",
+        kwargs=lambda f: {"pk": f.ride.pk}, data=Fixture.ride_form,
+    ),
+    Route("ride-delete", "POST", role="driver",
+          targets=lambda f, count: each(f.fresh_rides(count), "pk")),
+    Route("create-request", "POST",
+          targets=lambda f, count: each(f.fresh_rides(count), "ride")),
+    Route("approve-request", "POST", role="driver",
+          targets=lambda f, count: each(f.pending_requests(count), "req")),
+    Route("reject-request", "POST", role="driver",
+          targets=lambda f, count: each(f.pending_requests(count), "req")),
+    Route("ride-finish", "POST", role="driver",
+          targets=lambda f, count: each(f.rides_with_riders(count), "ride")),
+    Route("payment-pay", "POST",
+          targets=lambda f, count: each(f.unpaid_payments(count), "payment")),
+    Route("profile", "POST", data=lambda f: {
+        "username": f.rider.username, "email": f.rider.email,
+    }),
+    Route("register", "POST", role="anonymous", targets=lambda f, count: [
+        ({}, {
+            "username": f"{f.prefix}_reg_{uuid.uuid4().hex[:10]}",
+            "email": "new@example.com",
+            "password1": PASSWORD,
+            "password2": PASSWORD,
+        })
+        for _ in range(count)
+    ]),
+    Route("login", "POST", role="anonymous", data=lambda f: {
+        "username": f.rider.username, "password": PASSWORD,
+    }),
+    Route("logout", relogin=True),
+]
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    '''
+    Command benchmarking every URL of the project through the WSGI
+    handler. It creates test databases, as the test runner does, and
+    seeds them with synthetic drivers and riders (once per --prefix,
+    kept between runs with --keepdb). It sends --iterations requests
+    to every route and reports p50/p95/p99 latency, queries per
+    request and throughput, then a mixed read load with --concurrency
+    clients.
+    Results are compared with --baseline, any route slower than
+    --tolerance or running more queries than the baseline fails the
+    command. --save-baseline stores the results as the new baseline.
+    '''
+    help = "Benchmark every URL against a stored baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prefix", default="bench")
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--rides", type=int, default=2000)
+        parser.add_argument("--requests-per-ride", type=int, default=3)
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--routes", nargs="*", default=None)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=5)
+        parser.add_argument(
+            "--baseline",
+            default=str(Path(settings.BASE_DIR) / "benchmarks.json"),
+        )
+        parser.add_argument("--save-baseline", action="store_true")
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="keep the seeded test database for the next run",
+        )
+        parser.add_argument("--tolerance", type=float, default=0.25)
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=2,
+            help="latency changes smaller than this never fail",
+        )
+
+    def client(self, fixture, role):
+        '''method to return a client logged in as the user of role'''
+        allowed = [host for host in settings.ALLOWED_HOSTS if host != "*"]
+        host = allowed[0].lstrip(".") if allowed else "localhost"
+        client = Client(HTTP_HOST=host)
+        if role != "anonymous":
+            client.force_login(getattr(fixture, role))
+        return client
+
+    def send(self, client, route, kwargs, data, query):
+        '''method to send one request, returns (seconds, queries, status)'''
+        url = reverse(route.name, kwargs=kwargs) + query
+        tracker = QueryTracker()
+        start = time.perf_counter()
+        # replicas included, the reads of GET requests may run there
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(tracker))
+            if route.method == "POST":
+                response = client.post(url, data or {})
+            else:
+                response = client.get(url)
+            if route.stream:
+                # streams are timed to their first chunk
+                next(iter(response.streaming_content), None)
+                response.close()
+        return time.perf_counter() - start, tracker.count, response.status_code
+
+    def bench_route(self, fixture, route, iterations, warmup):
+        '''method to time iterations requests of a route'''
+        client = self.client(fixture, route.role)
+        query = fixture.query(route)
+        timings, queries, errors = [], [], 0
+        targets = route.targets(fixture, warmup + iterations)
+        for number, (kwargs, data) in enumerate(targets):
+            if route.relogin:
+                client.force_login(getattr(fixture, route.role))
+            try:
+                seconds, count, status = self.send(
+                    client, route, kwargs, data, query
+                )
+            except Exception as error:
+                self.stderr.write(f"{route.name}: {error!r}")
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            if number >= warmup:
+                timings.append(seconds)
+                queries.append(count)
+        if not timings:
+            return {"errors": errors}
+        return {
+            "p50": percentile(timings, 0.50) * 1000,
+            "p95": percentile(timings, 0.95) * 1000,
+            "p99": percentile(timings, 0.99) * 1000,
+            "queries": percentile(queries, 0.50),
+            "rps": len(timings) / sum(timings),
+            "errors": errors,
+        }
+
+    def mixed_load(self, fixture, concurrency, duration):
+        '''method to run the read routes from concurrent clients'''
+        reads = [
+            route for route in ROUTES
+            if route.method == "GET" and not route.stream
+            and route.role != "anonymous" and not route.relogin
+        ]
+        done = []
+        stop = time.monotonic() + duration
+
+        def work(offset):
+            clients = {}
+            served = 0
+            while time.monotonic() < stop:
+                route = reads[(offset + served) % len(reads)]
+                if route.role not in clients:
+                    clients[route.role] = self.client(fixture, route.role)
+                kwargs, data = route.targets(fixture, 1)[0]
+                self.send(
+                    clients[route.role], route, kwargs, data,
+                    fixture.query(route),
+                )
+                served += 1
+            done.append(served)
+            connections.close_all()
+
+        threads = [
+            threading.Thread(target=work, args=(number,))
+            for number in range(concurrency)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(done) / (time.monotonic() - start)
+
+    @staticmethod
+    def route_key(route):
+        return f"{route.method} {route.name}{route.query}"
+
+    def compare(self, results, baseline, options):
+        '''method to return the regressions against the baseline'''
+        regressions = []
+        for key, result in results["routes"].items():
+            before = baseline["routes"].get(key)
+            if not before or "p95" not in before or "p95" not in result:
+                continue
+            slower = result["p95"] - before["p95"]
+            if slower > options["min_delta_ms"] and (
+                result["p95"] > before["p95"] * (1 + options["tolerance"])
+            ):
+                regressions.append(
+                    f"{key}: p95 {before['p95']:.1f}ms -> "
+                    f"{result['p95']:.1f}ms"
+                )
+            if result["queries"] > before["queries"]:
+                regressions.append(
+                    f"{key}: {before['queries']} -> "
+                    f"{result['queries']} queries per request"
+                )
+        floor = baseline.get("throughput", 0) * (1 - options["tolerance"])
+        if results["throughput"] < floor:
+            regressions.append(
+                f"mixed load: {baseline['throughput']:.1f} -> "
+                f"{results['throughput']:.1f} req/s"
+            )
+        return regressions
+
+    def handle(self, *args, **options):
+        # the routes delete rides, register users and pay bills, they
+        # run against throwaway test databases, replicas mirroring the
+        # primary, never against the configured ones
+        for alias in replicas():
+            connections[alias].settings_dict.setdefault("TEST", {})[
+                "MIRROR"
+            ] = DEFAULT_DB_ALIAS
+        primary = connections[DEFAULT_DB_ALIAS]
+        test = primary.settings_dict.setdefault("TEST", {})
+        if primary.vendor == "sqlite" and not test.get("NAME"):
+            # a file, in memory databases lock out the concurrent clients
+            test["NAME"] = str(Path(tempfile.gettempdir()) / "bench.sqlite3")
+        old_config = setup_databases(
+            verbosity=options["verbosity"],
+            interactive=False,
+            keepdb=options["keepdb"],
+        )
+        try:
+            self.benchmark(options)
+        finally:
+            connections.close_all()
+            teardown_databases(
+                old_config,
+                verbosity=options["verbosity"],
+                keepdb=options["keepdb"],
+            )
+
+    def benchmark(self, options):
+        '''method to seed the test database and benchmark the routes'''
+        users = seed(
+            prefix=options["prefix"],
+            users=options["users"],
+            rides=options["rides"],
+            requests_per_ride=options["requests_per_ride"],
+            progress=lambda message, rows: self.stdout.write(message),
+        )
+        fixture = Fixture(users, options["prefix"])
+
+        results = {"routes": {}}
+        self.stdout.write(
+            f"{'route':58} {'p50':>8} {'p95':>8} {'p99':>8} "
+            f"{'queries':>7} {'req/s':>7}"
+        )
+        for route in ROUTES:
+            if options["routes"] and route.name not in options["routes"]:
+                continue
+            if route.name == "event-stream" and (
+                not settings.RIDES_EVENT_STREAMS
+            ):
+                continue
+            result = self.bench_route(
+                fixture, route, options["iterations"], options["warmup"]
+            )
+            key = self.route_key(route)
+            results["routes"][key] = result
+            if "p50" not in result:
+                self.stdout.write(f"{key[:58]:58} failed")
+                continue
+            self.stdout.write(
+                f"{key[:58]:58} {result['p50']:7.1f}ms {result['p95']:7.1f}ms"
+                f" {result['p99']:7.1f}ms {result['queries']:7}"
+                f" {result['rps']:7.1f}"
+                + (f"  {result['errors']} errors" if result["errors"] else "")
+            )
+
+        results["throughput"] = self.mixed_load(
+            fixture, options["concurrency"], options["duration"]
+        )
+        self.stdout.write(
+            f"mixed read load, {options['concurrency']} clients: "
+            f"{results['throughput']:.1f} req/s"
+        )
+
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"baseline saved to {baseline_path}")
+            return
+        if not baseline_path.exists():
+            self.stdout.write("no baseline yet, see --save-baseline")
+            return
+        regressions = self.compare(
+            results, json.loads(baseline_path.read_text()), options
+        )
+        failed = [
+            key for key, result in results["routes"].items()
+            if result["errors"]
+        ]
+        if regressions or failed:
+            raise CommandError(
+                "Performance regressions:\n  " + "\n  ".join(
+                    regressions + [f"{key}: errors" for key in failed]
+                )
+            )
+        self.stdout.write("no regressions against the baseline")
@@ -0,0 +1,117 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+
+from rides.archive import CombinedQuerySet
+from rides.models import Ride
+from rides.views import (
+    RideListView,
+    RideDetailView,
+    UserRideListView,
+    UserRequestsListView,
+    UserRequestedListView,
+    UserPaymentListView,
+    UserPaymentRecievedListView,
+)
+
+
+class Command(BaseCommand):
+    '''
+    Command to run EXPLAIN on the query of every rides view
+    and flag the ones planned with a sequential scan.
+    Run it against a seeded database, on tiny tables the
+    planner prefers sequential scans anyway.
+    '''
+    help = "EXPLAIN the queries of the rides views and flag sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username",
+            help="user to build the queries for (default: busiest driver)",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="exit with an error when a sequential scan is found",
+        )
+
+    def get_user(self, username):
+        '''method to pick the user the view queries are built for'''
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username} does not exist")
+        user = (
+            User.objects.annotate(rides_count=Count("driving"))
+            .order_by("-rides_count")
+            .first()
+        )
+        if user is None:
+            raise CommandError("No users found, seed the database first")
+        return user
+
+    def view_querysets(self, user):
+        '''method to yield (name, queryset) for every rides view'''
+        request = RequestFactory().get("/")
+        request.user = user
+        list_views = [
+            ("home", RideListView, {}),
+            ("user-rides", UserRideListView, {"username": user.username}),
+            ("user-requests", UserRequestsListView, {}),
+            ("user-requested", UserRequestedListView, {}),
+            ("user-payments", UserPaymentListView, {}),
+            ("user-payment-recieved", UserPaymentRecievedListView, {}),
+        ]
+        for name, view_class, kwargs in list_views:
+            view = view_class()
+            view.setup(request, **kwargs)
+            queryset = view.get_queryset()
+            if isinstance(queryset, CombinedQuerySet):
+                # the payment history reads the hot and the archive table
+                yield name, queryset.hot[:view.paginate_by]
+                yield f"{name} (archived)", (
+                    queryset.archived[:view.paginate_by]
+                )
+            else:
+                yield name, queryset[:view.paginate_by]
+
+        ride = Ride.objects.filter(driver=user).only("pk").first()
+        if ride is not None:
+            view = RideDetailView()
+            view.setup(request, pk=ride.pk)
+            yield "ride-detail", view.get_queryset().filter(pk=ride.pk)
+
+    @staticmethod
+    def sequential_scans(plan):
+        '''method to return the plan lines reading a whole table'''
+        if connection.vendor == "postgresql":
+            return [line for line in plan.splitlines() if "Seq Scan" in line]
+        if connection.vendor == "sqlite":
+            return [
+                line for line in plan.splitlines()
+                if "SCAN " in line and "USING" not in line
+            ]
+        return []
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["username"])
+        self.stdout.write(f"Explaining view queries for {user.username}")
+        flagged = 0
+        for name, queryset in self.view_querysets(user):
+            plan = queryset.explain()
+            scans = self.sequential_scans(plan)
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{name}: SEQ SCAN"))
+                for line in scans:
+                    self.stdout.write(f"    {line.strip()}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+            if options["verbosity"] > 1:
+                self.stdout.write(plan)
+
+        if flagged and options["strict"]:
+            raise CommandError(f"{flagged} view queries use sequential scans")
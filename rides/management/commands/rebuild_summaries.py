@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from rides.summary import rebuild_summaries
+
+
+class Command(BaseCommand):
+    '''
+    Command recounting the user summaries and their day buckets from
+    the rides and payments tables, archived ones included, and
+    replacing them in one transaction. It reports how many stored rows
+    had drifted from the recount, --dry-run only reports.
+    '''
+    help = "Rebuild the per user and per day summaries from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        users, days, differences = rebuild_summaries(
+            options["batch_size"], options["dry_run"]
+        )
+        verb = "counted" if options["dry_run"] else "rebuilt"
+        message = f"{users} users and {days} days {verb}, "
+        message += f"{differences} stored rows differed"
+        style = self.style.WARNING if differences else self.style.SUCCESS
+        self.stdout.write(style(message))
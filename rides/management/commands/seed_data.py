@@ -0,0 +1,97 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from rides.seed import KINDS, Importer, LoadError, file_kind, read_rows, seed
+from rides.summary import rebuild_summaries
+
+
+class Command(BaseCommand):
+    '''
+    Command to fill a database quickly. Without files it generates
+    users with their profiles and rides with requests, trips and
+    payments. Given CSV or JSON lines files named after what they hold
+    (users.csv, rides.jsonl, requests.csv, trips.csv, payments.jsonl)
+    it imports them in that order, in the shapes the API returns.
+    Rows go in with executemany batches, one transaction per batch,
+    without signals or save(), so profiles, ride titles and search
+    fields are filled in by the loader and the user summaries are
+    rebuilt at the end.
+    '''
+    help = "Generate or import users, rides, requests, trips and payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="*")
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--rides", type=int, default=10000)
+        parser.add_argument("--requests-per-ride", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def report(self, message, rows):
+        if self.verbosity:
+            elapsed = time.perf_counter() - self.started
+            self.stdout.write(
+                f"{message}: {rows} rows, {rows / elapsed:,.0f} rows/s"
+            )
+
+    def generate(self, options):
+        '''method to generate a dataset'''
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"users of prefix {prefix} already exist")
+        seed(
+            prefix=prefix,
+            users=options["users"],
+            rides=options["rides"],
+            requests_per_ride=options["requests_per_ride"],
+            batch_size=options["batch_size"],
+            seed_value=options["seed"],
+            progress=self.report,
+        )
+
+    def load(self, files, batch_size):
+        '''method to import files in the order their rows depend on'''
+        try:
+            files = sorted(
+                files, key=lambda path: KINDS.index(file_kind(path))
+            )
+        except LoadError as error:
+            raise CommandError(error)
+        importer, total = Importer(batch_size=batch_size), 0
+        try:
+            for path in files:
+                total += self.load_file(importer, path, total)
+        finally:
+            importer.finish()
+
+    def load_file(self, importer, path, total):
+        '''method to import one file, returns the rows written'''
+        kind, written = file_kind(path), 0
+        try:
+            for read, written in importer.load(kind, read_rows(path)):
+                self.report(f"{path}: {read} {kind} read", total + written)
+        except OSError as error:
+            raise CommandError(error)
+        except (LoadError, DatabaseError) as error:
+            raise CommandError(
+                f"{path}: {error}, batches before this one are loaded"
+            )
+        return written
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        self.started = time.perf_counter()
+        if options["files"]:
+            self.load(options["files"], options["batch_size"])
+        else:
+            self.generate(options)
+        users, days, _ = rebuild_summaries(options["batch_size"])
+        if self.verbosity:
+            self.stdout.write(f"summaries of {users} users over {days} days")
+            self.stdout.write(self.style.SUCCESS(
+                f"done in {time.perf_counter() - self.started:.1f}s"
+            ))
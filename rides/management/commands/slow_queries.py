@@ -0,0 +1,104 @@
+import json
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class Command(BaseCommand):
+    '''
+    Command reading the slow query log and grouping the entries by
+    normalized query: count, total/mean/p95/max time, the views and
+    call sites running it and, with --plans, the last plan captured.
+    '''
+    help = "Summarize the slow query log by query fingerprint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=None)
+        parser.add_argument(
+            "--since",
+            type=float,
+            default=None,
+            help="only entries of the last SINCE hours",
+        )
+        parser.add_argument("--view", default=None)
+        parser.add_argument(
+            "--sort",
+            choices=("total", "count", "max", "mean"),
+            default="total",
+        )
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--plans", action="store_true")
+
+    def read_entries(self, path, since, view):
+        '''method to yield the entries of the log matching the filters'''
+        try:
+            log = open(path)
+        except FileNotFoundError:
+            raise CommandError(f"No slow query log at {path}")
+        with log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if view and entry.get("view") != view:
+                    continue
+                if since and parse_datetime(entry["time"]) < since:
+                    continue
+                yield entry
+
+    def handle(self, *args, **options):
+        path = options["log"] or settings.RIDES_SLOW_QUERY_LOG
+        since = None
+        if options["since"]:
+            since = timezone.now() - timedelta(hours=options["since"])
+
+        groups = defaultdict(lambda: {
+            "durations": [],
+            "views": Counter(),
+            "call_sites": Counter(),
+            "plan": None,
+        })
+        for entry in self.read_entries(path, since, options["view"]):
+            group = groups[entry["fingerprint"]]
+            group["sql"] = entry["sql"]
+            group["durations"].append(entry["duration_ms"])
+            group["views"][entry.get("view")] += 1
+            group["call_sites"][entry.get("call_site")] += 1
+            if entry.get("plan") is not None:
+                group["plan"] = entry["plan"]
+
+        def key(item):
+            durations = item[1]["durations"]
+            return {
+                "total": sum(durations),
+                "count": len(durations),
+                "max": max(durations),
+                "mean": sum(durations) / len(durations),
+            }[options["sort"]]
+
+        ranked = sorted(groups.items(), key=key, reverse=True)
+        for fingerprint, group in ranked[:options["limit"]]:
+            durations = sorted(group["durations"])
+            p95 = durations[min(len(durations) - 1, int(len(durations) * .95))]
+            self.stdout.write(
+                f"{fingerprint}  {len(durations)} queries, "
+                f"total {sum(durations):.1f}ms, "
+                f"mean {sum(durations) / len(durations):.1f}ms, "
+                f"p95 {p95:.1f}ms, max {durations[-1]:.1f}ms"
+            )
+            self.stdout.write(f"  {group['sql'][:300]}")
+            for name, count in group["views"].most_common(3):
+                self.stdout.write(f"  view {name}: {count}")
+            for site, count in group["call_sites"].most_common(3):
+                self.stdout.write(f"  at {site}: {count}")
+            if options["plans"] and group["plan"] is not None:
+                plan = json.dumps(group["plan"], indent=2)
+                self.stdout.write("  plan:\n" + "\n".join(
+                    f"    {line}" for line in plan.splitlines()
+                ))
+            self.stdout.write("")
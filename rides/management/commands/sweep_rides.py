@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rides.sweeper import schedule_sweep, sweep_rides, sweepable
+
+
+class Command(BaseCommand):
+    '''
+    Command taking finished and long ended rides out of the active
+    feed, --batch-size rides per transaction. Every batch commits on
+    its own so an interrupted run is resumed by running it again.
+    --dry-run only counts them, --schedule queues the sweep job which
+    then runs every RIDES_SWEEP_INTERVAL seconds.
+    '''
+    help = "Deactivate finished and expired rides in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.RIDES_SWEEP_BATCH_SIZE
+        )
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--schedule", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            queued = schedule_sweep(0)
+            self.stdout.write(f"sweep job queued for {queued.run_at}")
+            return
+        if options["dry_run"]:
+            self.stdout.write(f"{sweepable().count()} rides to deactivate")
+            return
+        total = 0
+        for touched in sweep_rides(options["batch_size"], options["limit"]):
+            total += touched
+            if options["verbosity"] > 1:
+                self.stdout.write(f"deactivated {touched} rides")
+        self.stdout.write(self.style.SUCCESS(f"{total} rides deactivated"))
@@ -0,0 +1,158 @@
+import threading
+from bisect import bisect_left
+
+# upper bounds of the buckets, in seconds, queries and bytes
+TIME_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric:
+    '''
+    Base of the metrics, values are kept per combination of labels
+    and exposed as one sample each
+    '''
+    kind = None
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def samples(self):
+        '''method to return the lines of the Prometheus exposition'''
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            labels = _format_labels(zip(self.labels, label_values))
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Counter(Metric):
+    '''Counter per combination of label values'''
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        '''method to add amount to the counter of the label values'''
+        with self._lock:
+            self._values[label_values] = (
+                self._values.get(label_values, 0) + amount
+            )
+
+
+class Histogram(Metric):
+    '''Histogram with fixed buckets per combination of label values'''
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels, buckets):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        '''method to record one value'''
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        '''method to return the lines of the Prometheus exposition'''
+        with self._lock:
+            values = {
+                label_values: (list(counts), total, count)
+                for label_values, (counts, total, count)
+                in self._values.items()
+            }
+        for label_values, (counts, total, count) in sorted(values.items()):
+            labels = list(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(
+                self.buckets + (float("inf"),), counts
+            ):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(labels + [("le", le)])
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {repr(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+REQUESTS = Counter(
+    "rides_requests_total",
+    "Requests served, by view and status code",
+    ("view", "status"),
+)
+REQUEST_DURATION = Histogram(
+    "rides_request_duration_seconds",
+    "Wall time of requests",
+    ("view",),
+    TIME_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "rides_response_size_bytes",
+    "Size of non streaming response bodies",
+    ("view",),
+    SIZE_BUCKETS,
+)
+SQL_QUERIES = Histogram(
+    "rides_request_sql_queries",
+    "SQL queries per sampled request",
+    ("view",),
+    QUERY_BUCKETS,
+)
+SQL_DURATION = Histogram(
+    "rides_request_sql_duration_seconds",
+    "Time spent in SQL per sampled request",
+    ("view",),
+    TIME_BUCKETS,
+)
+TEMPLATE_DURATION = Histogram(
+    "rides_request_template_seconds",
+    "Time rendering the TemplateResponse of sampled requests",
+    ("view",),
+    TIME_BUCKETS,
+)
+METRICS = (
+    REQUESTS,
+    REQUEST_DURATION,
+    RESPONSE_SIZE,
+    SQL_QUERIES,
+    SQL_DURATION,
+    TEMPLATE_DURATION,
+)
+
+
+def render_metrics():
+    '''Function to return the metrics of this process in Prometheus format'''
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
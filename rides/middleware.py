@@ -0,0 +1,181 @@
+import asyncio
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .routers import pick_replica, replica, wrote
+from .slowlog import current_view
+from .metrics import (
+    REQUESTS,
+    REQUEST_DURATION,
+    RESPONSE_SIZE,
+    SQL_QUERIES,
+    SQL_DURATION,
+    TEMPLATE_DURATION,
+)
+
+
+class QueryTracker:
+    '''Database execute wrapper counting and timing the queries it runs'''
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class PerformanceMiddleware:
+    '''
+    Middleware recording per view (URL name) metrics of every request:
+    wall time, status code and response size. A sampled share of the
+    requests (RIDES_METRICS_SAMPLE_RATE) also records SQL query count
+    and time and the time rendering its TemplateResponse, which cost
+    a wrapper around every query. Metrics are exported by metrics_view.
+    Queries run in other threads, as by the async views or by any view
+    served under ASGI, are not seen.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "RIDES_METRICS_SAMPLE_RATE", 1)
+        if asyncio.iscoroutinefunction(get_response):
+            # makes Django await __call__, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        tracker = None
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            tracker = request._query_tracker = QueryTracker()
+        with ExitStack() as stack:
+            if tracker is not None:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(tracker))
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, tracker)
+        return response
+
+    async def __acall__(self, request):
+        '''
+        method to time a request under ASGI without holding a thread,
+        its queries run in the threads of the views and are not tracked
+        '''
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, None)
+        return response
+
+    def record(self, request, response, elapsed, tracker):
+        '''method to record the metrics of a served request'''
+        current_view.set(None)
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        REQUESTS.inc(view, str(response.status_code))
+        REQUEST_DURATION.observe(elapsed, view)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view)
+        if tracker is not None:
+            SQL_QUERIES.observe(tracker.count, view)
+            SQL_DURATION.observe(tracker.seconds, view)
+            template_seconds = getattr(request, "_template_seconds", None)
+            if template_seconds is not None:
+                TEMPLATE_DURATION.observe(template_seconds, view)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        '''method to tag the queries run by the view with its name'''
+        current_view.set(request.resolver_match.view_name)
+
+    def process_template_response(self, request, response):
+        '''method to time the rendering of sampled template responses'''
+        if hasattr(request, "_query_tracker"):
+            start = time.perf_counter()
+
+            def rendered(response):
+                request._template_seconds = time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaMiddleware:
+    '''
+    Middleware letting GET, HEAD and OPTIONS requests read from the
+    replicas of rides.routers.ReplicaRouter. A request that wrote sets
+    a cookie keeping the reads of that client on the primary for
+    RIDES_PRIMARY_STICKY_SECONDS, longer than the replicas lag, so
+    users always see their own requests and payments. Bodies streamed
+    after the view returned are read from the primary.
+    '''
+    cookie = "db_primary"
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(
+            settings, "RIDES_PRIMARY_STICKY_SECONDS", 10
+        )
+        if asyncio.iscoroutinefunction(get_response):
+            # makes Django await __call__, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        reads, writes = self.start(request)
+        try:
+            response = self.get_response(request)
+            self.finish(response)
+        finally:
+            # threads serve one request after another, start clean
+            replica.reset(reads)
+            wrote.reset(writes)
+        return response
+
+    async def __acall__(self, request):
+        '''
+        method to route a request under ASGI, the variables are copied
+        into the threads running its sync view and queries
+        '''
+        reads, writes = self.start(request)
+        try:
+            response = await self.get_response(request)
+            self.finish(response)
+        finally:
+            replica.reset(reads)
+            wrote.reset(writes)
+        return response
+
+    def start(self, request):
+        '''method to pick where the reads of request go'''
+        stale_ok = (
+            request.method in self.safe_methods
+            and self.cookie not in request.COOKIES
+        )
+        return (
+            replica.set(pick_replica() if stale_ok else None),
+            wrote.set(False),
+        )
+
+    def finish(self, response):
+        '''method to keep a client that wrote on the primary'''
+        if wrote.get():
+            response.set_cookie(
+                self.cookie, "1", max_age=self.sticky_seconds,
+                httponly=True, samesite="Lax",
+            )
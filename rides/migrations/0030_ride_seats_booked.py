@@ -0,0 +1,34 @@
+# Generated by Django 3.1.6 on 2026-10-18 13:32
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_booked_seats(apps, schema_editor):
+    '''Fill seats_booked from the existing trips in one UPDATE'''
+    Ride = apps.get_model('rides', 'Ride')
+    Trip = apps.get_model('rides', 'Trip')
+    trips = (
+        Trip.objects.filter(ride=OuterRef('pk'))
+        .values('ride')
+        .annotate(booked=Count('pk'))
+        .values('booked')
+    )
+    Ride.objects.update(seats_booked=Coalesce(Subquery(trips), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0029_request_request_created_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='seats_booked',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_booked_seats, migrations.RunPython.noop),
+    ]
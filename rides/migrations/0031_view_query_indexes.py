@@ -0,0 +1,45 @@
+# Generated by Django 3.1.6 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0030_ride_seats_booked'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['rider', '-generated_time', '-id'], name='payment_rider_generated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['ride', '-generated_time'], name='payment_ride_generated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status'], name='payment_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['user_requested', '-request_created_time', '-id'], name='request_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['ride', '-request_created_time'], name='request_ride_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(status='Pending'), fields=['ride'], name='request_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(condition=models.Q(is_active=True), fields=['-ride_created_time', '-id'], name='ride_active_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['driver', '-ride_created_time', '-id'], name='ride_driver_created_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 3.1.6 on 2026-10-18 13:34
+
+import unicodedata
+
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = (
+    ('ride_source_trgm_idx', 'source_key'),
+    ('ride_destination_trgm_idx', 'destination_key'),
+)
+
+
+def normalize_location(location):
+    '''
+    Search key of a location as rides.utils.normalize_location built it
+    when this migration was written, frozen here with the migration
+    '''
+    if not location:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', location)
+    ascii_only = ''.join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+    return ' '.join(ascii_only.lower().split())
+
+
+def fill_location_keys(apps, schema_editor):
+    '''Compute the normalized location keys of existing rides'''
+    Ride = apps.get_model('rides', 'Ride')
+    batch = []
+    rides = Ride.objects.only('source_location', 'destination_location')
+    for ride in rides.iterator(chunk_size=2000):
+        ride.source_key = normalize_location(ride.source_location)
+        ride.destination_key = normalize_location(ride.destination_location)
+        batch.append(ride)
+        if len(batch) == 2000:
+            Ride.objects.bulk_update(batch, ['source_key', 'destination_key'])
+            batch = []
+    Ride.objects.bulk_update(batch, ['source_key', 'destination_key'])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    '''Trigram indexes for fuzzy location search, PostgreSQL only'''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON rides_ride '
+            f'USING gin ({column} gin_trgm_ops) WHERE is_active'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0031_view_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='destination_key',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='source_key',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.RunPython(fill_location_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(condition=models.Q(is_active=True), fields=['source_key', 'destination_key', 'start_time'], name='ride_route_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops', 'timestamptz_ops']),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
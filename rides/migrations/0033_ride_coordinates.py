@@ -0,0 +1,47 @@
+# Generated by Django 3.1.6 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0032_ride_location_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='destination_cell',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='destination_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='destination_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='source_cell',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='source_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='source_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(condition=models.Q(is_active=True), fields=['source_cell', 'start_time'], name='ride_source_cell_idx', opclasses=['varchar_pattern_ops', 'timestamptz_ops']),
+        ),
+    ]
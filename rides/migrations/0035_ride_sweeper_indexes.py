@@ -0,0 +1,21 @@
+# Generated by Django 3.1.6 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0034_stream_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(condition=models.Q(is_active=True), fields=['end_time'], name='ride_active_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(condition=models.Q(is_active=True), fields=['status'], name='ride_active_status_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 3.1.6 on 2026-10-18 14:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rides', '0035_ride_sweeper_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRide',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('source_location', models.CharField(max_length=50)),
+                ('destination_location', models.CharField(max_length=50)),
+                ('source_latitude', models.FloatField(blank=True, null=True)),
+                ('source_longitude', models.FloatField(blank=True, null=True)),
+                ('destination_latitude', models.FloatField(blank=True, null=True)),
+                ('destination_longitude', models.FloatField(blank=True, null=True)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('distance', models.DecimalField(decimal_places=1, max_digits=5)),
+                ('ride_created_time', models.DateTimeField()),
+                ('number_of_seats', models.IntegerField()),
+                ('seats_booked', models.IntegerField()),
+                ('car_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('car_number', models.CharField(blank=True, max_length=100, null=True)),
+                ('price_per_km', models.IntegerField()),
+                ('description', models.CharField(blank=True, max_length=500, null=True)),
+                ('archived_time', models.DateTimeField(auto_now_add=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_driving', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTrip',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('ride', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trips', to='rides.archivedride')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_riding', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedRequest',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('request_created_time', models.DateTimeField()),
+                ('status', models.CharField(max_length=50)),
+                ('comments', models.CharField(blank=True, max_length=255, null=True)),
+                ('ride', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requests', to='rides.archivedride')),
+                ('user_requested', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_requested', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('amount', models.IntegerField()),
+                ('generated_time', models.DateTimeField()),
+                ('status', models.CharField(max_length=20)),
+                ('ride', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='rides.archivedride')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedpayment',
+            index=models.Index(fields=['rider', '-generated_time', '-id'], name='archived_payment_rider_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpayment',
+            index=models.Index(fields=['ride', '-generated_time'], name='archived_payment_ride_idx'),
+        ),
+    ]
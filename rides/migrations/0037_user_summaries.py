@@ -0,0 +1,49 @@
+# Generated by Django 3.1.6 on 2026-10-18 14:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rides', '0036_ride_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSummary',
+            fields=[
+                ('billed', models.BigIntegerField(default=0)),
+                ('paid', models.BigIntegerField(default=0)),
+                ('earned', models.BigIntegerField(default=0)),
+                ('received', models.BigIntegerField(default=0)),
+                ('rides_driven', models.IntegerField(default=0)),
+                ('trips_taken', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='auth.user')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billed', models.BigIntegerField(default=0)),
+                ('paid', models.BigIntegerField(default=0)),
+                ('earned', models.BigIntegerField(default=0)),
+                ('received', models.BigIntegerField(default=0)),
+                ('rides_driven', models.IntegerField(default=0)),
+                ('trips_taken', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
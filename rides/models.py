@@ -1,11 +1,37 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from jobs.queue import enqueue
+from .badges import (
+    INCOMING_REQUESTS,
+    OUTGOING_REQUESTS,
+    UNPAID_PAYMENTS,
+    adjust_badge,
+)
+from .cache import bump_ride_version
+from .events import (
+    PAYMENT_NEW,
+    REQUEST_STATUS,
+    RIDE_SEATS,
+    publish_event,
+)
+from .geo import encode_geohash
+from .utils import normalize_location
 
 
 class Ride(models.Model):
     """Model for rides"""
+    # rides.archive moves old rides to ArchivedRide, where it is True
+    archived = False
+    # set by set_computed_fields, saved along with any updated field
+    COMPUTED_FIELDS = (
+        "title", "source_key", "destination_key",
+        "source_cell", "destination_cell",
+    )
+
     title = models.CharField(max_length=255, null=False, blank=True)
     source_location = models.CharField(
         max_length=50,
@@ -17,6 +43,24 @@ class Ride(models.Model):
         null=False,
         blank=False
         )
+    # normalized locations used by the route search
+    source_key = models.CharField(max_length=50, blank=True, editable=False)
+    destination_key = models.CharField(
+        max_length=50,
+        blank=True,
+        editable=False
+    )
+    # optional coordinates, indexed through their geohash cells
+    source_latitude = models.FloatField(null=True, blank=True)
+    source_longitude = models.FloatField(null=True, blank=True)
+    destination_latitude = models.FloatField(null=True, blank=True)
+    destination_longitude = models.FloatField(null=True, blank=True)
+    source_cell = models.CharField(max_length=12, blank=True, editable=False)
+    destination_cell = models.CharField(
+        max_length=12,
+        blank=True,
+        editable=False
+    )
     start_time = models.DateTimeField(
         auto_now=False,
         default=timezone.now
@@ -38,6 +82,8 @@ class Ride(models.Model):
         on_delete=models.CASCADE
     )
     number_of_seats = models.IntegerField(default=3)
+    # denormalized count of trips, updated under a row lock on approval
+    seats_booked = models.IntegerField(default=0, editable=False)
     car_name = models.CharField(max_length=100, null=True, blank=True)
     status = models.CharField(max_length=20, default='Pending')
     car_number = models.CharField(max_length=100, null=True, blank=True)
@@ -48,34 +94,208 @@ class Ride(models.Model):
         blank=True
     )
 
+    class Meta:
+        '''Meta class for Ride model'''
+        indexes = [
+            # home feed: active rides, newest first
+            models.Index(
+                fields=['-ride_created_time', '-id'],
+                condition=Q(is_active=True),
+                name='ride_active_feed_idx'
+            ),
+            # rides of a driver, newest first
+            models.Index(
+                fields=['driver', '-ride_created_time', '-id'],
+                name='ride_driver_created_idx'
+            ),
+            # route search: location prefixes and departure window
+            models.Index(
+                fields=['source_key', 'destination_key', 'start_time'],
+                condition=Q(is_active=True),
+                name='ride_route_idx',
+                opclasses=[
+                    'varchar_pattern_ops',
+                    'varchar_pattern_ops',
+                    'timestamptz_ops',
+                ]
+            ),
+            # geo matching: pickup cell prefixes and departure window
+            models.Index(
+                fields=['source_cell', 'start_time'],
+                condition=Q(is_active=True),
+                name='ride_source_cell_idx',
+                opclasses=['varchar_pattern_ops', 'timestamptz_ops']
+            ),
+            # sweeper: active rides that ended or were finished
+            models.Index(
+                fields=['end_time'],
+                condition=Q(is_active=True),
+                name='ride_active_end_idx'
+            ),
+            models.Index(
+                fields=['status'],
+                condition=Q(is_active=True),
+                name='ride_active_status_idx'
+            ),
+        ]
+
     def finish(self, *args, **kwargs):
         '''
             Method to finish Ride.
             This will create payments for all riders
             and then set the status of ride to Finished.
+            Everything happens in one transaction and finishing
+            an already finished ride is a no-op returning False.
+            With RIDES_DEFER_SIDE_EFFECTS the payments are
+            created by a background job instead.
+        '''
+        with transaction.atomic():
+            # only the first finish moves the status, retries stop here
+            finished = Ride.objects.filter(pk=self.pk).exclude(
+                status='Finished'
+            ).update(status='Finished')
+            self.status = 'Finished'
+            if not finished:
+                return False
+            bump_ride_version(self.pk)
+            add_to_summaries([self.driver_id], self.end_time, rides_driven=1)
+            if settings.RIDES_DEFER_SIDE_EFFECTS:
+                enqueue(
+                    "rides.generate_payments",
+                    key=f"ride-payments:{self.pk}",
+                    ride_id=self.pk,
+                )
+            else:
+                self.generate_payments()
+        return True
+
+    def generate_payments(self):
+        '''
+        Method to bill every rider of the ride.
+        Riders already billed are skipped and runs are serialized by
+        a lock on the ride, so running it again, even concurrently,
+        does not bill or count anyone twice.
+        '''
+        with transaction.atomic():
+            # overlapping runs, as a retried job, wait for the lock and
+            # then find the riders the first one billed
+            list(
+                Ride.objects.select_for_update().filter(pk=self.pk)
+                .values_list('pk', flat=True)
+            )
+            amount = self.price_per_km * self.distance
+            billed = Payment.objects.filter(ride_id=self.pk).values('rider_id')
+            riders = list(
+                self.trips.exclude(rider_id__in=billed)
+                .values_list('rider_id', flat=True)
+            )
+            Payment.objects.bulk_create(
+                [
+                    Payment(
+                        ride_id=self.pk,
+                        rider_id=rider_id,
+                        amount=amount,
+                        status="Pending"
+                    )
+                    for rider_id in riders
+                ],
+                ignore_conflicts=True
+            )
+            bump_ride_version(self.pk)
+            # the integer column keeps the whole part of the amount
+            billed = int(amount)
+            add_to_summaries(
+                riders, self.end_time, billed=billed, trips_taken=1
+            )
+            add_to_summaries(
+                [self.driver_id] if riders else [], self.end_time,
+                earned=billed * len(riders)
+            )
+            for rider_id in riders:
+                adjust_badge(rider_id, UNPAID_PAYMENTS, 1)
+            publish_event(riders, PAYMENT_NEW, {
+                "ride": self.pk, "amount": amount
+            })
+
+    def reject_pending_requests(self):
         '''
-        for trip in self.trips.all():
-            payment = Payment.objects.create(
-                ride=self,
-                rider=trip.rider,
-                amount=self.price_per_km * self.distance,
-                status="Pending"
+        Method to reject all pending requests of the ride in one query,
+        used once its seats are full. Returns the number rejected.
+        '''
+        pending = Request.objects.filter(ride_id=self.pk, status='Pending')
+        requesters = list(pending.values_list('user_requested_id', flat=True))
+        if not requesters:
+            return 0
+        pending.filter(user_requested_id__in=requesters).update(
+            status='Rejected'
+        )
+        adjust_badge(self.driver_id, INCOMING_REQUESTS, -len(requesters))
+        for user_id in requesters:
+            adjust_badge(user_id, OUTGOING_REQUESTS, -1)
+        publish_event(requesters, REQUEST_STATUS, {
+            "ride": self.pk, "status": 'Rejected'
+        })
+        return len(requesters)
+
+    @staticmethod
+    def compute_fields(driver, source_location, destination_location,
+                       source_latitude=None, source_longitude=None,
+                       destination_latitude=None, destination_longitude=None):
+        '''
+        Method to return the title, the normalized location keys and
+        the geohash cells of a ride from its plain values, driver being
+        its username. Bulk loaders use it without model instances.
+        '''
+        source_cell = destination_cell = ""
+        if source_latitude is not None and source_longitude is not None:
+            source_cell = encode_geohash(source_latitude, source_longitude)
+        if destination_latitude is not None and (
+            destination_longitude is not None
+        ):
+            destination_cell = encode_geohash(
+                destination_latitude, destination_longitude
             )
-            payment.save()
-        self.status = 'Finished'
-        self.save()
+        return {
+            "source_key": normalize_location(source_location),
+            "destination_key": normalize_location(destination_location),
+            "source_cell": source_cell,
+            "destination_cell": destination_cell,
+            "title": (
+                f"{driver} from \
+            {source_location} to \
+            {destination_location}"
+            ),
+        }
+
+    def set_computed_fields(self):
+        '''
+        Method to set the title used by __str__ Method,
+        the normalized location keys and geohash cells for search.
+        Called by save and by bulk loaders before bulk_create
+        '''
+        computed = self.compute_fields(
+            self.driver,
+            self.source_location,
+            self.destination_location,
+            self.source_latitude,
+            self.source_longitude,
+            self.destination_latitude,
+            self.destination_longitude,
+        )
+        for name, value in computed.items():
+            setattr(self, name, value)
 
     def save(self, *args, **kwargs):
         '''
         Method to override save method,
-        this will set title for the ride
-        to be used by __str__ Method
+        this will set the computed fields of the ride
         '''
-        self.title = (
-            f"{self.driver} from \
-            {self.source_location} to \
-            {self.destination_location}"
-        )
+        self.set_computed_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, *self.COMPUTED_FIELDS
+            }
         super(Ride, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -106,19 +326,121 @@ class Request(models.Model):
     class Meta:
         '''Meta class for the model'''
         unique_together = ('ride', 'user_requested')
+        indexes = [
+            # requests made by a user, newest first
+            models.Index(
+                fields=['user_requested', '-request_created_time', '-id'],
+                name='request_user_created_idx'
+            ),
+            # requests for the rides of a driver, joined through ride
+            models.Index(
+                fields=['ride', '-request_created_time'],
+                name='request_ride_created_idx'
+            ),
+            # pending requests of a ride, rejected in bulk when it fills
+            models.Index(
+                fields=['ride'],
+                condition=Q(status='Pending'),
+                name='request_pending_idx'
+            ),
+        ]
 
     def approve(self):
-        '''Method to approve request'''
-        trip = Trip.objects.create(ride=self.ride,
-                                   rider=self.user_requested)
-        trip.save()
+        '''
+        Method to approve request.
+        The ride row is locked while a seat is taken so that
+        concurrent approvals can not overbook the ride,
+        the request is rejected if the ride is already full.
+        Returns True if the request got approved.
+        '''
+        with transaction.atomic():
+            ride = Ride.objects.select_for_update().only(
+                "seats_booked", "number_of_seats", "driver_id"
+            ).get(pk=self.ride_id)
+            pending = Request.objects.filter(pk=self.pk, status='Pending')
+
+            if ride.seats_booked >= ride.number_of_seats:
+                if pending.update(status='Rejected'):
+                    self._request_closed(ride.driver_id, 'Rejected')
+                self.status = 'Rejected'
+                return False
+
+            # a request approved by an earlier submit is left untouched
+            if not pending.update(status='Approved'):
+                return False
+            self._request_closed(ride.driver_id, 'Approved')
+            Ride.objects.filter(pk=ride.pk).update(
+                seats_booked=F('seats_booked') + 1
+            )
+            bump_ride_version(ride.pk)
+            Trip.objects.create(
+                ride_id=self.ride_id,
+                rider_id=self.user_requested_id
+            )
+
+            still_pending = Request.objects.filter(
+                ride_id=self.ride_id,
+                status='Pending'
+            )
+            requesters = list(
+                still_pending.values_list('user_requested_id', flat=True)
+            )
+            publish_event(
+                [ride.driver_id, self.user_requested_id, *requesters],
+                RIDE_SEATS,
+                {
+                    "ride": self.ride_id,
+                    "seats_booked": ride.seats_booked + 1,
+                    "number_of_seats": ride.number_of_seats,
+                },
+            )
+
+            # reject all pending requests once seats are full, a deferred
+            # rejection is safe as approving them is refused meanwhile
+            if requesters and ride.seats_booked + 1 >= ride.number_of_seats:
+                if settings.RIDES_DEFER_SIDE_EFFECTS:
+                    enqueue(
+                        "rides.reject_pending_requests",
+                        key=f"ride-full:{ride.pk}",
+                        ride_id=ride.pk,
+                    )
+                else:
+                    ride.reject_pending_requests()
         self.status = 'Approved'
-        self.save()
+        return True
 
     def reject(self):
-        '''Method to reject request'''
+        '''
+        Method to reject request.
+        Only a request still pending in the database is rejected, so
+        a request approved meanwhile keeps its seat and its badges and
+        event are closed once. Returns True if the request got rejected.
+        '''
+        rejected = Request.objects.filter(
+            pk=self.pk, status='Pending'
+        ).update(status='Rejected')
+        if not rejected:
+            return False
         self.status = 'Rejected'
-        self.save()
+        bump_ride_version(self.ride_id)
+        self._request_closed(
+            Ride.objects.values_list('driver_id', flat=True).get(
+                pk=self.ride_id
+            ),
+            'Rejected'
+        )
+        return True
+
+    def _request_closed(self, driver_id, status):
+        '''
+        Method to update badges and notify the requester
+        when a pending request is answered
+        '''
+        adjust_badge(driver_id, INCOMING_REQUESTS, -1)
+        adjust_badge(self.user_requested_id, OUTGOING_REQUESTS, -1)
+        publish_event(self.user_requested_id, REQUEST_STATUS, {
+            "request": self.pk, "ride": self.ride_id, "status": status
+        })
 
     def __str__(self):
         '''Method for string representation'''
@@ -149,9 +471,7 @@ class Trip(models.Model):
 
     def clean(self):
         '''method to check if seats are full'''
-        if Trip.objects.filter(
-            ride=self.ride
-        ).count() >= self.ride.number_of_seats:
+        if self.ride.seats_booked >= self.ride.number_of_seats:
             raise ValidationError(
                 f"Only {self.ride.number_of_seats} riders allowed"
             )
@@ -180,12 +500,264 @@ class Payment(models.Model):
     class Meta:
         '''Meta class for Payment model'''
         unique_together = ("ride", "rider")
+        indexes = [
+            # payments of a rider, newest first
+            models.Index(
+                fields=['rider', '-generated_time', '-id'],
+                name='payment_rider_generated_idx'
+            ),
+            # payments received by a driver, joined through ride
+            models.Index(
+                fields=['ride', '-generated_time'],
+                name='payment_ride_generated_idx'
+            ),
+            models.Index(fields=['status'], name='payment_status_idx'),
+        ]
 
     def pay(self):
-        '''Method to pay the generated payment bill'''
-        self.status = "Paid"
-        self.save()
+        '''
+        Method to pay the generated payment bill.
+        Paying an already paid bill is a no-op returning False,
+        so the badge and the summaries only count it once.
+        '''
+        with transaction.atomic():
+            paid = Payment.objects.filter(pk=self.pk).exclude(
+                status="Paid"
+            ).update(status="Paid")
+            self.status = "Paid"
+            if not paid:
+                return False
+            driver_id, end_time = Ride.objects.filter(
+                pk=self.ride_id
+            ).values_list('driver_id', 'end_time').get()
+            add_to_summaries([self.rider_id], end_time, paid=self.amount)
+            add_to_summaries([driver_id], end_time, received=self.amount)
+        adjust_badge(self.rider_id, UNPAID_PAYMENTS, -1)
+        return True
 
     def __str__(self):
         '''Method for string representation'''
         return f"{self.ride} <-- {self.rider} {self.amount}"
+
+
+class ArchivedRide(models.Model):
+    """
+    Model for rides moved out of the hot tables by rides.archive,
+    read only. Ids are kept so links and exports stay valid.
+    """
+    archived = True
+
+    id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=255, blank=True)
+    source_location = models.CharField(max_length=50)
+    destination_location = models.CharField(max_length=50)
+    source_latitude = models.FloatField(null=True, blank=True)
+    source_longitude = models.FloatField(null=True, blank=True)
+    destination_latitude = models.FloatField(null=True, blank=True)
+    destination_longitude = models.FloatField(null=True, blank=True)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    distance = models.DecimalField(max_digits=5, decimal_places=1)
+    ride_created_time = models.DateTimeField()
+    driver = models.ForeignKey(
+        User,
+        related_name='archived_driving',
+        on_delete=models.CASCADE
+    )
+    number_of_seats = models.IntegerField()
+    seats_booked = models.IntegerField()
+    car_name = models.CharField(max_length=100, null=True, blank=True)
+    status = models.CharField(max_length=20)
+    car_number = models.CharField(max_length=100, null=True, blank=True)
+    price_per_km = models.IntegerField()
+    description = models.CharField(max_length=500, null=True, blank=True)
+    archived_time = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        '''Method for string representation'''
+        return self.title
+
+
+class ArchivedRequest(models.Model):
+    """Model for the requests of archived rides"""
+    id = models.IntegerField(primary_key=True)
+    ride = models.ForeignKey(
+        ArchivedRide,
+        related_name='requests',
+        on_delete=models.CASCADE
+    )
+    user_requested = models.ForeignKey(
+        User,
+        related_name='archived_requested',
+        on_delete=models.CASCADE
+    )
+    request_created_time = models.DateTimeField()
+    status = models.CharField(max_length=50)
+    comments = models.CharField(max_length=255, null=True, blank=True)
+
+
+class ArchivedTrip(models.Model):
+    """Model for the trips of archived rides"""
+    id = models.IntegerField(primary_key=True)
+    ride = models.ForeignKey(
+        ArchivedRide,
+        related_name='trips',
+        on_delete=models.CASCADE
+    )
+    rider = models.ForeignKey(
+        User,
+        related_name='archived_riding',
+        on_delete=models.CASCADE
+    )
+
+
+class ArchivedPayment(models.Model):
+    """Model for the payments of archived rides"""
+    id = models.IntegerField(primary_key=True)
+    ride = models.ForeignKey(
+        ArchivedRide,
+        related_name='payments',
+        on_delete=models.CASCADE
+    )
+    rider = models.ForeignKey(
+        User,
+        related_name='archived_payments',
+        on_delete=models.CASCADE
+    )
+    amount = models.IntegerField()
+    generated_time = models.DateTimeField()
+    status = models.CharField(max_length=20)
+
+    class Meta:
+        '''Meta class for ArchivedPayment model'''
+        indexes = [
+            # same reads as the payment history of the hot table
+            models.Index(
+                fields=['rider', '-generated_time', '-id'],
+                name='archived_payment_rider_idx'
+            ),
+            models.Index(
+                fields=['ride', '-generated_time'],
+                name='archived_payment_ride_idx'
+            ),
+        ]
+
+    def __str__(self):
+        '''Method for string representation'''
+        return f"{self.ride} <-- {self.rider} {self.amount}"
+
+
+class SummaryCounters(models.Model):
+    """
+    Counters shared by the running totals of a user and their day
+    buckets. As a rider a user is billed and pays, as a driver they
+    earn what their riders are billed and receive what they pay.
+    """
+    billed = models.BigIntegerField(default=0)
+    paid = models.BigIntegerField(default=0)
+    earned = models.BigIntegerField(default=0)
+    received = models.BigIntegerField(default=0)
+    rides_driven = models.IntegerField(default=0)
+    trips_taken = models.IntegerField(default=0)
+
+    COUNTERS = (
+        'billed', 'paid', 'earned', 'received', 'rides_driven', 'trips_taken'
+    )
+
+    class Meta:
+        abstract = True
+
+    @property
+    def outstanding(self):
+        '''what the user still owes for their trips'''
+        return self.billed - self.paid
+
+    @property
+    def receivable(self):
+        '''what the riders of the user still owe them'''
+        return self.earned - self.received
+
+    @classmethod
+    def add(cls, user_ids, deltas, **keys):
+        '''
+        method to add deltas to the counters of the rows of user_ids
+        with an UPDATE ... SET counter = counter + delta, rows missing
+        are created. Meant to run inside the transaction of the change
+        being counted, so both commit or roll back together.
+        '''
+        changes = {name: F(name) + value for name, value in deltas.items()}
+        rows = cls.objects.filter(user_id__in=user_ids, **keys)
+        if rows.update(**changes) == len(user_ids):
+            return
+        existing = set(rows.values_list('user_id', flat=True))
+        for user_id in set(user_ids).difference(existing):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, **keys, **deltas)
+            except IntegrityError:
+                # created meanwhile by a concurrent change
+                cls.objects.filter(user_id=user_id, **keys).update(
+                    **changes
+                )
+
+
+class UserSummary(SummaryCounters):
+    """Model for the running totals of a user, see rides.summary"""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='summary',
+        on_delete=models.CASCADE
+    )
+
+    def __str__(self):
+        '''Method for string representation'''
+        return f"{self.user_id}: {self.outstanding} outstanding"
+
+
+class DailySummary(SummaryCounters):
+    """
+    Model for the totals of a user over one day, the day the ride
+    ended, so a ride and its payments always land in the same bucket
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='daily_summaries',
+        on_delete=models.CASCADE
+    )
+    day = models.DateField()
+
+    class Meta:
+        '''Meta class for DailySummary model'''
+        unique_together = ('user', 'day')
+
+    def __str__(self):
+        '''Method for string representation'''
+        return f"{self.user_id} {self.day}"
+
+
+def add_to_summaries(user_ids, end_time, **deltas):
+    '''
+    Function to add deltas to the totals of user_ids and to their
+    bucket of the day end_time falls on
+    '''
+    if not user_ids:
+        return
+    UserSummary.add(user_ids, deltas)
+    DailySummary.add(user_ids, deltas, day=timezone.localdate(end_time))
+
+
+class StreamEvent(models.Model):
+    """Model for events waiting to be pushed to the live stream of a user"""
+    user = models.ForeignKey(
+        User,
+        related_name="stream_events",
+        on_delete=models.CASCADE
+    )
+    type = models.CharField(max_length=50)
+    data = models.JSONField(default=dict)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        '''Method for string representation'''
+        return f"{self.type} --> {self.user}"
@@ -0,0 +1,214 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import Http404
+
+
+class WindowedPaginator(Paginator):
+    '''
+    Offset paginator that only computes the page numbers
+    around the current page instead of the whole page_range
+    '''
+    on_each_side = 2
+
+    def page_window(self, number):
+        '''method to return the page numbers shown around number'''
+        first = max(1, number - self.on_each_side)
+        last = min(self.num_pages, number + self.on_each_side)
+        return range(first, last + 1)
+
+
+class InvalidCursor(Exception):
+    '''Raised when a cursor token can not be decoded'''
+
+
+class CursorPage(Sequence):
+    '''
+    A single page of a keyset paginated queryset.
+    Unlike django's Page it has no number and no total count,
+    only opaque tokens to fetch the neighbouring pages.
+    '''
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<Cursor page of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        '''method to check if there is a page after this one'''
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        '''method to check if there is a page before this one'''
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        '''method to check if there are pages around this one'''
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    '''
+    Keyset paginator, pages are fetched with a
+    WHERE (ordering columns) < (last row seen) LIMIT per_page + 1
+    query so the cost of a page does not depend on its depth.
+
+    ordering is a sequence of model field or annotation names,
+    prefixed with "-" for descending order, which must be unique
+    as a whole (end it with the primary key).
+    '''
+    count = None
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = list(ordering)
+        self.fields = [
+            self.ordering_field(queryset, name.lstrip("-"))
+            for name in self.ordering
+        ]
+
+    @staticmethod
+    def ordering_field(queryset, name):
+        '''
+        method to return the field of an ordering column, for an
+        annotation a copy of its output field bound to its name
+        '''
+        query = getattr(queryset, "query", None)
+        annotation = query and query.annotations.get(name)
+        if annotation is None:
+            return queryset.model._meta.get_field(name)
+        field = annotation.output_field.clone()
+        field.set_attributes_from_name(name)
+        return field
+
+    def encode_cursor(self, obj, direction):
+        '''method to build an opaque token pointing at obj'''
+        values = [field.value_to_string(obj) for field in self.fields]
+        raw = json.dumps([direction, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, token):
+        '''method to read the direction and row values from a token'''
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in ("n", "p") or (
+                len(values) != len(self.fields)
+            ):
+                raise ValueError(token)
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (
+            ValueError, TypeError, ValidationError, binascii.Error
+        ) as error:
+            raise InvalidCursor(token) from error
+        return direction, values
+
+    def _seek(self, values, forward):
+        '''
+        Condition selecting rows after (or before) the given
+        row values in the ordering of the paginator
+        '''
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith("-")
+            lookup = "lt" if descending == forward else "gt"
+            term = Q(**{f"{self.fields[position].name}__{lookup}": (
+                values[position]
+            )})
+            for field, value in zip(self.fields[:position], values):
+                term &= Q(**{field.name: value})
+            condition |= term
+        # a plain range on the leading column lets the index do the seek
+        first = self.fields[0].name
+        bound = "lte" if self.ordering[0].startswith("-") == forward else "gte"
+        return Q(**{f"{first}__{bound}": values[0]}) & condition
+
+    def page(self, cursor=None):
+        '''method to return the page pointed at by cursor'''
+        forward = True
+        queryset = self.queryset
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            forward = direction == "n"
+            queryset = queryset.filter(self._seek(values, forward))
+
+        if forward:
+            ordering = self.ordering
+        else:
+            ordering = [
+                name[1:] if name.startswith("-") else f"-{name}"
+                for name in self.ordering
+            ]
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, bool(cursor)
+        else:
+            has_next, has_previous = True, has_more
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], "n")
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], "p")
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    '''
+    Mixin for ListViews to opt in to keyset pagination.
+    It is used when cursor_pagination is set on the view or
+    when the request carries a "cursor" parameter,
+    otherwise the windowed offset paginator is used.
+    '''
+    paginator_class = WindowedPaginator
+    cursor_pagination = False
+    cursor_ordering = None
+    cursor_kwarg = "cursor"
+
+    def use_cursor_pagination(self):
+        '''method to check if this request is keyset paginated'''
+        return bool(self.cursor_ordering) and (
+            self.cursor_pagination or self.cursor_kwarg in self.request.GET
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        '''method to paginate the queryset by cursor when enabled'''
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(
+            queryset, page_size, self.cursor_ordering
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        '''method to tell the templates which pagination is in use'''
+        context = super().get_context_data(**kwargs)
+        context["cursor_pagination"] = self.use_cursor_pagination()
+        return context
@@ -0,0 +1,61 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# replica the current request reads from, set by
+# rides.middleware.ReplicaMiddleware, everything else reads the primary
+replica = ContextVar("replica", default=None)
+# set once the current request wrote to the primary
+wrote = ContextVar("wrote", default=False)
+
+
+def replicas():
+    '''Function to return the aliases of the replica databases'''
+    return getattr(settings, "DATABASE_REPLICAS", ())
+
+
+def pick_replica():
+    '''
+    Function to pick the replica of a request, one for all its reads
+    so they see the same point of the replication stream
+    '''
+    aliases = replicas()
+    return random.choice(aliases) if aliases else None
+
+
+class ReplicaRouter:
+    '''
+    Database router sending writes to the primary (default) database
+    and reads to the replica of DATABASE_REPLICAS picked for the current
+    request, if any. Reads stay on the primary inside transactions,
+    which may hold writes the replicas have not seen, and for the rest
+    of a request once it wrote.
+    '''
+
+    def db_for_read(self, model, **hints):
+        '''method to read from the replica of the request'''
+        alias = replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        '''method to send writes to the primary and remember them'''
+        replica.set(None)
+        wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        '''method to relate rows read from the primary or any replica'''
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        '''method to migrate the primary only, replicas follow it'''
+        if db in replicas():
+            return False
+        return None
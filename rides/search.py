@@ -0,0 +1,79 @@
+from functools import lru_cache
+
+from django.db import connections
+from django.db.models import CharField, F, FloatField, Q, Value
+from django.utils import timezone
+
+from .fulltext import search_terms, text_match
+from .models import Ride
+from .utils import normalize_location, prefix_match
+
+
+@lru_cache(maxsize=None)
+def _register_trigram_lookup():
+    '''Register the trigram_similar lookup once, PostgreSQL only'''
+    from django.contrib.postgres.lookups import TrigramSimilar
+    CharField.register_lookup(TrigramSimilar)
+
+
+def location_match(field, location, using="default"):
+    '''
+    Condition matching rides whose normalized location starts
+    with the searched one, on PostgreSQL similar spellings
+    (served by the trigram indexes) match as well
+    '''
+    key = normalize_location(location)
+    match = prefix_match(field, key, using)
+    if connections[using].vendor == "postgresql":
+        _register_trigram_lookup()
+        match |= Q(**{f"{field}__trigram_similar": key})
+    return match
+
+
+def keyword_search(text, queryset=None):
+    '''
+    Function to return the rides of queryset (default all rides)
+    matching every word of text in their title, locations, car name
+    or description, annotated with their rank, best matches first.
+    Served by the full text index of rides.fulltext.
+    '''
+    if queryset is None:
+        queryset = Ride.objects.all()
+    terms = search_terms(text)
+    if not terms:
+        # text without words matches nothing, still ranked for cursors
+        return queryset.none().annotate(
+            rank=Value(0.0, output_field=FloatField())
+        ).order_by("-rank", "id")
+    rides, rank = text_match(queryset, terms)
+    return rides.annotate(rank=rank).order_by("-rank", "id")
+
+
+def search_rides(source="", destination="", start_after=None,
+                 start_before=None, keywords="", queryset=None):
+    '''
+    Function to search active rides with free seats by route
+    and keywords, departing between start_after (default now)
+    and start_before
+    '''
+    if queryset is None:
+        queryset = Ride.objects.all()
+    if start_after is None:
+        start_after = timezone.now()
+    rides = queryset.filter(
+        is_active=True,
+        seats_booked__lt=F("number_of_seats"),
+        start_time__gte=start_after,
+    )
+    if start_before is not None:
+        rides = rides.filter(start_time__lte=start_before)
+    if source:
+        rides = rides.filter(location_match("source_key", source, rides.db))
+    if destination:
+        rides = rides.filter(
+            location_match("destination_key", destination, rides.db)
+        )
+    terms = search_terms(keywords)
+    if terms:
+        rides, _ = text_match(rides, terms)
+    return rides.order_by("start_time", "id")
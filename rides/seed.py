@@ -0,0 +1,591 @@
+import csv
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import Profile
+from .badges import forget_badges
+from .cache import bump_ride_version
+from .models import Ride, Request, Trip, Payment
+
+# places rides go between, with their coordinates (greater Bengaluru)
+PLACES = {
+    "Koramangala": (12.9352, 77.6245),
+    "Indiranagar": (12.9784, 77.6408),
+    "Whitefield": (12.9698, 77.7500),
+    "Electronic City": (12.8399, 77.6770),
+    "Hebbal": (13.0358, 77.5970),
+    "Jayanagar": (12.9250, 77.5938),
+    "Marathahalli": (12.9591, 77.6974),
+    "Yelahanka": (13.1007, 77.5963),
+    "Malleshwaram": (13.0035, 77.5709),
+    "HSR Layout": (12.9116, 77.6474),
+    "Banashankari": (12.9255, 77.5468),
+    "MG Road": (12.9756, 77.6050),
+}
+CARS = ("Swift", "i20", "City", "Innova", "Nexon", "Baleno")
+NOTES = (
+    "Air conditioned car, music on request.",
+    "No smoking please, pets are welcome.",
+    "Leaving from the metro station exit.",
+    "Space for two suitcases in the boot.",
+    "Quiet ride, I take the outer ring road.",
+    "Can stop for coffee on the way.",
+    "Women only ride, please be on time.",
+    "Flexible pickup near the tech park gate.",
+    "Electric car, charging cables allowed.",
+    "Daily office commute, regulars welcome.",
+)
+PASSWORD = "benchmark-password"
+
+# kinds of rows that can be imported, in the order they depend on
+KINDS = ("users", "rides", "requests", "trips", "payments")
+TRUE_VALUES = ("1", "t", "true", "y", "yes")
+
+
+class LoadError(Exception):
+    '''Raised for rows that cannot be loaded'''
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+class BulkWriter:
+    '''
+    Writer inserting rows of a model with one executemany per batch.
+    It skips model instances and the SQL compiler, where bulk_create
+    spends most of its time. No signals are sent and save() is not
+    called, callers fill in what those would have.
+    '''
+
+    def __init__(self, model, using=DEFAULT_DB_ALIAS):
+        self.model = model
+        self.using = using
+        self.connection = connections[using]
+        self.now = timezone.now()
+        fields = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        self.columns = []
+        for field in fields:
+            convert = self.converter(field)
+            self.columns.append((
+                field.attname,
+                convert,
+                self.default(field, convert),
+                field.empty_strings_allowed,
+            ))
+        quote = self.connection.ops.quote_name
+        self.sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(model._meta.db_table),
+            ", ".join(quote(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+
+    def converter(self, field):
+        '''
+        method to return the function turning a value of the field,
+        native or read from a file, into its database value
+        '''
+        connection = self.connection
+        if isinstance(field, models.DateTimeField):
+            def convert(value):
+                if isinstance(value, str):
+                    try:
+                        # the C parser, much faster than parse_datetime
+                        value = datetime.fromisoformat(value)
+                    except ValueError:
+                        parsed = parse_datetime(value)
+                        if parsed is None:
+                            raise LoadError(f"invalid datetime {value!r}")
+                        value = parsed
+                if value.tzinfo is None:
+                    value = timezone.make_aware(value)
+                return adapt(value)
+            adapt = connection.ops.adapt_datetimefield_value
+            return convert
+        if isinstance(field, (models.CharField, models.TextField)):
+            return str
+        if isinstance(field, models.BooleanField):
+            return _parse_bool
+        if isinstance(field, models.FloatField):
+            return float
+        if isinstance(field, (models.IntegerField, models.ForeignKey)):
+            return int
+        if isinstance(field, models.DecimalField):
+            def convert(value):
+                return connection.ops.adapt_decimalfield_value(
+                    field.to_python(value),
+                    field.max_digits,
+                    field.decimal_places,
+                )
+            return convert
+        if isinstance(field, models.JSONField):
+            return lambda value: json.dumps(
+                json.loads(value) if isinstance(value, str) else value
+            )
+
+        def convert(value):
+            return field.get_db_prep_save(field.to_python(value), connection)
+        return convert
+
+    def default(self, field, convert):
+        '''
+        method to return the function giving the database value of a
+        missing field. Defaults that are not callables are converted once.
+        '''
+        if getattr(field, "auto_now", False) or (
+            getattr(field, "auto_now_add", False)
+        ):
+            value = convert(self.now)
+        elif callable(field.default):
+            def default():
+                value = field.get_default()
+                return None if value is None else convert(value)
+            return default
+        else:
+            value = field.get_default()
+            if value is not None:
+                value = convert(value)
+        return lambda: value
+
+    def prepare(self, row):
+        '''
+        method to turn a dict keyed by field attnames into the tuple of
+        its column values. Missing fields, None and empty values of
+        non text fields take the default of the field.
+        '''
+        values = []
+        get, append = row.get, values.append
+        try:
+            for name, convert, default, text in self.columns:
+                value = get(name)
+                if value is None or (value == "" and not text):
+                    append(default())
+                else:
+                    append(convert(value))
+        except (TypeError, ValueError) as error:
+            raise LoadError(f"{name}: {error}") from None
+        return tuple(values)
+
+    def insert(self, rows):
+        '''
+        method to insert prepared rows and return their new ids in
+        order. Ids are read back from above the previous maximum, so
+        nothing else may insert into the table during a load.
+        '''
+        if not rows:
+            return []
+        manager = self.model._base_manager.using(self.using)
+        with transaction.atomic(using=self.using):
+            last = manager.aggregate(last=Max("pk"))["last"] or 0
+            with self.connection.cursor() as cursor:
+                cursor.executemany(self.sql, rows)
+            ids = list(
+                manager.filter(pk__gt=last).order_by("pk")
+                .values_list("pk", flat=True)
+            )
+        if len(ids) != len(rows):
+            raise LoadError(
+                f"{self.model._meta.db_table} was written to during the load"
+            )
+        return ids
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_rows(path):
+    '''Function to yield the rows of a CSV or JSON lines file as dicts'''
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as handle:
+        if path.suffix.lower() == ".csv":
+            yield from csv.DictReader(handle)
+            return
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise LoadError(f"{path}:{number}: {error}") from None
+
+
+def file_kind(path):
+    '''Function to return the kind of rows of a file from its name'''
+    kind = Path(path).name.split(".")[0].lower()
+    if kind not in KINDS:
+        raise LoadError(
+            f"{path}: name must start with one of {', '.join(KINDS)}"
+        )
+    return kind
+
+
+class Importer:
+    '''
+    Loader of users, rides, requests, trips and payments in the shapes
+    the API returns them: users are referred to by username, rides by
+    the id they have in the imported rides or by an existing ride id.
+    Every batch is inserted in its own transaction. Users that already
+    exist are skipped so an interrupted users import can be run again.
+    finish() drops the cached data made stale by the load.
+    '''
+
+    def __init__(self, batch_size=2000, using=DEFAULT_DB_ALIAS):
+        self.batch_size = batch_size
+        self.using = using
+        self.writers = {}
+        # username -> id, and id of a ride in the file -> its new id
+        self.user_ids = {}
+        self.ride_ids = {}
+        # users and rides from before the load that rows point to
+        self.existing_users = set()
+        self.existing_rides = set()
+
+    def writer(self, model):
+        '''method to return the writer of a model'''
+        if model not in self.writers:
+            self.writers[model] = BulkWriter(model, self.using)
+        return self.writers[model]
+
+    def load(self, kind, rows):
+        '''
+        method to load rows of a kind batch by batch, yielding the
+        number of rows read and written after every batch
+        '''
+        load_batch = getattr(self, f"load_{kind}")
+        read = written = 0
+        for chunk in _chunks(rows, self.batch_size):
+            try:
+                with transaction.atomic(using=self.using):
+                    written += load_batch(chunk)
+            except KeyError as error:
+                raise LoadError(f"missing column {error}") from None
+            read += len(chunk)
+            yield read, written
+
+    def resolve_users(self, names):
+        '''method to look up the ids of usernames missing from user_ids'''
+        names = set(names)
+        missing = names - self.user_ids.keys()
+        if missing:
+            found = dict(
+                User.objects.using(self.using).filter(username__in=missing)
+                .values_list("username", "id")
+            )
+            self.user_ids.update(found)
+            self.existing_users.update(found.values())
+        unknown = names - self.user_ids.keys()
+        if unknown:
+            raise LoadError(f"unknown users: {', '.join(sorted(unknown))}")
+
+    def ride_id(self, value):
+        '''method to map the ride of a row to the id of the ride'''
+        if str(value) in self.ride_ids:
+            return self.ride_ids[str(value)]
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise LoadError(f"invalid ride {value!r}") from None
+
+    def load_users(self, rows):
+        '''
+        method to insert users with their profiles. Passwords already
+        hashed are kept, others are hashed one by one which is slow,
+        users without one get an unusable password.
+        '''
+        names = [row["username"] for row in rows]
+        existing = set(
+            User.objects.using(self.using).filter(username__in=names)
+            .values_list("username", flat=True)
+        )
+        writer, users = self.writer(User), []
+        for row in rows:
+            if row["username"] in existing:
+                continue
+            existing.add(row["username"])
+            row = dict(row)
+            password = row.get("password")
+            try:
+                identify_hasher(password)
+            except ValueError:
+                row["password"] = make_password(password or None)
+            users.append(row)
+        ids = writer.insert([writer.prepare(row) for row in users])
+        # what the create_profile signal does for every saved user
+        profiles = self.writer(Profile)
+        profiles.insert([profiles.prepare({"user_id": pk}) for pk in ids])
+        self.user_ids.update(
+            (row["username"], pk) for row, pk in zip(users, ids)
+        )
+        # every user comes with a profile
+        return 2 * len(ids)
+
+    def load_rides(self, rows):
+        '''
+        method to insert rides, with the title and search fields save()
+        would set. Their ids in the file are kept in ride_ids.
+        '''
+        self.resolve_users(row["driver"] for row in rows)
+        writer, prepared = self.writer(Ride), []
+        for row in rows:
+            row = dict(row)
+            for name in (
+                "source_latitude", "source_longitude",
+                "destination_latitude", "destination_longitude",
+            ):
+                if row.get(name) in ("", None):
+                    row[name] = None
+                else:
+                    row[name] = float(row[name])
+            row.update(Ride.compute_fields(
+                row["driver"],
+                row["source_location"],
+                row["destination_location"],
+                row["source_latitude"],
+                row["source_longitude"],
+                row["destination_latitude"],
+                row["destination_longitude"],
+            ))
+            row["driver_id"] = self.user_ids[row["driver"]]
+            prepared.append(writer.prepare(row))
+        ids = writer.insert(prepared)
+        for row, pk in zip(rows, ids):
+            if row.get("id") not in ("", None):
+                self.ride_ids[str(row["id"])] = pk
+        return len(ids)
+
+    def load_related(self, model, user_field, rows):
+        '''method to insert rows pointing to a ride and a user'''
+        self.resolve_users(row[user_field] for row in rows)
+        writer, prepared = self.writer(model), []
+        for row in rows:
+            row = dict(row)
+            row["ride_id"] = self.ride_id(row["ride"])
+            if str(row["ride"]) not in self.ride_ids:
+                self.existing_rides.add(row["ride_id"])
+            row[f"{user_field}_id"] = self.user_ids[row[user_field]]
+            prepared.append(writer.prepare(row))
+        return len(writer.insert(prepared))
+
+    def load_requests(self, rows):
+        '''method to insert requests'''
+        return self.load_related(Request, "user_requested", rows)
+
+    def load_trips(self, rows):
+        '''method to insert trips'''
+        return self.load_related(Trip, "rider", rows)
+
+    def load_payments(self, rows):
+        '''method to insert payments'''
+        return self.load_related(Payment, "rider", rows)
+
+    def finish(self):
+        '''
+        method to drop the badges of the users and the cached fragments
+        of the rides that existed before the load, as the rows added
+        for them bypassed adjust_badge and bump_ride_version
+        '''
+        users = set(self.existing_users)
+        users.update(
+            Ride.objects.using(self.using)
+            .filter(pk__in=self.existing_rides)
+            .values_list("driver_id", flat=True)
+        )
+        forget_badges(users)
+        for ride_id in self.existing_rides:
+            bump_ride_version(ride_id)
+
+
+def seed_users(prefix, count, batch_size):
+    '''
+    Function to bulk create users named <prefix>-<n> with their
+    profiles, all sharing one password hash. Yields their
+    (id, username) batch by batch.
+    '''
+    password = make_password(PASSWORD)
+    users, profiles = BulkWriter(User), BulkWriter(Profile)
+    for start in range(0, count, batch_size):
+        names = [
+            f"{prefix}-{number}"
+            for number in range(start, min(start + batch_size, count))
+        ]
+        with transaction.atomic():
+            ids = users.insert([
+                users.prepare({
+                    "username": name,
+                    "email": f"{name}@example.com",
+                    "password": password,
+                })
+                for name in names
+            ])
+            # bulk inserts skip the post_save signal creating profiles
+            profiles.insert([profiles.prepare({"user_id": pk}) for pk in ids])
+        yield list(zip(ids, names))
+
+
+def seed_rides(users, count, requests_per_ride, batch_size, rng):
+    '''
+    Function to bulk create rides spread over two months around now,
+    with their requests, trips and payments. Past rides are finished
+    and billed, every ride is as full as its approved requests.
+    Yields the number of rows written per batch.
+    '''
+    now = timezone.now()
+    drivers = users[:max(1, len(users) // 4)]
+    routes = [
+        (source, destination)
+        for source in PLACES for destination in PLACES
+        if source != destination
+    ]
+    writers = {
+        model: BulkWriter(model) for model in (Ride, Request, Trip, Payment)
+    }
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        # values are drawn a batch at a time, much faster than one by one
+        draws = zip(
+            rng.choices(drivers, k=size),
+            rng.choices(routes, k=size),
+            rng.choices(range(-43200, 43201), k=size),
+            rng.choices(range(20, 91), k=size),
+            rng.choices(range(1, 5), k=size),
+            rng.choices(range(3, 41), k=size),
+            rng.choices(range(5, 16), k=size),
+            rng.choices(CARS, k=size),
+            rng.choices(range(1, 100), k=size),
+            rng.choices(range(1, 10000), k=size),
+            rng.choices(NOTES, k=size),
+            rng.choices(NOTES, k=size),
+        )
+        plans, rides = [], []
+        for (
+            (driver_id, driver_name), (source, destination), offset,
+            duration, seats, distance, price, car, region, number,
+            note, other_note,
+        ) in draws:
+            start_time = now + timedelta(minutes=offset)
+            riders = [
+                user for user in rng.sample(
+                    users, min(requests_per_ride + 1, len(users))
+                )
+                if user[0] != driver_id
+            ][:requests_per_ride]
+            approved = riders[:rng.randint(0, min(seats, len(riders)))]
+            finished = start_time < now
+            ride = Ride.compute_fields(
+                driver_name, source, destination,
+                *PLACES[source], *PLACES[destination],
+            )
+            ride.update({
+                "driver_id": driver_id,
+                "source_location": source,
+                "destination_location": destination,
+                "source_latitude": PLACES[source][0],
+                "source_longitude": PLACES[source][1],
+                "destination_latitude": PLACES[destination][0],
+                "destination_longitude": PLACES[destination][1],
+                "start_time": start_time,
+                "end_time": start_time + timedelta(minutes=duration),
+                "distance": distance,
+                "price_per_km": price,
+                "number_of_seats": seats,
+                "seats_booked": len(approved),
+                "status": "Finished" if finished else "Pending",
+                "car_name": car,
+                "car_number": f"KA-{region} {number}",
+                "description": f"{note} {other_note}",
+            })
+            plans.append((riders, approved, finished))
+            rides.append(ride)
+
+        with transaction.atomic():
+            writer = writers[Ride]
+            ids = writer.insert([writer.prepare(ride) for ride in rides])
+            requests, trips, payments = [], [], []
+            for ride_id, ride, (riders, approved, finished) in zip(
+                ids, rides, plans
+            ):
+                approved_ids = {user_id for user_id, _ in approved}
+                for user_id, _ in riders:
+                    if user_id in approved_ids:
+                        status = "Approved"
+                    elif finished or len(approved) == ride["number_of_seats"]:
+                        status = "Rejected"
+                    else:
+                        status = "Pending"
+                    requests.append({
+                        "ride_id": ride_id,
+                        "user_requested_id": user_id,
+                        "status": status,
+                    })
+                for user_id in approved_ids:
+                    trips.append({"ride_id": ride_id, "rider_id": user_id})
+                    if finished:
+                        payments.append({
+                            "ride_id": ride_id,
+                            "rider_id": user_id,
+                            "amount": ride["price_per_km"] * ride["distance"],
+                            "status": rng.choice(("Pending", "Paid")),
+                        })
+            written = len(ids)
+            for model, rows in (
+                (Request, requests), (Trip, trips), (Payment, payments)
+            ):
+                writer = writers[model]
+                written += len(
+                    writer.insert([writer.prepare(row) for row in rows])
+                )
+        yield written
+
+
+def seed(prefix="bench", users=200, rides=2000, requests_per_ride=3,
+         batch_size=2000, seed_value=0, progress=None):
+    '''
+    Function to seed a dataset unless users of prefix already exist.
+    progress is called with a message and the rows written so far
+    after every batch. Returns the (id, username) of the users.
+    '''
+    existing = list(
+        User.objects.filter(username__startswith=f"{prefix}-")
+        .order_by("id").values_list("id", "username")
+    )
+    if existing:
+        return existing
+    rng = random.Random(seed_value)
+    seeded_users, written = [], 0
+    for batch in seed_users(prefix, users, batch_size):
+        seeded_users.extend(batch)
+        # every user comes with a profile
+        written += 2 * len(batch)
+        if progress:
+            progress(f"seeded {len(seeded_users)}/{users} users", written)
+    done = 0
+    for rows in seed_rides(
+        seeded_users, rides, requests_per_ride, batch_size, rng
+    ):
+        done = min(done + batch_size, rides)
+        written += rows
+        if progress:
+            progress(f"seeded {done}/{rides} rides", written)
+    return seeded_users
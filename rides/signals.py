@@ -0,0 +1,42 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .badges import forget_badges
+from .cache import bump_ride_version
+from .models import Ride, Request, Trip, Payment
+
+
+@receiver(post_save, sender=Ride)
+@receiver(post_delete, sender=Ride)
+def invalidate_ride(sender, instance, **kwargs):
+    '''Signal to drop the cached fragments of a changed ride'''
+    bump_ride_version(instance.pk)
+
+
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def invalidate_ride_of(sender, instance, **kwargs):
+    '''Signal to drop the cached fragments of the ride of a request/trip'''
+    bump_ride_version(instance.ride_id)
+
+
+@receiver(post_delete, sender=Request)
+def forget_request_badges(sender, instance, **kwargs):
+    '''
+    Signal to recount the request badges of the requester and the
+    driver when a pending request is deleted, as by the deletion of
+    its ride or user, which never go through adjust_badge
+    '''
+    if instance.status == "Pending":
+        driver_ids = Ride.objects.filter(pk=instance.ride_id).values_list(
+            "driver_id", flat=True
+        )
+        forget_badges([instance.user_requested_id, *driver_ids])
+
+
+@receiver(post_delete, sender=Payment)
+def forget_payment_badges(sender, instance, **kwargs):
+    '''Signal to recount the unpaid badge of a deleted unpaid payment'''
+    if instance.status != "Paid":
+        forget_badges([instance.rider_id])
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger("rides.slow_queries")
+
+# view name of the request being served, set by PerformanceMiddleware
+current_view = ContextVar("current_view", default=None)
+
+# call sites are reported from these apps of the project
+APP_DIRS = tuple(
+    str(Path(settings.BASE_DIR) / app) for app in ("rides", "accounts")
+)
+# the instrumentation itself is never the call site
+SKIPPED_FILES = (__file__, str(Path(__file__).with_name("middleware.py")))
+
+_explaining = threading.local()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    '''
+    Function to reduce a query to its shape: literals and placeholders
+    become ?, IN lists of any length become IN (...)
+    '''
+    sql = _STRING.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    '''Function to return a short stable id of a normalized query'''
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def call_site():
+    '''
+    Function to return the innermost frame of the project apps
+    that led to the query, as "path:line in function"
+    '''
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIRS) and filename not in SKIPPED_FILES:
+            relative = Path(filename).relative_to(settings.BASE_DIR)
+            return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    '''
+    Function to return the plan of a SELECT: EXPLAIN (ANALYZE, BUFFERS)
+    on PostgreSQL, which runs the query again, and EXPLAIN QUERY PLAN
+    on SQLite. Other statements and databases return None.
+    '''
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    if connection.vendor == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+    elif connection.vendor == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+    if connection.needs_rollback:
+        return None
+    _explaining.active = True
+    try:
+        # a failing EXPLAIN only rolls back its own savepoint
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+    except Exception as error:
+        return {"error": str(error)}
+    finally:
+        _explaining.active = False
+    if connection.vendor == "postgresql":
+        return rows[0][0]
+    return [row[-1] for row in rows]
+
+
+class SlowQueryLogger:
+    '''
+    Database execute wrapper logging every query slower than
+    RIDES_SLOW_QUERY_MS as a JSON line, with the view and the call
+    site in the project that ran it. A RIDES_SLOW_QUERY_EXPLAIN_RATE
+    share of the logged SELECTs also get their query plan.
+    '''
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.threshold = settings.RIDES_SLOW_QUERY_MS / 1000
+        self.explain_rate = getattr(
+            settings, "RIDES_SLOW_QUERY_EXPLAIN_RATE", 0
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_explaining, "active", False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        except Exception:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.threshold:
+                self.log(sql, params, elapsed, can_explain=False)
+            raise
+        elapsed = time.perf_counter() - start
+        if elapsed >= self.threshold:
+            self.log(sql, params, elapsed, can_explain=not many)
+        return result
+
+    def log(self, sql, params, elapsed, can_explain):
+        '''method to write the entry of a slow query'''
+        normalized = normalize_sql(sql)
+        entry = {
+            "time": timezone.now().isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "fingerprint": fingerprint(normalized),
+            "sql": normalized,
+            "view": current_view.get(),
+            "call_site": call_site(),
+            "database": self.connection.alias,
+        }
+        if can_explain and random.random() < self.explain_rate:
+            entry["plan"] = explain(self.connection, sql, params)
+        logger.warning(json.dumps(entry, default=str))
+
+
+def install(sender, connection, **kwargs):
+    '''Signal handler adding the slow query logger to new connections'''
+    connection.execute_wrappers.append(SlowQueryLogger(connection))
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+
+from .events import get_broker
+
+# milliseconds a browser waits before reconnecting a closed stream
+RETRY_MS = 3000
+
+
+def stream_settings():
+    '''Function to return the heartbeat and lifetime of a stream'''
+    return (
+        getattr(settings, "RIDES_EVENT_HEARTBEAT", 15),
+        getattr(settings, "RIDES_EVENT_STREAM_TIMEOUT", 300),
+    )
+
+
+def parse_last_event_id(value):
+    '''Function to read the Last-Event-ID sent by a reconnecting stream'''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_event(event):
+    '''Function to format an event for the text/event-stream protocol'''
+    data = json.dumps(event.data, cls=DjangoJSONEncoder)
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n"
+
+
+def event_stream(user_id, last_id=None):
+    '''
+    Generator of the event stream of a user for WSGI servers.
+    Every open stream holds a worker thread, so the stream is closed
+    after RIDES_EVENT_STREAM_TIMEOUT and the browser reconnects.
+    '''
+    broker = get_broker()
+    heartbeat, lifetime = stream_settings()
+    if last_id is None:
+        last_id = broker.cursor(user_id)
+    yield f"retry: {RETRY_MS}\n\n"
+    deadline = time.monotonic() + lifetime
+    while time.monotonic() < deadline:
+        events = broker.listen(user_id, last_id, heartbeat)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            yield format_event(event)
+        last_id = events[-1].id
+
+
+class EventStreamApplication:
+    '''
+    ASGI application serving the event stream straight from the event
+    loop and handing every other request to Django. A waiting stream
+    is a suspended coroutine, so thousands of idle streams are cheap.
+    '''
+
+    def __init__(self, application):
+        self.application = application
+        self.path = None
+
+    async def __call__(self, scope, receive, send):
+        if self.path is None:
+            self.path = reverse("event-stream")
+        if scope["type"] != "http" or scope["path"] != self.path:
+            return await self.application(scope, receive, send)
+
+        from .async_views import run_in_pool
+
+        headers = dict(scope["headers"])
+        user = await run_in_pool(self.get_user, headers)
+        if not user.is_authenticated:
+            await send({
+                "type": "http.response.start",
+                "status": 401,
+                "headers": [(b"content-type", b"text/plain")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        last_id = parse_last_event_id(headers.get(b"last-event-id"))
+        if last_id is None:
+            last_id = parse_last_event_id(self.query_value(
+                scope, "last_event_id"
+            ))
+        await self.stream(user.pk, last_id, receive, send)
+
+    async def stream(self, user_id, last_id, receive, send):
+        '''method to push events until the client goes away'''
+        broker = get_broker()
+        heartbeat, _ = stream_settings()
+        if last_id is None:
+            last_id = broker.cursor(user_id)
+        disconnect = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            await self.write(send, f"retry: {RETRY_MS}\n\n")
+            while True:
+                listen = asyncio.ensure_future(
+                    broker.alisten(user_id, last_id, heartbeat)
+                )
+                await asyncio.wait(
+                    {listen, disconnect},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnect.done():
+                    # wait for the cancelled listen to unsubscribe
+                    listen.cancel()
+                    await asyncio.wait({listen})
+                    return
+                events = listen.result()
+                if not events:
+                    await self.write(send, ": keepalive\n\n")
+                    continue
+                await self.write(
+                    send, "".join(format_event(event) for event in events)
+                )
+                last_id = events[-1].id
+        finally:
+            disconnect.cancel()
+
+    @staticmethod
+    async def write(send, text):
+        await send({
+            "type": "http.response.body",
+            "body": text.encode(),
+            "more_body": True,
+        })
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    @staticmethod
+    def query_value(scope, name):
+        for pair in scope.get("query_string", b"").decode().split("&"):
+            key, _, value = pair.partition("=")
+            if key == name:
+                return value
+        return None
+
+    @staticmethod
+    def get_user(headers):
+        '''method to load the user of the session cookie'''
+        cookies = SimpleCookie(headers.get(b"cookie", b"").decode("latin-1"))
+        morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore(morsel.value if morsel else None)
+        return get_user(SimpleNamespace(session=session))
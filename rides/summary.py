@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+from .models import (
+    ArchivedPayment,
+    ArchivedRide,
+    DailySummary,
+    Payment,
+    Ride,
+    SummaryCounters,
+    UserSummary,
+)
+
+# rides and their payments, hot and archived, counted alike
+SOURCES = ((Ride, Payment), (ArchivedRide, ArchivedPayment))
+
+
+def _aggregate():
+    '''
+    Function to count every user and day from the rides and payments
+    tables with a few GROUP BY queries, the same way Ride.finish,
+    Ride.generate_payments and Payment.pay count them one by one.
+    Returns {(user_id, day): Counter}.
+    '''
+    days = defaultdict(Counter)
+    paid = Sum('amount', filter=Q(status='Paid'))
+    for ride_model, payment_model in SOURCES:
+        payments = payment_model.objects.order_by().annotate(
+            day=TruncDate('ride__end_time')
+        )
+        queries = (
+            ride_model.objects.filter(status='Finished').order_by()
+            .values(user=F('driver_id'), day=TruncDate('end_time'))
+            .annotate(rides_driven=Count('id')),
+            payments.values('day', user=F('rider_id')).annotate(
+                billed=Sum('amount'), paid=paid, trips_taken=Count('id')
+            ),
+            payments.values('day', user=F('ride__driver_id')).annotate(
+                earned=Sum('amount'), received=paid
+            ),
+        )
+        for query in queries:
+            for row in query:
+                counters = days[row.pop('user'), row.pop('day')]
+                counters.update(
+                    {name: value for name, value in row.items() if value}
+                )
+    return days
+
+
+def _totals(days):
+    '''Function to add the day buckets up into totals per user'''
+    totals = defaultdict(Counter)
+    for (user_id, day), counters in days.items():
+        totals[user_id].update(counters)
+    return totals
+
+
+def _stored(model, key):
+    '''Function to read the stored rows of model as {key: Counter}'''
+    rows = model.objects.values_list(
+        *key, *SummaryCounters.COUNTERS
+    ).iterator()
+    return {
+        row[:len(key)]: Counter({
+            name: value
+            for name, value in zip(SummaryCounters.COUNTERS, row[len(key):])
+            if value
+        })
+        for row in rows
+    }
+
+
+def _differences(expected, stored):
+    '''Function to count the keys whose counters do not match'''
+    return sum(
+        1 for key in expected.keys() | stored.keys()
+        if expected.get(key, Counter()) != stored.get(key, Counter())
+    )
+
+
+def rebuild_summaries(batch_size=1000, dry_run=False):
+    '''
+    Function to recount the summaries from scratch and replace them in
+    one transaction, with bulk inserts of batch_size rows. With dry_run
+    nothing is written. Returns (users, days, differences) where
+    differences counts the stored rows that did not match, zero when
+    the incremental updates kept up. Changes committed while it runs
+    may be counted in neither, run it when writes are quiet.
+    '''
+    days = _aggregate()
+    totals = _totals(days)
+    differences = _differences(
+        {(user_id,): counters for user_id, counters in totals.items()},
+        _stored(UserSummary, ('user_id',)),
+    ) + _differences(days, _stored(DailySummary, ('user_id', 'day')))
+    if not dry_run:
+        with transaction.atomic():
+            DailySummary.objects.all().delete()
+            UserSummary.objects.all().delete()
+            UserSummary.objects.bulk_create(
+                (
+                    UserSummary(user_id=user_id, **counters)
+                    for user_id, counters in totals.items()
+                ),
+                batch_size=batch_size,
+            )
+            DailySummary.objects.bulk_create(
+                (
+                    DailySummary(user_id=user_id, day=day, **counters)
+                    for (user_id, day), counters in days.items()
+                ),
+                batch_size=batch_size,
+            )
+    return len(totals), len(days), differences
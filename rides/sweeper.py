@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from .cache import bump_ride_version
+from .models import Ride
+
+
+def sweepable(now=None):
+    '''
+    Function to return the active rides that should leave the feed:
+    finished ones, and ones that ended RIDES_SWEEP_GRACE_SECONDS ago
+    and were never finished. Both conditions are served by partial
+    indexes over active rides, so finding them does not read history.
+    '''
+    now = now or timezone.now()
+    grace = timedelta(seconds=getattr(
+        settings, "RIDES_SWEEP_GRACE_SECONDS", 60 * 60 * 24
+    ))
+    return Ride.objects.filter(is_active=True).filter(
+        Q(status="Finished") | Q(end_time__lt=now - grace)
+    )
+
+
+def sweep_batch(batch_size, now=None):
+    '''
+    Function to deactivate up to batch_size rides in one transaction
+    with an UPDATE ... WHERE id IN (...). Swept rides no longer match,
+    so an interrupted sweep resumes where it stopped.
+    Returns the number of rides deactivated.
+    '''
+    with transaction.atomic():
+        ids = list(
+            sweepable(now).order_by().values_list("id", flat=True)
+            [:batch_size]
+        )
+        if not ids:
+            return 0
+        touched = Ride.objects.filter(pk__in=ids, is_active=True).update(
+            is_active=False
+        )
+        # cached ride objects carry is_active
+        for ride_id in ids:
+            bump_ride_version(ride_id)
+    return touched
+
+
+def sweep_rides(batch_size, limit=None, now=None):
+    '''
+    Function to sweep batch after batch until nothing is left or limit
+    rides were deactivated, yielding the count of every batch
+    '''
+    now = now or timezone.now()
+    total = 0
+    while limit is None or total < limit:
+        size = batch_size if limit is None else min(
+            batch_size, limit - total
+        )
+        touched = sweep_batch(size, now)
+        if not touched:
+            return
+        total += touched
+        yield touched
+
+
+def schedule_sweep(delay=None):
+    '''
+    Function to queue the sweep job delay seconds from now, by default
+    RIDES_SWEEP_INTERVAL. Runs queued for the same interval share one
+    key, so starting the schedule twice does not double it.
+    '''
+    interval = getattr(settings, "RIDES_SWEEP_INTERVAL", 15 * 60)
+    run_at = timezone.now() + timedelta(
+        seconds=interval if delay is None else delay
+    )
+    slot = int(run_at.timestamp() // interval)
+    return enqueue(
+        "rides.sweep_rides", key=f"rides-sweep:{slot}", run_at=run_at
+    )
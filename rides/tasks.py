@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import transaction
+
+from jobs.queue import enqueue, job
+from .models import Ride
+from .sweeper import schedule_sweep, sweep_batch
+
+
+@job("rides.generate_payments")
+def generate_payments(ride_id):
+    '''Job to bill the riders of a finished ride'''
+    ride = Ride.objects.filter(pk=ride_id, status='Finished').first()
+    if ride is not None:
+        ride.generate_payments()
+
+
+@job("rides.reject_pending_requests")
+def reject_pending_requests(ride_id):
+    '''Job to reject the pending requests of a full ride'''
+    with transaction.atomic():
+        # approvals lock the ride too, none can slip in meanwhile
+        ride = Ride.objects.select_for_update().only(
+            "seats_booked", "number_of_seats", "driver_id"
+        ).filter(pk=ride_id).first()
+        if ride is not None and ride.seats_booked >= ride.number_of_seats:
+            ride.reject_pending_requests()
+
+
+@job("rides.sweep_rides")
+def sweep_rides():
+    '''
+    Job deactivating one batch of expired rides. A full batch queues
+    the next one right away, then the sweep runs again every
+    RIDES_SWEEP_INTERVAL seconds.
+    '''
+    batch_size = settings.RIDES_SWEEP_BATCH_SIZE
+    # jobs run in a transaction, one batch per job keeps it short
+    if sweep_batch(batch_size) == batch_size:
+        enqueue("rides.sweep_rides")
+    else:
+        schedule_sweep()
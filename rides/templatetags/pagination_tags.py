@@ -0,0 +1,26 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag("rides/pagination.html", takes_context=True)
+def pagination(context):
+    '''
+    Template tag to render the pagination buttons of a list view.
+    Only the page numbers around the current page are computed.
+    '''
+    page_obj = context.get("page_obj")
+    # keep the other query parameters (like search filters) in the links
+    params = context["request"].GET.copy()
+    params.pop("page", None)
+    params.pop("cursor", None)
+    tag_context = {
+        "page_obj": page_obj,
+        "query": f"{params.urlencode()}&" if params else "",
+        "is_paginated": context.get("is_paginated"),
+        "cursor_pagination": context.get("cursor_pagination"),
+    }
+    if tag_context["is_paginated"] and not tag_context["cursor_pagination"]:
+        paginator = page_obj.paginator
+        tag_context["page_window"] = paginator.page_window(page_obj.number)
+    return tag_context
@@ -0,0 +1,44 @@
+from django import template
+
+from rides.cache import cached_fragment
+
+register = template.Library()
+
+
+class RideCacheNode(template.Node):
+    '''Node rendering its content once per ride version'''
+
+    def __init__(self, nodelist, ride, name):
+        self.nodelist = nodelist
+        self.ride = ride
+        self.name = name
+
+    def render(self, context):
+        ride = self.ride.resolve(context)
+        name = self.name.resolve(context)
+        return cached_fragment(
+            ride, name, lambda: self.nodelist.render(context)
+        )
+
+
+@register.tag
+def ridecache(parser, token):
+    '''
+    Template tag caching a fragment of a ride until the ride changes:
+
+        {% ridecache ride "card" %} ... {% endridecache %}
+
+    Only put markup that is the same for every user inside.
+    '''
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag takes a ride and a fragment name"
+        )
+    nodelist = parser.parse(("endridecache",))
+    parser.delete_first_token()
+    return RideCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+    )
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rides.models import Ride
+from rides.pagination import CursorPaginator
+from rides.search import keyword_search
+
+
+class RideSearchApiTests(TestCase):
+    '''Tests the keyword search of the JSON API'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rider")
+        start = timezone.now() + timedelta(days=1)
+        cls.ride = Ride.objects.create(
+            driver=User.objects.create_user("driver"),
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            description="Coffee on the way",
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            price_per_km=10,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def search(self, text):
+        '''method to search the API for text'''
+        return self.client.get(reverse("api-rides-search"), {"q": text})
+
+    def test_search_ranks_matches(self):
+        response = self.search("coffee")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([ride["id"] for ride in results], [self.ride.pk])
+        self.assertIn("rank", results[0])
+
+    def test_query_without_words_is_rejected(self):
+        for text in ('"', "!!!", "- * ?"):
+            with self.subTest(q=text):
+                response = self.search(text)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json(), {"error": "q must contain a word"}
+                )
+
+    def test_missing_query_is_rejected(self):
+        response = self.search("")
+        self.assertEqual(response.status_code, 400)
+
+    def test_keyword_search_without_words_pages_by_rank(self):
+        paginator = CursorPaginator(keyword_search('"'), 20, ("-rank", "id"))
+        self.assertEqual(list(paginator.page()), [])
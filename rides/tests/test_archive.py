@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rides.archive import archive_batch, archive_rides, payment_history
+from rides.models import (
+    ArchivedPayment,
+    ArchivedRequest,
+    ArchivedRide,
+    ArchivedTrip,
+    Payment,
+    Request,
+    Ride,
+    Trip,
+)
+
+
+@override_settings(RIDES_ARCHIVE_AFTER_DAYS=30)
+class ArchiveTests(TestCase):
+    '''
+    Tests old rides move to the archive tables with their requests,
+    trips and payments, and the payment history reads both in order
+    '''
+
+    def setUp(self):
+        self.driver = User.objects.create_user("driver")
+        self.riders = [
+            User.objects.create_user(f"rider{number}") for number in range(2)
+        ]
+        self.now = timezone.now()
+        self.old = [self.new_ride(days=-60 + number) for number in range(3)]
+        self.unpaid = self.new_ride(days=-60, status="pending")
+        self.recent = self.new_ride(days=-1)
+
+    def new_ride(self, days, status="Paid"):
+        '''method to create an inactive ride with riders who paid'''
+        end = self.now + timedelta(days=days)
+        ride = Ride.objects.create(
+            driver=self.driver,
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            start_time=end - timedelta(hours=1),
+            end_time=end,
+            price_per_km=10,
+            status="Finished",
+            is_active=False,
+        )
+        for rider in self.riders:
+            Request.objects.create(
+                ride=ride, user_requested=rider, status="Approved"
+            )
+            Trip.objects.create(ride=ride, rider=rider)
+            payment = Payment.objects.create(
+                ride=ride, rider=rider, status=status
+            )
+            # payments of one ride share their time, ties go by id
+            Payment.objects.filter(pk=payment.pk).update(generated_time=end)
+        return ride
+
+    def test_batch_moves_rides_with_their_rows(self):
+        self.assertEqual(archive_batch(2, self.now), 2)
+        archived = [ride.pk for ride in self.old[:2]]
+        self.assertEqual(
+            sorted(ArchivedRide.objects.values_list("pk", flat=True)),
+            archived,
+        )
+        for model in (ArchivedRequest, ArchivedTrip, ArchivedPayment):
+            self.assertEqual(
+                model.objects.filter(ride_id__in=archived).count(), 4
+            )
+        for model in (Ride, Request, Trip, Payment):
+            key = "pk__in" if model is Ride else "ride_id__in"
+            self.assertFalse(model.objects.filter(**{key: archived}).exists())
+        copied = ArchivedRide.objects.get(pk=archived[0])
+        self.assertEqual(copied.end_time, self.old[0].end_time)
+
+    def test_unpaid_and_recent_rides_stay(self):
+        self.assertEqual(list(archive_rides(2, now=self.now)), [2, 1])
+        self.assertEqual(
+            set(Ride.objects.values_list("pk", flat=True)),
+            {self.unpaid.pk, self.recent.pk},
+        )
+        self.assertEqual(archive_batch(2, self.now), 0)
+
+    def test_history_slices_in_order_across_both_tables(self):
+        list(archive_rides(2, limit=2, now=self.now))
+        history = payment_history().order_by("-generated_time", "-id")
+        expected = sorted(
+            [*Payment.objects.all(), *ArchivedPayment.objects.all()],
+            key=lambda payment: (payment.generated_time, payment.id),
+            reverse=True,
+        )
+        expected = [(type(row), row.pk) for row in expected]
+        self.assertEqual(history.count(), 10)
+        self.assertEqual([(type(row), row.pk) for row in history], expected)
+        for start, stop in ((0, 3), (3, 7), (5, 10), (8, 20)):
+            with self.subTest(start=start, stop=stop):
+                rows = history[start:stop]
+                self.assertEqual(
+                    [(type(row), row.pk) for row in rows],
+                    expected[start:stop],
+                )
+        self.assertEqual(
+            (type(history[9]), history[9].pk), expected[9]
+        )
+        with self.assertRaises(IndexError):
+            history[10]
+
+    def test_history_filters_both_tables(self):
+        list(archive_rides(2, limit=2, now=self.now))
+        rider = self.riders[0]
+        history = (
+            payment_history().filter(rider=rider)
+            .select_related("ride__driver")
+            .order_by("-generated_time", "-id")
+        )
+        rows = history[0:10]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row.rider_id for row in rows}, {rider.pk})
+        # the unpaid ride ended with the first archived one, the tie
+        # goes to the later id
+        self.assertEqual(
+            [row.ride_id for row in rows],
+            [self.recent.pk, self.old[2].pk, self.old[1].pk,
+             self.unpaid.pk, self.old[0].pk],
+        )
+        self.assertEqual(
+            [type(row) for row in rows],
+            [Payment, Payment, ArchivedPayment, Payment, ArchivedPayment],
+        )
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404
+from django.test import RequestFactory, TransactionTestCase
+from django.utils import timezone
+
+from rides import async_views
+from rides.models import Ride
+from rides.views import RideListView
+
+
+class AsyncListViewTests(TransactionTestCase):
+    '''
+    Tests the async ride feed pages like the sync one and reuses
+    the connections of its ORM pool
+    '''
+    threads = 2
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        patcher = mock.patch.object(async_views, "_executor", self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.close_pool)
+
+        self.user = User.objects.create_user("rider")
+        start = timezone.now() + timedelta(days=1)
+        for number in range(12):
+            Ride.objects.create(
+                driver=self.user,
+                source_location=f"Stop {number}",
+                destination_location="Whitefield",
+                start_time=start,
+                end_time=start + timedelta(hours=1),
+                price_per_km=10,
+            )
+
+    def close_pool(self):
+        '''method to close the connection of every pool thread'''
+        barrier = threading.Barrier(self.threads)
+
+        def close():
+            barrier.wait()
+            connections.close_all()
+        for future in [
+            self.executor.submit(close) for _ in range(self.threads)
+        ]:
+            future.result()
+        self.executor.shutdown()
+
+    def get(self, view, page):
+        '''method to render page of the feed with view'''
+        request = RequestFactory().get("/", {"page": page})
+        request.user = self.user
+        response = view(request)
+        if asyncio.iscoroutine(response):
+            response = asyncio.run(response)
+        else:
+            response.render()
+        return response
+
+    def test_pages_match_sync_view(self):
+        for page in ("1", "2", "last", "3"):
+            with self.subTest(page=page):
+                expected = self.get(RideListView.as_view(), page)
+                response = self.get(async_views.ride_list, page)
+                self.assertEqual(response.content, expected.content)
+
+    def test_invalid_pages_are_not_found(self):
+        for page in ("first", "9"):
+            with self.subTest(page=page):
+                with self.assertRaises(Http404):
+                    self.get(RideListView.as_view(), page)
+                with self.assertRaises(Http404):
+                    self.get(async_views.ride_list, page)
+
+    def test_pool_connections_are_reused(self):
+        # in memory SQLite never closes connections, other databases
+        # would open one per query if the pool closed them
+        created = []
+
+        def count(sender, connection, **kwargs):
+            created.append(connection.alias)
+        connection_created.connect(count)
+        self.addCleanup(connection_created.disconnect, count)
+        for _ in range(5):
+            self.get(async_views.ride_list, "1")
+        self.assertLessEqual(len(created), self.threads)
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rides.badges import (
+    BADGES,
+    INCOMING_REQUESTS,
+    OUTGOING_REQUESTS,
+    UNPAID_PAYMENTS,
+    _count,
+    _key,
+    adjust_badge,
+    badge_counts,
+)
+from rides.models import Payment, Request, Ride
+
+
+@override_settings(RIDES_DEFER_SIDE_EFFECTS=False)
+class BadgeTests(TransactionTestCase):
+    '''
+    Tests the cached badge counters moved by requests, approvals and
+    payments stay equal to a count from the database
+    '''
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.driver = User.objects.create_user("driver")
+        self.riders = [
+            User.objects.create_user(f"rider{number}") for number in range(3)
+        ]
+        start = timezone.now() - timedelta(hours=2)
+        self.ride = Ride.objects.create(
+            driver=self.driver,
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            price_per_km=10,
+            distance=4,
+            number_of_seats=1,
+        )
+        self.users = [self.driver, *self.riders]
+        # adjustments only move counters already in the cache
+        for user in self.users:
+            badge_counts(user.id)
+
+    def assertCountersMatch(self):
+        '''
+        method to compare the cached counters with a recount, counters
+        missing from the cache are counted on their next read
+        '''
+        for user in self.users:
+            for name in BADGES:
+                cached = cache.get(_key(user.id, name))
+                if cached is not None:
+                    self.assertEqual(
+                        cached, _count(user.id, name), (user.username, name)
+                    )
+
+    def test_counters_follow_a_ride(self):
+        for rider in self.riders:
+            self.client.force_login(rider)
+            self.client.post(reverse("create-request", args=[self.ride.pk]))
+        self.assertEqual(badge_counts(self.driver.id)[INCOMING_REQUESTS], 3)
+        self.assertEqual(badge_counts(self.riders[0].id)[OUTGOING_REQUESTS], 1)
+        self.assertCountersMatch()
+
+        # the only seat is taken, the other requests are rejected
+        Request.objects.filter(user_requested=self.riders[0]).get().approve()
+        self.assertEqual(badge_counts(self.driver.id)[INCOMING_REQUESTS], 0)
+        self.assertCountersMatch()
+
+        self.ride.finish()
+        self.assertEqual(badge_counts(self.riders[0].id)[UNPAID_PAYMENTS], 1)
+        self.assertCountersMatch()
+        Payment.objects.get().pay()
+        self.assertEqual(badge_counts(self.riders[0].id)[UNPAID_PAYMENTS], 0)
+        self.assertCountersMatch()
+
+    def test_rolled_back_adjustment_is_dropped(self):
+        with transaction.atomic():
+            adjust_badge(self.driver.id, INCOMING_REQUESTS, 1)
+            transaction.set_rollback(True)
+        self.assertEqual(badge_counts(self.driver.id)[INCOMING_REQUESTS], 0)
+
+    def test_deleted_ride_forgets_its_pending_requests(self):
+        Request.objects.create(ride=self.ride, user_requested=self.riders[0])
+        adjust_badge(self.driver.id, INCOMING_REQUESTS, 1)
+        adjust_badge(self.riders[0].id, OUTGOING_REQUESTS, 1)
+        self.assertEqual(badge_counts(self.driver.id)[INCOMING_REQUESTS], 1)
+        self.ride.delete()
+        self.assertIsNone(cache.get(_key(self.driver.id, INCOMING_REQUESTS)))
+        self.assertEqual(badge_counts(self.driver.id)[INCOMING_REQUESTS], 0)
+        self.assertCountersMatch()
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rides.cache import (
+    bump_ride_version,
+    cache_stats,
+    cached_fragment,
+    cached_object,
+    ride_version,
+)
+from rides.models import Ride, Trip
+
+
+class FragmentCacheTests(TransactionTestCase):
+    '''Tests ride fragments are cached per ride version'''
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user("rider")
+        start = timezone.now() + timedelta(days=1)
+        self.ride = Ride.objects.create(
+            driver=User.objects.create_user("driver"),
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            price_per_km=10,
+        )
+        self.renders = []
+
+    def render(self):
+        self.renders.append(1)
+        return f"<p>{len(self.renders)}</p>"
+
+    def test_fragment_is_rendered_once_per_version(self):
+        before = cache_stats()
+        self.assertEqual(
+            cached_fragment(self.ride, "card", self.render), "<p>1</p>"
+        )
+        self.assertEqual(
+            cached_fragment(self.ride, "card", self.render), "<p>1</p>"
+        )
+        stats = cache_stats()
+        self.assertEqual(stats["misses"] - before["misses"], 1)
+        self.assertEqual(stats["hits"] - before["hits"], 1)
+
+        bump_ride_version(self.ride.pk)
+        self.assertEqual(
+            cached_fragment(self.ride, "card", self.render), "<p>2</p>"
+        )
+
+    def test_version_is_bumped_after_commit_only(self):
+        version = ride_version(self.ride.pk)
+        with transaction.atomic():
+            bump_ride_version(self.ride.pk)
+            self.assertEqual(ride_version(self.ride.pk), version)
+            transaction.set_rollback(True)
+        self.assertEqual(ride_version(self.ride.pk), version)
+        with transaction.atomic():
+            bump_ride_version(self.ride.pk)
+        self.assertNotEqual(ride_version(self.ride.pk), version)
+
+    def test_lost_version_is_never_reused(self):
+        version = ride_version(self.ride.pk)
+        cache.clear()
+        self.assertNotEqual(ride_version(self.ride.pk), version)
+
+    def test_saves_of_ride_and_trips_bump_the_version(self):
+        version = ride_version(self.ride.pk)
+        self.ride.save()
+        self.assertNotEqual(ride_version(self.ride.pk), version)
+        version = ride_version(self.ride.pk)
+        Trip.objects.create(ride=self.ride, rider=self.user)
+        self.assertNotEqual(ride_version(self.ride.pk), version)
+
+    def test_pages_show_changed_rides(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse("home")), "Koramangala")
+        self.ride.source_location = "Indiranagar"
+        self.ride.save()
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Indiranagar")
+        self.assertNotContains(response, "Koramangala")
+
+        url = reverse("ride-detail", args=[self.ride.pk])
+        ride = self.client.get(url).context["object"]
+        self.assertEqual(list(ride.trips.all()), [])
+        Trip.objects.create(ride=self.ride, rider=self.user)
+        ride = self.client.get(url).context["object"]
+        self.assertEqual(
+            [trip.rider for trip in ride.trips.all()], [self.user]
+        )
+
+    def test_cached_object_is_fetched_once_per_version(self):
+        fetched = []
+
+        def fetch():
+            fetched.append(1)
+            return Ride.objects.get(pk=self.ride.pk)
+        first = cached_object(self.ride.pk, "object", fetch)
+        cached_object(self.ride.pk, "object", fetch)
+        self.assertEqual(len(fetched), 1)
+        self.assertEqual(first.cache_version, ride_version(self.ride.pk))
+        self.ride.save()
+        cached_object(self.ride.pk, "object", fetch)
+        self.assertEqual(len(fetched), 2)
@@ -0,0 +1,154 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rides import events
+from rides.events import DatabaseBroker, LocalBroker, publish_event
+from rides.models import StreamEvent
+
+
+class Clock:
+    '''Stand-in for time.monotonic moved forward by the tests'''
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LocalBrokerTests(TestCase):
+    '''Tests the in memory broker of the live event streams'''
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("rides.events.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker = LocalBroker()
+
+    def test_events_after_replays_from_last_event_id(self):
+        for number in range(3):
+            self.broker.publish(1, events.RIDE_SEATS, {"seats": number})
+        first, second, third = self.broker.events_after(1, 0)
+        self.assertEqual(
+            self.broker.events_after(1, first.id), [second, third]
+        )
+        self.assertEqual(self.broker.events_after(1, third.id), [])
+        self.assertEqual(self.broker.cursor(1), third.id)
+        self.assertEqual(self.broker.events_after(2, 0), [])
+
+    def test_listen_returns_pending_events_at_once(self):
+        self.broker.publish(1, events.PAYMENT_NEW, {"amount": 10})
+        received = self.broker.listen(1, 0, timeout=5)
+        self.assertEqual([event.data for event in received], [{"amount": 10}])
+
+    def test_history_of_idle_users_is_pruned(self):
+        self.broker.publish(1, events.REQUEST_NEW, {})
+        self.broker.publish(2, events.REQUEST_NEW, {})
+        self.broker._subscribe(2, 0, lambda: None)
+
+        self.clock.now += self.broker.reconnect_window + 1
+        self.broker.publish(3, events.REQUEST_NEW, {})
+        # user 1 is gone, user 2 still has a stream open
+        self.assertEqual(self.broker.cursor(1), 0)
+        self.assertNotEqual(self.broker.cursor(2), 0)
+        self.assertNotEqual(self.broker.cursor(3), 0)
+
+    def test_history_is_kept_for_reconnects_within_window(self):
+        self.broker.publish(1, events.REQUEST_NEW, {})
+        self.clock.now += self.broker.reconnect_window / 2
+        self.broker.listen(1, self.broker.cursor(1), timeout=0)
+        self.assertNotEqual(self.broker.cursor(1), 0)
+
+        self.clock.now += self.broker.reconnect_window
+        self.broker.listen(1, self.broker.cursor(1), timeout=0)
+        self.assertEqual(self.broker.cursor(1), 0)
+
+
+class PublishEventTests(TransactionTestCase):
+    '''Tests events are published once their transaction commits'''
+
+    def setUp(self):
+        self.broker = LocalBroker()
+        patcher = mock.patch.object(events, "_broker", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_published_after_commit(self):
+        with transaction.atomic():
+            publish_event([1, 2], events.RIDE_SEATS, {"ride": 1})
+            self.assertEqual(self.broker.cursor(1), 0)
+        self.assertEqual(len(self.broker.events_after(1, 0)), 1)
+        self.assertEqual(len(self.broker.events_after(2, 0)), 1)
+
+    def test_not_published_on_rollback(self):
+        with transaction.atomic():
+            publish_event(1, events.RIDE_SEATS, {"ride": 1})
+            transaction.set_rollback(True)
+        self.assertEqual(self.broker.events_after(1, 0), [])
+
+    @override_settings(RIDES_EVENT_STREAMS=True)
+    def test_stream_replays_after_last_event_id(self):
+        user = User.objects.create_user("rider")
+        for number in range(3):
+            publish_event(user.id, events.RIDE_SEATS, {"seats": number})
+        first = self.broker.events_after(user.id, 0)[0]
+        self.client.force_login(user)
+        response = self.client.get(
+            reverse("event-stream"), HTTP_LAST_EVENT_ID=str(first.id)
+        )
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b"retry:"))
+        replayed = [next(chunks), next(chunks)]
+        response.close()
+        self.assertIn(b'"seats":1', replayed[0].replace(b" ", b""))
+        self.assertIn(b'"seats":2', replayed[1].replace(b" ", b""))
+
+    def test_wsgi_stream_is_opt_in(self):
+        self.client.force_login(User.objects.create_user("rider"))
+        response = self.client.get(reverse("event-stream"))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("home"))
+        self.assertNotContains(response, "EventSource")
+
+
+class DatabaseBrokerTests(TestCase):
+    '''Tests the broker sharing events between processes'''
+
+    def setUp(self):
+        self.user = User.objects.create_user("rider")
+        patcher = mock.patch.object(DatabaseBroker, "_start_poller")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker = DatabaseBroker()
+
+    def test_poll_delivers_events_of_streaming_users_once(self):
+        other = User.objects.create_user("other")
+        self.broker._subscribe(self.user.id, 0, lambda: None)
+        self.broker.publish(self.user.id, events.PAYMENT_NEW, {"amount": 5})
+        self.broker.publish(other.id, events.PAYMENT_NEW, {"amount": 6})
+        self.assertEqual(StreamEvent.objects.count(), 2)
+
+        self.broker.poll()
+        self.broker.poll()
+        delivered = self.broker.events_after(self.user.id, 0)
+        self.assertEqual([event.data for event in delivered], [{"amount": 5}])
+        self.assertEqual(self.broker.events_after(other.id, 0), [])
+
+    def test_poll_prunes_events_past_retention(self):
+        self.broker.publish(self.user.id, events.PAYMENT_NEW, {})
+        self.broker.publish(self.user.id, events.PAYMENT_NEW, {})
+        old = StreamEvent.objects.order_by("id").first()
+        expired = timezone.now() - self.broker.retention
+        StreamEvent.objects.filter(pk=old.pk).update(
+            created=expired - timedelta(minutes=1)
+        )
+        self.broker.poll()
+        self.assertFalse(StreamEvent.objects.filter(pk=old.pk).exists())
+        self.assertEqual(StreamEvent.objects.count(), 1)
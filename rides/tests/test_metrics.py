@@ -0,0 +1,79 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rides.metrics import (
+    REQUESTS,
+    SQL_QUERIES,
+    TEMPLATE_DURATION,
+    Counter,
+    Histogram,
+)
+
+
+class MetricFormatTests(SimpleTestCase):
+    '''Tests the Prometheus text format of the metrics'''
+
+    def test_counter_samples(self):
+        counter = Counter("hits_total", "Hits", ("view", "status"))
+        counter.inc("home", "200")
+        counter.inc("home", "200", amount=2)
+        counter.inc('say "hi"\\', "500")
+        self.assertEqual(list(counter.samples()), [
+            'hits_total{view="home",status="200"} 3',
+            'hits_total{view="say \\"hi\\"\\\\",status="500"} 1',
+        ])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("took", "Took", ("view",), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, "home")
+        self.assertEqual(list(histogram.samples()), [
+            'took_bucket{view="home",le="0.1"} 2',
+            'took_bucket{view="home",le="1"} 3',
+            'took_bucket{view="home",le="+Inf"} 4',
+            'took_sum{view="home"} 3.65',
+            'took_count{view="home"} 4',
+        ])
+
+
+@override_settings(RIDES_METRICS_SAMPLE_RATE=1, RIDES_METRICS_TOKEN="secret")
+class MetricsMiddlewareTests(TestCase):
+    '''Tests requests are recorded and exported by the metrics url'''
+
+    def setUp(self):
+        self.user = User.objects.create_user("rider")
+
+    def recorded(self, metric, *label_values):
+        '''method to return the value of a metric for label values'''
+        with metric._lock:
+            value = metric._values.get(label_values)
+        if isinstance(value, list):
+            return value[2]
+        return value or 0
+
+    def test_requests_are_recorded_per_view(self):
+        served = self.recorded(REQUESTS, "home", "200")
+        sampled = self.recorded(SQL_QUERIES, "home")
+        rendered = self.recorded(TEMPLATE_DURATION, "home")
+        self.client.force_login(self.user)
+        self.client.get(reverse("home"))
+        self.assertEqual(self.recorded(REQUESTS, "home", "200"), served + 1)
+        self.assertEqual(self.recorded(SQL_QUERIES, "home"), sampled + 1)
+        self.assertEqual(
+            self.recorded(TEMPLATE_DURATION, "home"), rendered + 1
+        )
+
+    def test_export_needs_staff_or_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "# TYPE rides_requests_total counter")
+
+        self.client.force_login(
+            User.objects.create_user("staff", is_staff=True)
+        )
+        self.assertEqual(self.client.get(url).status_code, 200)
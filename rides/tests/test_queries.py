@@ -0,0 +1,156 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rides import views
+from rides.models import Payment, Request, Ride, Trip
+
+LIST_VIEWS = (
+    views.RideListView,
+    views.RideSearchView,
+    views.UserRideListView,
+    views.UserRequestsListView,
+    views.UserRequestedListView,
+    views.UserPaymentListView,
+    views.UserPaymentRecievedListView,
+)
+
+
+class QueryBudgetTests(TestCase):
+    '''
+    Tests every url of rides.urls runs the same number of queries
+    whether a page shows two rows or four, each row being a ride with
+    as many riders, requests and payments. The event stream is left
+    out, closing its response would close the test transaction.
+    '''
+    sizes = (2, 4)
+
+    def new_ride(self, driver, **fields):
+        '''method to create an upcoming ride with coordinates'''
+        start = timezone.now() + timedelta(days=1)
+        return Ride.objects.create(
+            driver=driver,
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            source_latitude=12.93,
+            source_longitude=77.62,
+            destination_latitude=12.97,
+            destination_longitude=77.75,
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            price_per_km=10,
+            number_of_seats=10,
+            **fields
+        )
+
+    def populate(self, size):
+        '''
+        method to give the user size rides with size riders, paid bills
+        and pending requests each, size requests and unpaid bills on
+        the rides of other drivers and one ride left to request.
+        Returns the user and the objects the post urls act on.
+        '''
+        user = User.objects.create_user("user", is_staff=True)
+        riders = [
+            User.objects.create_user(f"rider{number}")
+            for number in range(size)
+        ]
+        other = User.objects.create_user("other")
+        for _ in range(size):
+            ride = self.new_ride(user, seats_booked=size)
+            for rider in riders:
+                Trip.objects.create(ride=ride, rider=rider)
+                Request.objects.create(
+                    ride=ride, user_requested=rider, status="Approved"
+                )
+                Payment.objects.create(ride=ride, rider=rider, amount=10)
+            Request.objects.create(ride=ride, user_requested=other)
+            ride = self.new_ride(other)
+            Request.objects.create(ride=ride, user_requested=user)
+            Payment.objects.create(ride=ride, rider=user, amount=10)
+        pending = Request.objects.filter(
+            ride__driver=user, status="Pending"
+        )
+        return user, {
+            "ride": self.new_ride(other),
+            "driven": Ride.objects.filter(driver=user).first(),
+            "approve": pending[0],
+            "reject": pending[1],
+            "payment": Payment.objects.filter(rider=user).first(),
+        }
+
+    def urls(self, user, objects, size):
+        '''method to return (name, method, url, data) of every url'''
+        ride = objects["driven"].pk
+        return (
+            ("home", "get", reverse("home"), {}),
+            ("ride-search", "get", reverse("ride-search"), {}),
+            ("ride-match", "get", reverse("ride-match"), {
+                "pickup_latitude": 12.93, "pickup_longitude": 77.62, "k": size
+            }),
+            ("user-rides", "get", reverse("user-rides", args=[user]), {}),
+            ("ride-detail", "get", reverse("ride-detail", args=[ride]), {}),
+            ("ride-create", "get", reverse("ride-create"), {}),
+            ("ride-update", "get", reverse("ride-update", args=[ride]), {}),
+            ("ride-delete", "get", reverse("ride-delete", args=[ride]), {}),
+            ("user-requests", "get", reverse("user-requests"), {}),
+            ("user-requested", "get", reverse("user-requested"), {}),
+            ("user-payments", "get", reverse("user-payments"), {}),
+            ("user-payment-recieved", "get",
+             reverse("user-payment-recieved"), {}),
+            ("cache-stats", "get", reverse("cache-stats"), {}),
+            ("metrics", "get", reverse("metrics"), {}),
+            ("approve-request", "post",
+             reverse("approve-request", args=[objects["approve"].pk]), {}),
+            ("reject-request", "post",
+             reverse("reject-request", args=[objects["reject"].pk]), {}),
+            ("create-request", "post",
+             reverse("create-request", args=[objects["ride"].pk]), {}),
+            ("ride-finish", "post", reverse("ride-finish", args=[ride]), {}),
+            ("payment-pay", "post",
+             reverse("payment-pay", args=[objects["payment"].pk]), {}),
+        )
+
+    def count_queries(self, size):
+        '''
+        method to return the queries of every url with size rows,
+        the data is rolled back afterwards
+        '''
+        counts = {}
+        with transaction.atomic():
+            user, objects = self.populate(size)
+            self.client.force_login(user)
+            for name, method, url, data in self.urls(user, objects, size):
+                # every url is measured with cold caches
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(self.client, method)(url, data)
+                self.assertLess(response.status_code, 400, name)
+                counts[name] = len(queries)
+            transaction.set_rollback(True)
+        return counts
+
+    def test_queries_do_not_grow_with_page_size(self):
+        counts = []
+        for size in self.sizes:
+            patches = [
+                mock.patch.object(view, "paginate_by", size)
+                for view in LIST_VIEWS
+            ]
+            for patch in patches:
+                patch.start()
+            try:
+                counts.append(self.count_queries(size))
+            finally:
+                for patch in patches:
+                    patch.stop()
+        for name in counts[0]:
+            with self.subTest(url=name):
+                self.assertEqual(counts[0][name], counts[1][name])
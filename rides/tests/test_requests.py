@@ -0,0 +1,90 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+
+from rides.models import Request, Ride, Trip
+
+
+@override_settings(RIDES_DEFER_SIDE_EFFECTS=False)
+class ConcurrentApprovalTests(TransactionTestCase):
+    '''Tests approving the requests of one ride from several threads'''
+    seats = 3
+    requests = 8
+
+    def setUp(self):
+        driver = User.objects.create_user("driver")
+        self.ride = Ride.objects.create(
+            driver=driver,
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            start_time="2030-01-01T10:00:00Z",
+            end_time="2030-01-01T11:00:00Z",
+            price_per_km=10,
+            number_of_seats=self.seats,
+        )
+        self.pending = [
+            Request.objects.create(
+                ride=self.ride,
+                user_requested=User.objects.create_user(f"rider{number}"),
+            )
+            for number in range(self.requests)
+        ]
+
+    def approve(self, request, barrier, errors):
+        '''method to approve request once every thread is ready'''
+        try:
+            barrier.wait()
+            # SQLite reports conflicting transactions instead of
+            # waiting for them, those approvals are tried again
+            for _ in range(100):
+                try:
+                    request.approve()
+                    return
+                except OperationalError:
+                    time.sleep(random.random() / 100)
+            errors.append(f"request {request.pk} never ran")
+        except Exception as error:
+            errors.append(repr(error))
+        finally:
+            connection.close()
+
+    def test_concurrent_approvals_do_not_overbook(self):
+        barrier = threading.Barrier(self.requests)
+        errors = []
+        threads = [
+            threading.Thread(
+                target=self.approve, args=(request, barrier, errors)
+            )
+            for request in self.pending
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.ride.refresh_from_db()
+        self.assertLessEqual(self.ride.seats_booked, self.ride.number_of_seats)
+        self.assertEqual(self.ride.seats_booked, self.seats)
+        self.assertEqual(
+            Trip.objects.filter(ride=self.ride).count(),
+            self.ride.seats_booked,
+        )
+        statuses = Request.objects.filter(ride=self.ride)
+        self.assertEqual(
+            statuses.filter(status="Approved").count(),
+            self.ride.seats_booked,
+        )
+        self.assertFalse(statuses.filter(status="Pending").exists())
+
+    def test_stale_reject_keeps_approval(self):
+        request = self.pending[0]
+        stale = Request.objects.get(pk=request.pk)
+        self.assertTrue(request.approve())
+        self.assertFalse(stale.reject())
+        request.refresh_from_db()
+        self.assertEqual(request.status, "Approved")
@@ -0,0 +1,144 @@
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rides.middleware import ReplicaMiddleware
+from rides.models import Ride
+from rides.routers import ReplicaRouter, replica, wrote
+
+REPLICAS = ("replica1", "replica2")
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRoutingTests(TransactionTestCase):
+    '''
+    Tests the reads of rides.routers.ReplicaRouter and
+    rides.middleware.ReplicaMiddleware against replica aliases of
+    the test database, replicas which never lag
+    '''
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # aliases added once the test database exists point at it
+        for alias in REPLICAS:
+            connections.databases[alias] = dict(
+                connections[DEFAULT_DB_ALIAS].settings_dict
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in REPLICAS:
+            connections[alias].close()
+            delattr(connections._connections, alias)
+            del connections.databases[alias]
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user("rider")
+        start = timezone.now() + timedelta(days=1)
+        self.ride = Ride.objects.create(
+            driver=User.objects.create_user("driver"),
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            price_per_km=10,
+        )
+        self.client.force_login(self.user)
+
+    @contextmanager
+    def queries(self):
+        '''method to count the queries run on every alias'''
+        counts = Counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                def count(execute, sql, params, many, context, alias=alias):
+                    counts[alias] += 1
+                    return execute(sql, params, many, context)
+                stack.enter_context(
+                    connections[alias].execute_wrapper(count)
+                )
+            yield counts
+
+    def test_get_reads_from_one_replica(self):
+        with self.queries() as counts:
+            response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(counts[DEFAULT_DB_ALIAS], 0)
+        self.assertEqual(len(counts), 1)
+        self.assertIn(next(iter(counts)), REPLICAS)
+        self.assertNotIn(ReplicaMiddleware.cookie, response.cookies)
+
+    @override_settings(RIDES_PRIMARY_STICKY_SECONDS=30)
+    def test_write_pins_client_for_sticky_seconds(self):
+        # the writes of setUp marked this thread
+        token = wrote.set(False)
+        try:
+            response = self.client.post(
+                reverse("create-request", args=[self.ride.pk])
+            )
+            # the routing of a request does not leak into the next one
+            self.assertIsNone(replica.get())
+            self.assertFalse(wrote.get())
+        finally:
+            wrote.reset(token)
+        self.assertEqual(
+            response.cookies[ReplicaMiddleware.cookie]["max-age"], 30
+        )
+
+    def test_unsafe_methods_read_from_primary(self):
+        with self.queries() as counts:
+            self.client.post(reverse("reject-request", args=[0]))
+        self.assertGreater(counts[DEFAULT_DB_ALIAS], 0)
+        self.assertEqual(set(counts), {DEFAULT_DB_ALIAS})
+
+    def test_replicas_are_not_migrated(self):
+        router = ReplicaRouter()
+        for alias in REPLICAS:
+            self.assertIs(router.allow_migrate(alias, "rides"), False)
+        self.assertIsNone(router.allow_migrate(DEFAULT_DB_ALIAS, "rides"))
+
+    def test_write_keeps_client_on_primary(self):
+        response = self.client.post(
+            reverse("create-request", args=[self.ride.pk])
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(ReplicaMiddleware.cookie, response.cookies)
+        with self.queries() as counts:
+            response = self.client.get(reverse("user-requested"))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(counts[DEFAULT_DB_ALIAS], 0)
+        self.assertEqual(set(counts), {DEFAULT_DB_ALIAS})
+
+        # without the cookie the reads go back to the replicas
+        del self.client.cookies[ReplicaMiddleware.cookie]
+        with self.queries() as counts:
+            self.client.get(reverse("user-requested"))
+        self.assertEqual(counts[DEFAULT_DB_ALIAS], 0)
+
+    def test_reads_after_write_use_primary(self):
+        token = replica.set(REPLICAS[0])
+        try:
+            self.assertEqual(Ride.objects.all().db, REPLICAS[0])
+            self.ride.save()
+            self.assertEqual(Ride.objects.all().db, DEFAULT_DB_ALIAS)
+        finally:
+            replica.reset(token)
+
+    def test_reads_in_atomic_use_primary(self):
+        token = replica.set(REPLICAS[0])
+        try:
+            with transaction.atomic():
+                self.assertEqual(Ride.objects.all().db, DEFAULT_DB_ALIAS)
+                with self.queries() as counts:
+                    Ride.objects.get(pk=self.ride.pk)
+                self.assertEqual(set(counts), {DEFAULT_DB_ALIAS})
+            self.assertEqual(Ride.objects.all().db, REPLICAS[0])
+        finally:
+            replica.reset(token)
@@ -0,0 +1,126 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from accounts.models import Profile
+from rides.models import Payment, Request, Ride, Trip
+from rides.search import keyword_search
+from rides.summary import rebuild_summaries
+
+
+class SeedDataTests(TestCase):
+    '''
+    Tests seed_data generates and imports rows the way save() and the
+    signals would have written them
+    '''
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def seed_data(self, *args):
+        call_command("seed_data", *args, "--batch-size", "7",
+                     stdout=StringIO())
+
+    def write(self, name, text):
+        '''method to write a file to import and return its path'''
+        path = self.directory / name
+        path.write_text(text)
+        return str(path)
+
+    def assertComputedFields(self, ride):
+        '''method to check the fields save() would have set'''
+        fields = Ride.compute_fields(
+            ride.driver.username,
+            ride.source_location,
+            ride.destination_location,
+            ride.source_latitude,
+            ride.source_longitude,
+            ride.destination_latitude,
+            ride.destination_longitude,
+        )
+        for name, value in fields.items():
+            self.assertEqual(getattr(ride, name), value, name)
+
+    def test_generates_a_consistent_dataset(self):
+        self.seed_data("--users", "12", "--rides", "30")
+        self.assertEqual(User.objects.count(), 12)
+        self.assertEqual(Profile.objects.count(), 12)
+        self.assertEqual(Ride.objects.count(), 30)
+        for ride in Ride.objects.select_related("driver"):
+            self.assertComputedFields(ride)
+            self.assertEqual(ride.seats_booked, ride.trips.count())
+        self.assertEqual(rebuild_summaries(dry_run=True)[2], 0)
+
+        with self.assertRaises(CommandError):
+            self.seed_data("--users", "1", "--rides", "1")
+
+    def test_imports_files_in_dependency_order(self):
+        files = [
+            self.write("payments.jsonl", json.dumps({
+                "ride": "r1", "rider": "bob", "amount": 40, "status": "Paid",
+            }) + "\n"),
+            self.write("trips.csv", "ride,rider\nr1,bob\n"),
+            self.write("requests.csv", "ride,user_requested,status\n"
+                       "r1,bob,Approved\nr1,carol,Pending\n"),
+            self.write("rides.jsonl", json.dumps({
+                "id": "r1",
+                "driver": "alice",
+                "source_location": "Koramangala",
+                "destination_location": "Whitefield",
+                "source_latitude": 12.93,
+                "source_longitude": 77.62,
+                "destination_latitude": "",
+                "destination_longitude": "",
+                "start_time": "2030-01-01T10:00:00+00:00",
+                "end_time": "2030-01-01T11:00:00+00:00",
+                "price_per_km": 10,
+                "description": "Quiet ride over the ring road",
+            }) + "\n"),
+            self.write("users.csv", "username,email,password\n"
+                       "alice,a@example.com,secret\nbob,,\ncarol,,\n"),
+        ]
+        self.seed_data(*files)
+
+        alice = User.objects.get(username="alice")
+        self.assertTrue(alice.check_password("secret"))
+        self.assertFalse(
+            User.objects.get(username="bob").has_usable_password()
+        )
+        self.assertEqual(Profile.objects.count(), 3)
+        ride = Ride.objects.select_related("driver").get()
+        self.assertEqual(ride.driver, alice)
+        self.assertComputedFields(ride)
+        self.assertEqual(ride.destination_cell, "")
+        self.assertEqual(Request.objects.filter(ride=ride).count(), 2)
+        self.assertEqual(Trip.objects.get().rider.username, "bob")
+        self.assertEqual(Payment.objects.get().amount, 40)
+        # the full text index follows bulk inserts
+        self.assertEqual(list(keyword_search("ring road")), [ride])
+
+        # users already there are skipped, rows of existing rides load
+        self.seed_data(
+            files[-1],
+            self.write("trips.jsonl", json.dumps({
+                "ride": ride.pk, "rider": "carol",
+            }) + "\n"),
+        )
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Trip.objects.filter(ride=ride).count(), 2)
+
+    def test_bad_files_are_refused(self):
+        cases = (
+            ("cars.csv", "name\nSwift\n", "name must start with"),
+            ("trips.csv", "ride,rider\n1,nobody\n", "unknown users"),
+            ("users.jsonl", "{not json\n", "users.jsonl:1"),
+        )
+        for name, text, message in cases:
+            with self.subTest(name=name):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.seed_data(self.write(name, text))
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rides.models import Ride
+from rides.slowlog import SlowQueryLogger, fingerprint, normalize_sql
+
+
+class NormalizeTests(SimpleTestCase):
+    '''Tests queries differing only in their values share a fingerprint'''
+
+    def test_literals_and_in_lists_are_replaced(self):
+        first = normalize_sql(
+            "SELECT * FROM rides_ride WHERE id IN (%s, %s)\n"
+            "  AND title = 'it''s' AND price_per_km > 10.5"
+        )
+        second = normalize_sql(
+            "SELECT * FROM rides_ride WHERE id IN (%s, %s, %s) "
+            "AND title = 'other' AND price_per_km > 3"
+        )
+        self.assertEqual(
+            first,
+            "SELECT * FROM rides_ride WHERE id IN (...) "
+            "AND title = ? AND price_per_km > ?",
+        )
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertNotEqual(
+            fingerprint(first), fingerprint(normalize_sql("SELECT 1 + 1"))
+        )
+
+
+class SlowQueryLoggerTests(TestCase):
+    '''Tests slow queries are logged with their call site and plan'''
+
+    def entries(self, run):
+        '''method to return the entries logged while running run'''
+        # only this logger finds every query slow, not the one every
+        # connection gets from rides.slowlog.install
+        with override_settings(
+            RIDES_SLOW_QUERY_MS=0, RIDES_SLOW_QUERY_EXPLAIN_RATE=1
+        ):
+            slow = SlowQueryLogger(connection)
+        with self.assertLogs("rides.slow_queries") as logs:
+            with connection.execute_wrapper(slow):
+                run()
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_entry_has_call_site_and_plan(self):
+        (entry,) = self.entries(
+            lambda: list(Ride.objects.filter(pk__in=[1, 2]))
+        )
+        self.assertIn("IN (...)", entry["sql"])
+        self.assertEqual(entry["fingerprint"], fingerprint(entry["sql"]))
+        self.assertEqual(entry["database"], "default")
+        self.assertTrue(entry["call_site"].startswith(
+            os.path.join("rides", "tests", "test_slowlog.py:")
+        ))
+        # the plan comes from EXPLAIN QUERY PLAN, which is not logged
+        self.assertIsInstance(entry["plan"], list)
+
+    def test_writes_are_not_explained(self):
+        def run():
+            with connection.cursor() as cursor:
+                cursor.execute("UPDATE rides_ride SET title = title")
+        (entry,) = self.entries(run)
+        self.assertIsNone(entry["plan"])
+
+    def test_command_groups_entries_by_fingerprint(self):
+        entries = [
+            {"time": "2030-01-01T00:00:00+00:00", "duration_ms": duration,
+             "fingerprint": name, "sql": f"SELECT {name}",
+             "view": "home", "call_site": "rides/views.py:1 in get"}
+            for name, duration in (("a", 5), ("a", 7), ("b", 100))
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as log:
+            log.write("\n".join(json.dumps(entry) for entry in entries))
+            log.write("\nnot json\n")
+            log.flush()
+            output = StringIO()
+            call_command(
+                "slow_queries", log=log.name, sort="count", stdout=output
+            )
+        lines = output.getvalue().splitlines()
+        self.assertEqual(
+            lines[0], "a  2 queries, total 12.0ms, mean 6.0ms, "
+            "p95 7.0ms, max 7.0ms"
+        )
+        self.assertIn("  view home: 2", lines)
+        self.assertTrue(lines[-2].startswith("  at rides/views.py:1"))
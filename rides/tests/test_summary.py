@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rides.archive import archive_batch
+from rides.models import DailySummary, Payment, Ride, Trip, UserSummary
+from rides.summary import rebuild_summaries
+
+
+@override_settings(RIDES_DEFER_SIDE_EFFECTS=False, RIDES_ARCHIVE_AFTER_DAYS=30)
+class SummaryTests(TestCase):
+    '''
+    Tests the summaries kept up by finishing rides and paying bills
+    match a recount from scratch by rebuild_summaries
+    '''
+
+    def setUp(self):
+        self.driver = User.objects.create_user("driver")
+        self.riders = [
+            User.objects.create_user(f"rider{number}") for number in range(2)
+        ]
+
+    def finished_ride(self, days):
+        '''method to finish a ride of both riders which ended days ago'''
+        end = timezone.now() - timedelta(days=days)
+        ride = Ride.objects.create(
+            driver=self.driver,
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            start_time=end - timedelta(hours=1),
+            end_time=end,
+            price_per_km=10,
+            distance=12.5,
+        )
+        for rider in self.riders:
+            Trip.objects.create(ride=ride, rider=rider)
+        self.assertTrue(ride.finish())
+        return ride
+
+    def test_incremental_updates_match_rebuild(self):
+        first = self.finished_ride(days=2)
+        self.finished_ride(days=1)
+        # finishing or paying twice counts once
+        self.assertFalse(first.finish())
+        first.generate_payments()
+        payment = Payment.objects.filter(ride=first).first()
+        self.assertTrue(payment.pay())
+        self.assertFalse(payment.pay())
+
+        driver = UserSummary.objects.get(user=self.driver)
+        self.assertEqual(driver.rides_driven, 2)
+        self.assertEqual(driver.earned, 500)
+        self.assertEqual(driver.received, 125)
+        rider = UserSummary.objects.get(user=payment.rider)
+        self.assertEqual((rider.billed, rider.paid), (250, 125))
+        self.assertEqual(DailySummary.objects.filter(
+            user=self.driver
+        ).count(), 2)
+        self.assertEqual(rebuild_summaries(dry_run=True), (3, 6, 0))
+
+    def test_archived_rides_are_still_counted(self):
+        ride = self.finished_ride(days=60)
+        for payment in Payment.objects.filter(ride=ride):
+            payment.pay()
+        Ride.objects.filter(pk=ride.pk).update(is_active=False)
+        self.assertEqual(archive_batch(10), 1)
+        self.assertEqual(rebuild_summaries(dry_run=True), (3, 3, 0))
+
+    def test_rebuild_repairs_drift(self):
+        self.finished_ride(days=1)
+        UserSummary.objects.filter(user=self.driver).update(earned=1)
+        DailySummary.objects.filter(user=self.riders[0]).delete()
+        self.assertEqual(rebuild_summaries(dry_run=True)[2], 2)
+        self.assertEqual(
+            UserSummary.objects.get(user=self.driver).earned, 1
+        )
+
+        self.assertEqual(rebuild_summaries(batch_size=1), (3, 3, 2))
+        self.assertEqual(
+            UserSummary.objects.get(user=self.driver).earned, 250
+        )
+        self.assertEqual(rebuild_summaries(dry_run=True)[2], 0)
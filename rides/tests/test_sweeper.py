@@ -0,0 +1,83 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim, run
+from rides.cache import ride_version
+from rides.models import Ride
+from rides.sweeper import schedule_sweep, sweep_batch, sweep_rides
+
+
+@override_settings(
+    RIDES_SWEEP_GRACE_SECONDS=60 * 60, RIDES_SWEEP_BATCH_SIZE=2
+)
+class SweeperTests(TransactionTestCase):
+    '''Tests finished and long ended rides leave the active feed'''
+
+    def setUp(self):
+        self.driver = User.objects.create_user("driver")
+        self.now = timezone.now()
+        self.upcoming = self.new_ride(hours=5)
+        self.just_ended = self.new_ride(hours=-0.5)
+        self.finished = [self.new_ride(hours=5, status="Finished")]
+        self.expired = [self.new_ride(hours=-2) for _ in range(3)]
+
+    def new_ride(self, hours, **fields):
+        '''method to create a ride ending hours from now'''
+        end = self.now + timedelta(hours=hours)
+        return Ride.objects.create(
+            driver=self.driver,
+            source_location="Koramangala",
+            destination_location="Whitefield",
+            start_time=end - timedelta(hours=1),
+            end_time=end,
+            price_per_km=10,
+            **fields
+        )
+
+    def active(self):
+        return set(
+            Ride.objects.filter(is_active=True).values_list("pk", flat=True)
+        )
+
+    def test_sweeps_in_batches_until_done(self):
+        swept = self.finished + self.expired
+        versions = {ride.pk: ride_version(ride.pk) for ride in swept}
+        self.assertEqual(list(sweep_rides(2, now=self.now)), [2, 2])
+        self.assertEqual(
+            self.active(), {self.upcoming.pk, self.just_ended.pk}
+        )
+        for ride in swept:
+            self.assertNotEqual(ride_version(ride.pk), versions[ride.pk])
+        self.assertEqual(sweep_batch(2, self.now), 0)
+
+    def test_limit_stops_the_sweep(self):
+        self.assertEqual(list(sweep_rides(2, limit=3, now=self.now)), [2, 1])
+        self.assertEqual(len(self.active()), 3)
+
+    def test_command_dry_run_changes_nothing(self):
+        call_command("sweep_rides", "--dry-run", stdout=StringIO())
+        self.assertEqual(len(self.active()), 6)
+        call_command("sweep_rides", stdout=StringIO())
+        self.assertEqual(len(self.active()), 2)
+
+    def test_job_chains_full_batches_then_reschedules(self):
+        schedule_sweep(0)
+        for _ in range(2):
+            self.assertTrue(run(claim("worker")[0]))
+        self.assertEqual(len(self.active()), 2)
+        # the last batch was full, one more run finds nothing left
+        self.assertTrue(run(claim("worker")[0]))
+        queued = Job.objects.get(status=Job.QUEUED)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertEqual(claim("worker"), [])
+
+    def test_schedule_is_not_doubled(self):
+        with mock.patch("rides.sweeper.timezone.now", return_value=self.now):
+            self.assertEqual(schedule_sweep().pk, schedule_sweep().pk)
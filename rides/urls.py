@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     RideListView,
+    RideSearchView,
     RideCreateView,
     RideUpdateView,
     RideDetailView,
@@ -17,6 +18,10 @@ from .views import (
     create_request_view,
     ride_finish_view,
     payment_pay_view,
+    ride_match_view,
+    cache_stats_view,
+    event_stream_view,
+    metrics_view,
 )
 
 urlpatterns = [
@@ -27,6 +32,20 @@ urlpatterns = [
         name="home"
     ),
 
+    # url pattern to search rides by route
+    path(
+        "search/",
+        RideSearchView.as_view(),
+        name="ride-search"
+    ),
+
+    # url pattern to match rides near a pickup and dropoff point
+    path(
+        "match/",
+        ride_match_view,
+        name="ride-match"
+    ),
+
     # url pattern for rides of user
     path(
         "user/<str:username>",
@@ -124,4 +143,25 @@ urlpatterns = [
         payment_pay_view,
         name="payment-pay"
     ),
+
+    # url pattern to see the ride cache hit/miss counters
+    path(
+        "cache/stats/",
+        cache_stats_view,
+        name="cache-stats"
+    ),
+
+    # url pattern to export the request metrics to Prometheus
+    path(
+        "metrics/",
+        metrics_view,
+        name="metrics"
+    ),
+
+    # url pattern for the live request/seat/payment events of the user
+    path(
+        "events/",
+        event_stream_view,
+        name="event-stream"
+    ),
 ]
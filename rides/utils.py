@@ -0,0 +1,32 @@
+import unicodedata
+from functools import lru_cache
+
+from django.db import connections
+from django.db.models import Q
+
+
+@lru_cache(maxsize=4096)
+def normalize_location(location):
+    '''
+    Function to build the search key of a location,
+    lowercase, without accents and with single spaces.
+    The same few places come up again and again so keys are cached.
+    '''
+    if not location:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", location)
+    ascii_only = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+    return " ".join(ascii_only.lower().split())
+
+
+def prefix_match(field, prefix, using="default"):
+    '''
+    Condition matching values of field starting with prefix.
+    PostgreSQL serves LIKE 'prefix%' from varchar_pattern_ops indexes,
+    other backends get a range so their btree index can be used.
+    '''
+    if connections[using].vendor == "postgresql":
+        return Q(**{f"{field}__startswith": prefix})
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": f"{prefix}\uffff"})
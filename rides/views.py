@@ -1,6 +1,16 @@
+from django.http import (
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
+from django.utils.crypto import constant_time_compare
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import (
     ListView,
@@ -9,46 +19,94 @@ from django.views.generic import (
     DeleteView,
     UpdateView,
 )
-from .models import Ride, Request, Payment
-
-
-class RideListView(LoginRequiredMixin, ListView):
+from .models import Ride, Request, Trip, Payment
+from .archive import payment_history
+from .badges import INCOMING_REQUESTS, OUTGOING_REQUESTS, adjust_badge
+from .events import REQUEST_NEW, publish_event
+from .cache import cache_stats, cached_object, prime_ride_versions
+from .metrics import render_metrics
+from .pagination import CursorPaginationMixin
+from .forms import RideSearchForm, RideMatchForm
+from .geo import match_rides
+from .search import search_rides
+from .streams import event_stream, parse_last_event_id
+
+
+class RideListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     '''View to list all rides'''
     model = Ride
     template_name = "rides/home.html"  # <app>/<model>_<viewtype>.html
     context_object_name = "rides"
     ordering = ["-ride_created_time"]
     paginate_by = 5
+    cursor_ordering = ("-ride_created_time", "-id")
 
     def get_queryset(self):
         '''method to return all active rides'''
-        return Ride.objects.filter(is_active=True)
+        return (
+            Ride.objects.filter(is_active=True)
+            .select_related("driver")
+            .order_by("-ride_created_time")
+        )
+
+    def get_context_data(self, **kwargs):
+        '''method to read the cache versions of the ride cards at once'''
+        context = super().get_context_data(**kwargs)
+        prime_ride_versions(context["rides"])
+        return context
 
 
-class UserRideListView(LoginRequiredMixin, ListView):
+class RideSearchView(LoginRequiredMixin, CursorPaginationMixin, ListView):
+    '''View to search upcoming rides with free seats by route'''
+    model = Ride
+    template_name = "rides/ride_search.html"
+    context_object_name = "rides"
+    paginate_by = 5
+    cursor_ordering = ("start_time", "id")
+
+    def get_queryset(self):
+        '''method to return the rides matching the search form'''
+        self.form = RideSearchForm(self.request.GET or None)
+        if not self.form.is_valid():
+            return search_rides().select_related("driver")
+        return search_rides(**self.form.cleaned_data).select_related("driver")
+
+    def get_context_data(self, **kwargs):
+        '''method to add the search form to the context'''
+        context = super().get_context_data(**kwargs)
+        context["form"] = self.form
+        prime_ride_versions(context["rides"])
+        return context
+
+
+class UserRideListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     '''View to return all rides of a user'''
     model = Ride
     template_name = "rides/user_rides.html"
     context_object_name = "rides"
     ordering = ["-ride_created_time"]
     paginate_by = 5
+    cursor_ordering = ("-ride_created_time", "-id")
 
     def get_context_data(self, **kwargs):
         '''method to get the custom context data to be used by template'''
         # Call the base implementation first to get a context
         context = super().get_context_data(**kwargs)
-        context["profile_user"] = get_object_or_404(
-            User, username=self.kwargs.get("username")
-        )
-        context["rides_of_this_user"] = Ride.objects.filter(
-            driver=context["profile_user"].id,
-        )
+        context["profile_user"] = self.profile_user
         return context
 
     def get_queryset(self):
         '''method to return query set to return all rides of a user'''
-        user = get_object_or_404(User, username=self.kwargs.get("username"))
-        return Ride.objects.filter(driver=user).order_by("-ride_created_time")
+        # fetch the user (and profile for the avatar) once per request
+        self.profile_user = get_object_or_404(
+            User.objects.select_related("profile"),
+            username=self.kwargs.get("username")
+        )
+        return (
+            Ride.objects.filter(driver=self.profile_user)
+            .select_related("driver")
+            .order_by("-ride_created_time")
+        )
 
 
 class RideDetailView(LoginRequiredMixin, DetailView):
@@ -56,16 +114,37 @@ class RideDetailView(LoginRequiredMixin, DetailView):
     model = Ride
     context_object_name = "ride"
 
+    def get_queryset(self):
+        '''queryset to fetch the ride with driver, riders and seat count'''
+        return (
+            Ride.objects.select_related("driver")
+            .prefetch_related(
+                Prefetch(
+                    "trips",
+                    queryset=Trip.objects.select_related("rider")
+                )
+            )
+        )
+
+    def get_object(self, queryset=None):
+        '''
+        method to return the ride with driver and riders,
+        cached until the ride, its trips or requests change
+        '''
+        return cached_object(
+            self.kwargs.get("pk"),
+            "object",
+            lambda: super(RideDetailView, self).get_object(queryset)
+        )
+
     def get_context_data(self, **kwargs):
         '''method to get the custom context data to be used by template'''
         # Call the base implementation first to get a context
         context = super().get_context_data(**kwargs)
-        context["already_requested"] = (
-            Request.objects.filter(ride=self.kwargs.get("pk"))
-            .filter(user_requested=self.request.user)
-            .count()
-            >= 1
-        )
+        context["already_requested"] = Request.objects.filter(
+            ride=self.kwargs.get("pk"),
+            user_requested=self.request.user
+        ).exists()
         return context
 
 
@@ -81,6 +160,10 @@ class RideCreateView(LoginRequiredMixin, CreateView):
         "end_time",
         "price_per_km",
         "distance",
+        "source_latitude",
+        "source_longitude",
+        "destination_latitude",
+        "destination_longitude",
     ]
 
     def form_valid(self, form):
@@ -99,12 +182,30 @@ class RideUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         "start_time",
         "end_time",
         "price_per_km",
+        "source_latitude",
+        "source_longitude",
+        "destination_latitude",
+        "destination_longitude",
     ]
 
     def form_valid(self, form):
-        '''validation of form to set driver to the request user'''
-        form.instance.driver = self.request.user
-        return super().form_valid(form)
+        '''
+        validation of form to save only the edited fields, seats and
+        status changed meanwhile by approvals are left as they are
+        '''
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=self.fields)
+        return HttpResponseRedirect(self.get_success_url())
+
+    def get_queryset(self):
+        '''queryset to fetch the ride along with its driver'''
+        return Ride.objects.select_related("driver")
+
+    def get_object(self, queryset=None):
+        '''fetch the ride once for both test_func and the view'''
+        if not hasattr(self, "_ride"):
+            self._ride = super().get_object(queryset)
+        return self._ride
 
     def test_func(self):
         '''
@@ -122,6 +223,16 @@ class RideDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Ride
     success_url = "/"
 
+    def get_queryset(self):
+        '''queryset to fetch the ride along with its driver'''
+        return Ride.objects.select_related("driver")
+
+    def get_object(self, queryset=None):
+        '''fetch the ride once for both test_func and the view'''
+        if not hasattr(self, "_ride"):
+            self._ride = super().get_object(queryset)
+        return self._ride
+
     def test_func(self):
         '''
         Custom test to check if the user
@@ -133,67 +244,91 @@ class RideDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return False
 
 
-class UserRequestsListView(LoginRequiredMixin, ListView):
+class UserRequestsListView(
+    LoginRequiredMixin, CursorPaginationMixin, ListView
+):
     '''View to get all the requests for rides of a user'''
     model = Request
     template_name = "requests/user_requests.html"
     context_object_name = "requests"
     ordering = ["-request_created_time"]
     paginate_by = 5
+    cursor_ordering = ("-request_created_time", "-id")
 
     def get_queryset(self):
         '''custom query set to return all the requests for rides of a user'''
-        requests_list = Request.objects.filter(
-            ride__driver=self.request.user
-        ).order_by("-request_created_time")
+        requests_list = (
+            Request.objects.filter(ride__driver=self.request.user)
+            .select_related("ride__driver", "user_requested")
+            .order_by("-request_created_time")
+        )
         return requests_list
 
 
-class UserRequestedListView(LoginRequiredMixin, ListView):
+class UserRequestedListView(
+    LoginRequiredMixin, CursorPaginationMixin, ListView
+):
     '''View to get all the requests made by a user for rides'''
     model = Request
     template_name = "requests/user_requests.html"
     context_object_name = "requests"
     ordering = ["-request_created_time"]
     paginate_by = 5
+    cursor_ordering = ("-request_created_time", "-id")
 
     def get_queryset(self):
         '''Queryset to return all ride requests made by user'''
-        requests_list = Request.objects.filter(
-            user_requested=self.request.user
-        ).order_by("-request_created_time")
+        requests_list = (
+            Request.objects.filter(user_requested=self.request.user)
+            .select_related("ride__driver", "user_requested")
+            .order_by("-request_created_time")
+        )
         return requests_list
 
 
-class UserPaymentListView(LoginRequiredMixin, ListView):
+class UserPaymentListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     '''View to list all the payments of a user'''
     model = Payment
     template_name = "payments/user_payments.html"
     context_object_name = "payments"
     ordering = ["-generated_time"]
     paginate_by = 5
+    cursor_ordering = ("-generated_time", "-id")
 
     def get_queryset(self):
-        '''queryset to list all the payments of a user'''
-        payments_list = Payment.objects.filter(
-            rider=self.request.user
-        ).order_by("-generated_time")
+        '''
+        queryset to list all the payments of a user,
+        archived ones included
+        '''
+        payments_list = (
+            payment_history().filter(rider=self.request.user)
+            .select_related("ride__driver", "rider")
+            .order_by("-generated_time", "-id")
+        )
         return payments_list
 
 
-class UserPaymentRecievedListView(LoginRequiredMixin, ListView):
+class UserPaymentRecievedListView(
+    LoginRequiredMixin, CursorPaginationMixin, ListView
+):
     '''View to list all the payments recieved by a user'''
     model = Payment
     template_name = "payments/user_payments.html"
     context_object_name = "payments"
     ordering = ["-generated_time"]
     paginate_by = 5
+    cursor_ordering = ("-generated_time", "-id")
 
     def get_queryset(self):
-        '''queryset to list all the payments recieved by a user'''
-        payments_list = Payment.objects.filter(
-            ride__driver=self.request.user
-        ).order_by("-generated_time")
+        '''
+        queryset to list all the payments recieved by a user,
+        archived ones included
+        '''
+        payments_list = (
+            payment_history().filter(ride__driver=self.request.user)
+            .select_related("ride__driver", "rider")
+            .order_by("-generated_time", "-id")
+        )
         return payments_list
 
 
@@ -202,20 +337,8 @@ def approve_request_view(request, req):
     '''function based view to approve a ride request'''
     if request.method == "POST":
         req_to_approve = get_object_or_404(Request, id=req)
-
-        # reject request if seats are already full
-        if req_to_approve.ride.trips.all().count() >= (
-            req_to_approve.ride.number_of_seats
-        ):
-            req_to_approve.reject()
-
+        # seats are taken atomically, full rides reject the request
         req_to_approve.approve()
-        # reject all pending requests after seats are full
-        if req_to_approve.ride.trips.all().count() == (
-            req_to_approve.ride.number_of_seats
-        ):
-            for req in req_to_approve.ride.requests.filter(status='Pending'):
-                req.reject()
         return redirect("user-requests")
     else:
         return redirect("home")
@@ -237,8 +360,16 @@ def create_request_view(request, ride):
     '''function based view to create a ride request'''
     if request.method == "POST":
         ride = get_object_or_404(Ride, id=ride)
-        req = Request.objects.create(ride=ride, user_requested=request.user)
-        req.save()
+        ride_request = Request.objects.create(
+            ride=ride, user_requested=request.user
+        )
+        adjust_badge(ride.driver_id, INCOMING_REQUESTS, 1)
+        adjust_badge(request.user.id, OUTGOING_REQUESTS, 1)
+        publish_event(ride.driver_id, REQUEST_NEW, {
+            "request": ride_request.id,
+            "ride": ride.id,
+            "user": request.user.username,
+        })
         return redirect("user-requested")
     else:
         return redirect("home")
@@ -247,9 +378,13 @@ def create_request_view(request, ride):
 @login_required
 def ride_finish_view(request, ride):
     '''function based view to finish a ride'''
-    ride = get_object_or_404(Ride, id=ride)
-    ride.finish()
-    return redirect("ride-detail", pk=ride.id)
+    if request.method == "POST":
+        # only the driver of the ride can finish it
+        ride = get_object_or_404(Ride, id=ride, driver=request.user)
+        ride.finish()
+        return redirect("ride-detail", pk=ride.id)
+    else:
+        return redirect("home")
 
 
 @login_required
@@ -261,3 +396,87 @@ def payment_pay_view(request, payment):
         return redirect("user-payments")
     else:
         return redirect("home")
+
+
+@login_required
+def ride_match_view(request):
+    '''function based view to find the rides nearest to a route'''
+    form = RideMatchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    data = form.cleaned_data
+    dropoff = None
+    if data["dropoff_latitude"] is not None:
+        dropoff = (data["dropoff_latitude"], data["dropoff_longitude"])
+    matches = match_rides(
+        (data["pickup_latitude"], data["pickup_longitude"]),
+        dropoff,
+        start_after=data["start_after"],
+        start_before=data["start_before"],
+        k=data["k"] or 10,
+    )
+    return JsonResponse({
+        "rides": [
+            {
+                "id": ride.id,
+                "title": ride.title,
+                "start_time": ride.start_time,
+                "seats_left": ride.number_of_seats - ride.seats_booked,
+                "pickup_km": round(pickup_km, 3),
+                "dropoff_km": round(dropoff_km, 3),
+            }
+            for ride, pickup_km, dropoff_km in matches
+        ]
+    })
+
+
+@staff_member_required
+def cache_stats_view(request):
+    '''function based view to show the ride cache counters'''
+    return JsonResponse(cache_stats())
+
+
+@staff_member_required
+def staff_metrics_view(request):
+    '''function based view to export the request metrics to staff'''
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4"
+    )
+
+
+def metrics_view(request):
+    '''
+    function based view to export the request metrics in Prometheus
+    text format, to staff or to a scraper with the metrics token
+    '''
+    token = settings.RIDES_METRICS_TOKEN
+    authorization = request.headers.get("Authorization", "")
+    if token and constant_time_compare(authorization, f"Bearer {token}"):
+        return HttpResponse(
+            render_metrics(), content_type="text/plain; version=0.0.4"
+        )
+    return staff_metrics_view(request)
+
+
+def event_stream_view(request):
+    '''
+    function based view streaming the live events of the user
+    as server-sent events, see rides.streams for the ASGI version.
+    Each stream holds a worker thread, it is served only when
+    RIDES_EVENT_STREAMS opts in.
+    '''
+    if not settings.RIDES_EVENT_STREAMS:
+        return HttpResponse(status=404)
+    if not request.user.is_authenticated:
+        return HttpResponse(status=401)
+    last_id = parse_last_event_id(
+        request.headers.get("Last-Event-ID")
+        or request.GET.get("last_event_id")
+    )
+    response = StreamingHttpResponse(
+        event_stream(request.user.id, last_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response